@@ -1,18 +1,66 @@
 from pprint import pp
-from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify
-import pandas as pd
+from flask import Flask, render_template, request, redirect, url_for, send_file, flash, jsonify, make_response
 import json
 import os
-import re
-from logic import calculate_student_vectors, run_optimized_matching, run_full_optimization
+from datetime import datetime, timezone
+# pandas/openpyxl (וגם NumPy) לא נטענים בעליית השרת - רק בפונקציות של העלאה/הורדה/וקטורים,
+# בפעם הראשונה שצריך אותם. רוב העמודים (דף הבית, כיתות, פרופיל, דירוג) לא נוגעים בהם.
+from logic import (build_vector_state, parse_unit_rankings, ranks_to_tiers,
+                   run_optimized_matching, run_full_optimization)
+from vector_store import save_vector_state, has_vectors, upsert_unit_profile, remove_unit_profile
+from class_store import (list_class_manifests, write_class_snapshot, class_dir,
+                         delete_class_snapshot, migrate_saved_classes)
+from autosave import create_edit_buffer, PatchError
+from scenarios import run_scenarios
+from pareto import pareto_frontier
+from results_view import (build_results_view, page_students, view_matches, data_fingerprint, ResultCache,
+                          PAGE_SIZE)
+from audit import audit_placement
+from artifacts import ArtifactCache, version_etag, gzip_response
 import io
+from contextlib import contextmanager
+from locks import LockRegistry
+from student_index import StudentIndex
+from ingest import read_uploaded_file, parse_files, merge_survey_frames, merge_forms_students
+from tuning_history import TuningHistory, HISTORY_FILE
+from profiling import (ProfilerMiddleware, PROFILE_TOKEN, PROFILE_HEADER, PROFILE_PARAM, token_matches,
+                       list_profiles, profile_path, profile_summary)
+import threading
 
 app = Flask(__name__)
 app.secret_key = 'smartplace-secret-key-2026'  # נדרש עבור Flash messages
 DB_FILE = 'db.json'
 
+# פרופיילינג לפי דרישה - רק כשמוגדר SMARTPLACE_PROFILE_TOKEN (אחרת אין Middleware בכלל)
+if PROFILE_TOKEN:
+    app.wsgi_app = ProfilerMiddleware(app.wsgi_app)
+
+# נעילת קריאה/כתיבה ל-db.json: דפי קריאה רצים במקביל, וכל עדכון (טעינה-שינוי-שמירה) בלעדי.
+# קובץ הנעילה מאפשר להריץ גם כמה Workers (תהליכים) מול אותו DB. הנעילה נבחרת לפי DB_FILE
+# ברגע השימוש (ולא בייבוא), כך ששינוי של DB_FILE (בדיקות עומס, כיתה אחרת) נועל את הקובץ הנכון.
+_db_locks = LockRegistry(lambda path: path + '.lock')
+
+def db_lock():
+    return _db_locks.get(os.path.abspath(DB_FILE))
+
+def classes_root():
+    """תיקיית ה-Snapshots של הכיתות השמורות - ליד קובץ ה-DB"""
+    return os.path.join(os.path.dirname(os.path.abspath(DB_FILE)), 'saved_classes')
+
+# תוצאות ריצה אחרונות - לטעינה לפי דרישה של רשימות הסטודנטים בעמוד התוצאות.
+# נשמרות גם בתיקייה ליד ה-DB, כך שכל Worker יכול להגיש תוצאה (ובדיקת איכות) שחושבה ב-Worker אחר.
+result_cache = ResultCache(directory_getter=lambda: os.path.join(os.path.dirname(os.path.abspath(DB_FILE)), 'results'))
+
+# קבצי הורדה שנבנו כבר (לפי גרסת ה-DB, או גרסה קבועה לקבצי הדוגמה)
+artifact_cache = ArtifactCache()
+SAMPLES_VERSION = 1   # להעלות כשמשנים את תוכן קבצי הדוגמה
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# עריכות כיתה ממתינות בזיכרון ונכתבות לדיסק באיחור (Debounce)
+edit_buffer = create_edit_buffer(lambda: classes_root())
+
 # --- ניהול נתונים ---
-def load_db():
+def _read_db():
     default_structure = {"students": [], "units": {}, "saved_classes": {}}
     if os.path.exists(DB_FILE):
         try:
@@ -30,27 +78,130 @@ def load_db():
             return default_structure
     return default_structure
 
-# --- Routes (עמודי האתר) ---
-def save_db(data):
-    with open(DB_FILE, 'w', encoding='utf-8') as f:
+def _write_db(data):
+    # כתיבה לקובץ זמני והחלפה אטומית - קורא במקביל תמיד רואה קובץ שלם
+    tmp = DB_FILE + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
+    os.replace(tmp, DB_FILE)
 
-def read_uploaded_file(file_obj):
-    """קורא קובץ Excel או CSV מהעלאה"""
-    filename = file_obj.filename.lower()
-    
-    if filename.endswith('.xlsx') or filename.endswith('.xls'):
-        return pd.read_excel(file_obj, engine='openpyxl' if filename.endswith('.xlsx') else None)
-    elif filename.endswith('.csv'):
-        return pd.read_csv(file_obj, encoding='utf-8-sig')
-    else:
-        raise ValueError("פורמט קובץ לא תומך. בחר Excel או CSV")
+def load_db():
+    with db_lock().read():
+        return _read_db()
+
+@contextmanager
+def db_transaction():
+    """
+    טעינה-שינוי-שמירה תחת נעילת כתיבה, כך ששתי בקשות במקביל לא דורסות זו את זו.
+    אם הגוף זורק חריגה - שום דבר לא נשמר.
+    """
+    with db_lock().write():
+        data = _read_db()
+        migrate_saved_classes(classes_root(), data)
+        yield data
+        _write_db(data)
+
+# --- Routes (עמודי האתר) ---
+
+# עותק קריאה-בלבד של ה-DB עם אינדקס סטודנטים, נבנה מחדש רק כשקובץ ה-DB השתנה.
+# כל כתיבה מחליפה את הקובץ (os.replace) ולכן משנה את ה-inode/mtime - כך האינדקס תמיד תואם לכתיבות.
+_snapshot = {'version': None, 'data': None, 'index': None}
+_snapshot_lock = threading.Lock()
+
+def db_version():
+    try:
+        st = os.stat(DB_FILE)
+    except FileNotFoundError:
+        return (os.path.abspath(DB_FILE), None)
+    return (os.path.abspath(DB_FILE), st.st_mtime_ns, st.st_size, st.st_ino)
+
+def db_snapshot():
+    """(data, index) משותפים לכל הבקשות - אסור לשנות אותם. לעדכונים יש להשתמש ב-db_transaction"""
+    with _snapshot_lock:
+        version = db_version()
+        if _snapshot['version'] != version:
+            data = load_db()
+            _snapshot.update(version=version, data=data, index=StudentIndex(data['students']))
+        return _snapshot['data'], _snapshot['index']
+
+# --- כיתות ישנות בתוך db.json ---
+# ההעברה ל-Snapshots נפרדים (migrate_saved_classes) קורית רק בכתיבה: בכל db_transaction,
+# לפני עריכה/מחיקה של כיתה ובעליית השרת. ייבוא, יציאה וקריאות לא משנים את db.json -
+# עד ההעברה הכיתות הישנות מוצגות ונקראות ישירות מתוכו.
+
+def legacy_classes():
+    """כיתות שעדיין שמורות בתוך db.json (קריאה בלבד)"""
+    data, _ = db_snapshot()
+    return data.get('saved_classes') or {}
+
+def migrate_legacy_classes():
+    if legacy_classes():
+        with db_transaction():
+            pass
+
+def saved_class_manifests():
+    """כל הכיתות השמורות (שם -> manifest), כולל כיתות ישנות שעוד לא הועברו"""
+    manifests = list_class_manifests(classes_root())
+    for name, class_data in legacy_classes().items():
+        manifests.setdefault(name, {
+            'name': name,
+            'description': class_data.get('description', ''),
+            'created_date': class_data.get('created_date', ''),
+            'student_count': len(class_data.get('students', [])),
+            'unit_count': len(class_data.get('units', {})),
+        })
+    return manifests
+
+def get_class(class_name):
+    """המצב העדכני של כיתה שמורה (כולל עריכות ממתינות), או None"""
+    class_data = edit_buffer.get(class_name)
+    return class_data if class_data is not None else legacy_classes().get(class_name)
+
+def dataframe_to_xlsx(df, sheet_name):
+    """DataFrame לקובץ Excel בזיכרון, עם רוחב עמודות לפי התוכן"""
+    import pandas as pd
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+
+        # התאמת רוחב עמודות (קוסמטיקה לאקסל)
+        worksheet = writer.sheets[sheet_name]
+        for column_cells in worksheet.columns:
+            length = max(len(str(cell.value)) for cell in column_cells)
+            worksheet.column_dimensions[column_cells[0].column_letter].width = length + 2
+    return output.getvalue()
+
+def db_artifact(name, build, download_name):
+    """קובץ שנגזר מה-DB: נבנה פעם אחת לכל גרסה של db.json (Last-Modified = זמן השינוי של הקובץ)"""
+    version = db_version()
+    mtime = version[1]
+    last_modified = datetime.fromtimestamp(mtime / 1e9, timezone.utc) if mtime else None
+    return send_artifact(name, version, build, download_name, last_modified,
+                         lambda: db_version() == version)
+
+def send_artifact(name, version, build, download_name, last_modified=None, still_valid=None):
+    """
+    הגשה עם ETag / Last-Modified. ה-ETag נגזר מהגרסה בלבד, ולכן בקשה חוזרת עם If-None-Match
+    מקבלת 304 לפני שהקובץ נבנה (גם ב-Worker שעוד לא בנה אותו).
+    """
+    etag = version_etag(name, version)
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = 0
+        return response
+    artifact = artifact_cache.get(name, version, build, last_modified, still_valid)
+    return send_file(io.BytesIO(artifact.data), mimetype=XLSX_MIMETYPE, as_attachment=True,
+                     download_name=download_name, etag=artifact.etag,
+                     last_modified=artifact.last_modified, max_age=0)
 
 @app.route('/')
 def index():
     data = load_db()
     unit_list = list(data['units'].keys())
-    saved_classes = data.get('saved_classes', {})
+    saved_classes = saved_class_manifests()
     
     return render_template('index.html', 
                            units=unit_list, 
@@ -60,35 +211,50 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload_files():
+    """
+    העלאת קובץ יחידות וקובץ סטודנטים אחד או יותר (למשל ייצוא Forms לכל כיתה / גל).
+    כל הקבצים נקראים במקביל, הסטודנטים מאוחדים (ingest.merge_survey_frames),
+    הוקטורים מחושבים פעם אחת על כל הסטודנטים וה-DB נכתב פעם אחת.
+    """
     # קבלת הקבצים מהטופס
-    f_students = request.files.get('students_file')
+    f_students = [f for f in request.files.getlist('students_file') if f and f.filename]
     f_units = request.files.get('units_file')
     
     if f_students and f_units:
         try:
-            # קריאת הנתונים מקובץ (Excel או CSV)
-            df_s = read_uploaded_file(f_students)
-            df_u = read_uploaded_file(f_units)
+            # קריאת הנתונים מקובץ (Excel או CSV) - כל הקבצים במקביל
+            frames, errors = parse_files([(f.filename, f.read()) for f in [f_units] + f_students])
+            if errors:
+                raise ValueError("; ".join(errors))
+            df_u = frames[0]
+            if len(frames) == 2:
+                df_s, merged = frames[1], 0
+            else:
+                df_s, merged = merge_survey_frames(frames[1:])
             
             # הרצת הלוגיקה (מה שכתבנו ב-logic.py)
-            students_json = calculate_student_vectors(df_s, df_u)
+            students_json, q_cols, student_matrix, unit_matrix, dists = build_vector_state(df_s, df_u)
             
             units_json = {}
-            for _, row in df_u.iterrows():
+            for (_, row), profile in zip(df_u.iterrows(), unit_matrix):
                 units_json[row['UnitName']] = {
                     "capacity": int(row['Capacity']),
                     "prefs": [],  # יתמלא בהמשך ידנית
                     "power": 1.0,  # ברירת מחדל
-                    "sticky_power": False  # ברירת מחדל - לא נעול
+                    "sticky_power": False,  # ברירת מחדל - לא נעול
+                    "profile": profile.tolist()  # פרופיל היחידה לחישוב מרחקים מחדש
                 }
                 
             # שמירה ל-db.json כדי שהמידע יישמר גם אם תסגור את השרת
             # חשוב: שומרים גם את הכיתות השמורות
-            data = load_db()
-            data['students'] = students_json
-            data['units'] = units_json
-            save_db(data)
-            flash(f"✅ נטענו {len(students_json)} סטודנטים ו-{len(units_json)} יחידות בהצלחה!", 'success')
+            # מטריצת הדירוגים ומטריצת המרחקים נשמרות בקבצי .npy ליד ה-DB
+            with db_transaction() as data:
+                save_vector_state(DB_FILE, student_matrix, dists)
+                data['students'] = students_json
+                data['units'] = units_json
+                data['vectors'] = {"questions": q_cols, "units": list(units_json.keys())}
+            note = f" ({len(f_students)} קבצים, {merged} כפילויות אוחדו)" if len(f_students) > 1 else ""
+            flash(f"✅ נטענו {len(students_json)} סטודנטים ו-{len(units_json)} יחידות בהצלחה!{note}", 'success')
         except Exception as e:
             print(f"שגיאה בהעלאה: {e}")
             flash(f"❌ שגיאה בהעלאה: {str(e)}", 'danger')
@@ -98,103 +264,25 @@ def upload_files():
 @app.route('/upload_forms_excel', methods=['POST'])
 def upload_forms_excel():
     """
-    קבלת קובץ Excel מ-Microsoft Forms עם תשובות הסטודנטים.
+    קבלת קובץ Excel מ-Microsoft Forms עם תשובות הסטודנטים (אפשר כמה קבצים יחד).
     פורמט Forms: שורה ראשונה = כותרות השאלות
     כל שורה נוספת = תשובות סטודנט אחד
     """
-    f = request.files.get('forms_file')
+    files = [f for f in request.files.getlist('forms_file') if f and f.filename]
     
-    if f:
+    if files:
         try:
-            # קריאת הנתונים מ-Excel
-            df = read_uploaded_file(f)
-            
-            # דלג על השורות הריקות בהתחלה (Forms לעיתים מוסיף כותרות מיוחדות)
-            df = df.dropna(how='all')
-            
-            # אם העמודה הראשונה היא "שם מלא" או "응답자" או משהו דומה, זהו הקובץ הנכון
-            print(f"עמודות בקובץ: {list(df.columns)}")
-            
-            # מצא עמודות שמכילות "שם" (כל הגרסאות אפשריות)
-            name_col = None
-            id_col = None
-            
-            for col in df.columns:
-                col_str = str(col).lower()
-                if 'שם' in col_str or 'name' in col_str:
-                    name_col = col
-                if 'תעודת זהות' in col_str or 'id' in col_str:
-                    id_col = col
-            
-            if name_col is None:
-                # אם לא נמצא, בחר את העמודה הראשונה
-                name_col = df.columns[0]
-            
-            print(f"עמודת שם: {name_col}")
-            
-            processed_students = []
-            
-            # עיבוד כל שורה (סטודנט)
-            for _, row in df.iterrows():
-                name = str(row[name_col]).strip() if pd.notna(row[name_col]) else None
-                
-                if not name or name.lower() == 'nan' or name.lower() == 'סטודנט':
-                    continue
-                
-                # אוספים את כל הדירוגים מכל העמודות (מלבד שם ותעודת זהות)
-                ratings = []
-                id_num = ""
-                
-                for col in df.columns:
-                    col_str = str(col).lower()
-                    
-                    # דלג על עמודות שאינן דירוגים
-                    if 'שם' in col_str or 'name' in col_str or 'timestamp' in col_str or 'זמן' in col_str:
-                        continue
-                    
-                    if 'תעודת זהות' in col_str or 'id' in col_str:
-                        if pd.notna(row[col]):
-                            id_num = str(row[col]).strip()
-                        continue
-                    
-                    # נסה לחלץ דירוג מהערך
-                    if pd.notna(row[col]):
-                        val = str(row[col]).strip()
-                        if val and val.lower() != 'nan':
-                            try:
-                                rating = extract_rating(val)
-                                ratings.append(rating)
-                            except:
-                                pass
-                
-                # אם יש לפחות דירוג אחד, שמור את הסטודנט
-                if ratings or name:
-                    processed_students.append({
-                        "name": name,
-                        "id": id_num,
-                        "ratings": ratings
-                    })
-                    print(f"נטען סטודנט: {name}, דירוגים: {len(ratings)}")
-            
-            # שמירת תשובות הסטודנטים ב-db.json
-            data = load_db()
-            
+            # קריאת הנתונים מ-Excel - כל קובץ בתהליך נפרד (ingest.forms_students)
+            parsed, errors = parse_files([(f.filename, f.read()) for f in files], kind='forms')
+            if errors:
+                raise ValueError("; ".join(errors))
+            processed_students = [s for students in parsed for s in students]
             print(f"סך הכל סטודנטים חדשים: {len(processed_students)}")
             
-            # מעדכן את רשימת הסטודנטים עם הדירוגים שלהם
-            added_count = 0
-            for student_data in processed_students:
-                # מוודא שלא מוסיפים כפילויות
-                existing = next((s for s in data['students'] if s.get('name', '').lower() == student_data['name'].lower()), None)
-                if existing:
-                    existing['ratings'] = student_data['ratings']
-                    if student_data['id']:
-                        existing['id'] = student_data['id']
-                else:
-                    data['students'].append(student_data)
-                    added_count += 1
-            
-            save_db(data)
+            # שמירת תשובות הסטודנטים ב-db.json - כל הקבצים בכתיבה אחת
+            # כפילויות (לפי ת"ז, ואם אין - לפי שם ללא תלות ברישיות) מעדכנות את הסטודנט הקיים
+            with db_transaction() as data:
+                added_count, _ = merge_forms_students(data['students'], processed_students)
             print(f"נשמרו {added_count} סטודנטים חדשים")
             flash(f"✅ נטעינו בהצלחה {added_count} סטודנטים חדשים מהטופס!", 'success')
             
@@ -206,20 +294,13 @@ def upload_forms_excel():
         
     return redirect(url_for('index'))
 
-def extract_rating(text):
-    """חילוץ דירוג מטקסט"""
-    if pd.isna(text) or str(text).strip() == "":
-        return 3
-    match = re.search(r'\d+', str(text))
-    return int(match.group()) if match else 3
-
 @app.route('/student/<student_name>')
 def view_student_profile(student_name):
     """צפייה בפרטי סטודנט בודד - הדירוגים שלו ודירוג היחידות לו"""
-    data = load_db()
+    data, index = db_snapshot()
     
     # חיפוש הסטודנט
-    student = next((s for s in data['students'] if s.get('name') == student_name), None)
+    student = index.get(student_name)
     
     if not student:
         flash(f"❌ סטודנט '{student_name}' לא נמצא", 'danger')
@@ -243,23 +324,32 @@ def view_student_profile(student_name):
                            prefs=prefs_list,
                            units_data=data['units'])
 
+@app.route('/search_students')
+def search_students():
+    """חיפוש סטודנטים לפי תחילית שם או ת"ז מדויקת (JSON, להשלמה אוטומטית)"""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+    if not query:
+        return jsonify({'query': query, 'results': []})
+    _, index = db_snapshot()
+    results = [{'name': s.get('name', ''), 'id': s.get('id', '')} for s in index.search(query, limit)]
+    return jsonify({'query': query, 'results': results})
+
 @app.route('/rank/<unit_name>', methods=['GET', 'POST'])
 def rank_unit(unit_name):
-    data = load_db()
+    data, index = db_snapshot()
     if unit_name not in data['units']:
         return redirect(url_for('index'))
     
     # רשימת כל השמות של הסטודנטים במערכת
-    all_student_names = [s['name'] for s in data['students']]
+    all_student_names = index.names()
     
     if request.method == 'POST':
         # --- 1. עדכון כוח היחידה (Power) ---
         new_power = float(request.form.get('unit_power', 1.0))
-        data['units'][unit_name]['power'] = new_power
         
         # --- 1.5. עדכון Sticky Power (כוח ברזל) ---
         sticky_power = request.form.get('sticky_power') == 'on'
-        data['units'][unit_name]['sticky_power'] = sticky_power
         
         # --- 2. עיבוד דירוגי הסטודנטים ---
         # אנחנו אוספים את כל הדירוגים מהטופס (רק מה שאינו ריק)
@@ -270,19 +360,14 @@ def rank_unit(unit_name):
                 ranks[name] = int(val)
         
         # הפיכת הדירוגים למבנה של Tiers (קבוצות)
-        # דוגמה: { "דן": 1, "יוסי": 1, "ערן": 2 } -> [ ["דן", "יוסי"], ["ערן"] ]
-        tier_map = {}
-        for name, rank_val in ranks.items():
-            if rank_val not in tier_map:
-                tier_map[rank_val] = []
-            tier_map[rank_val].append(name)
+        final_prefs = ranks_to_tiers(ranks)
         
-        # מיון הקבוצות לפי מספר הדירוג (מהקטן לגדול)
-        sorted_keys = sorted(tier_map.keys())
-        final_prefs = [tier_map[k] for k in sorted_keys]
-        
-        data['units'][unit_name]['prefs'] = final_prefs
-        save_db(data)
+        # עדכון היחידה על גבי הגרסה העדכנית של ה-DB (ולא על העותק שנטען בתחילת הבקשה)
+        with db_transaction() as data:
+            if unit_name in data['units']:
+                data['units'][unit_name]['power'] = new_power
+                data['units'][unit_name]['sticky_power'] = sticky_power
+                data['units'][unit_name]['prefs'] = final_prefs
         return redirect(url_for('index'))
 
     # למטרת תצוגה ב-GET: ננסה להבין מה הדירוג הנוכחי של כל סטודנט כדי להציג אותו בתיבות
@@ -303,81 +388,226 @@ def rank_unit(unit_name):
                            current_power=current_power,
                            current_sticky=current_sticky)
 
+def _validate_bulk_ranks(payload, data):
+    """
+    בדיקת בקשת דירוג מרוכזת מול ה-DB. מחזיר (רשימת שמות, עדכונים לכל יחידה, שגיאות).
+    כל השגיאות נאספות יחד, כדי שהלקוח יוכל לתקן הכל בסבב אחד.
+    """
+    errors = []
+    index = StudentIndex(data['students'])
+    names = payload.get('students')
+    if names is None:
+        names = index.names()
+    elif not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+        return None, None, ['students חייב להיות רשימת שמות (מחרוזות)']
+
+    unknown = [n for n in names if n not in index]
+    if unknown:
+        errors.append(f"{len(unknown)} סטודנטים לא קיימים במערכת: {', '.join(map(str, unknown[:10]))}")
+    if len(set(names)) != len(names):
+        errors.append("שמות כפולים ברשימת students")
+
+    units_payload = payload.get('units')
+    if not isinstance(units_payload, dict) or not units_payload:
+        return names, None, errors + ['units חייב להיות אובייקט: שם יחידה -> {ranks, power, sticky_power}']
+
+    updates = {}
+    for unit_name, spec in units_payload.items():
+        if unit_name not in data['units']:
+            errors.append(f"היחידה '{unit_name}' לא קיימת")
+            continue
+        if isinstance(spec, list):
+            spec = {'ranks': spec}
+        if not isinstance(spec, dict):
+            errors.append(f"ליחידה '{unit_name}' צריך רשימת דירוגים או אובייקט {{ranks, power, sticky_power}}")
+            continue
+        update = {}
+        if 'ranks' in spec:
+            ranks = spec['ranks']
+            if not isinstance(ranks, list) or len(ranks) != len(names):
+                errors.append(f"ליחידה '{unit_name}' צריך {len(names)} דירוגים (אחד לכל סטודנט, null = ללא דירוג)")
+                continue
+            ranks = [int(r) if isinstance(r, float) and r.is_integer() else r for r in ranks]
+            invalid = [r for r in ranks if r is not None and (isinstance(r, bool) or not isinstance(r, int))]
+            if invalid:
+                errors.append(f"דירוגים לא תקינים ליחידה '{unit_name}': {invalid[:5]}")
+                continue
+            update['prefs'] = ranks_to_tiers({n: r for n, r in zip(names, ranks) if r is not None})
+        if 'power' in spec:
+            try:
+                update['power'] = float(spec['power'])
+            except (TypeError, ValueError):
+                errors.append(f"Power לא תקין ליחידה '{unit_name}'")
+        if 'sticky_power' in spec:
+            update['sticky_power'] = bool(spec['sticky_power'])
+        updates[unit_name] = update
+
+    return names, updates, errors
+
+@app.route('/rank_bulk', methods=['POST'])
+def rank_bulk():
+    """
+    דירוג מרוכז של יחידה אחת או כמה יחידות בבקשת JSON אחת ושמירה אחת.
+    פורמט: {"students": [שמות...], "units": {"8200": {"ranks": [1, null, 2, ...], "power": 5, "sticky_power": true}}}
+    ranks מיושר לרשימת students (ברירת מחדל: סדר הסטודנטים ב-DB). null = הסטודנט לא מדורג.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'success': False, 'errors': ['גוף הבקשה חייב להיות JSON']}), 400
+
+    errors = []
+    try:
+        with db_transaction() as data:
+            _, updates, errors = _validate_bulk_ranks(payload, data)
+            if errors:
+                # חריגה בתוך הטרנזקציה = שום דבר לא נשמר
+                raise ValueError(errors)
+            for unit_name, update in updates.items():
+                data['units'][unit_name].update(update)
+    except ValueError:
+        return jsonify({'success': False, 'errors': errors}), 400
+
+    return jsonify({'success': True, 'updated_units': list(updates.keys())})
+
 @app.route('/download_excel')
 def download_excel():
-    data = load_db()
-    # נריץ חישוב מהיר כדי לקבל את המצב העדכני (או שנשמור ב-session, כרגע נריץ שוב)
-    (matches, reasons), _ = run_optimized_matching(data['students'], data['units'])
-    
-    # בניית הדאטה-פריים לאקסל
-    export_data = []
-    for student_name, unit_name in matches.items():
-        export_data.append({
-            "שם הסטודנט": student_name,
-            "יחידה משובצת": unit_name if unit_name else "לא שובץ",
-            "הסבר לשיבוץ": reasons.get(student_name, ""),
-            "כוח היחידה": data['units'].get(unit_name, {}).get('power', 0) if unit_name else 0
-        })
-    
-    df = pd.DataFrame(export_data)
-    
-    # יצירת קובץ בזיכרון (ללא שמירה לדיסק)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='תוצאות שיבוץ')
-        
-        # התאמת רוחב עמודות (קוסמטיקה לאקסל)
-        worksheet = writer.sheets['תוצאות שיבוץ']
-        for column_cells in worksheet.columns:
-            length = max(len(str(cell.value)) for cell in column_cells)
-            worksheet.column_dimensions[column_cells[0].column_letter].width = length + 2
+    """תוצאות השיבוץ כ-Excel - השיבוץ והקובץ מחושבים פעם אחת לכל גרסה של ה-DB"""
+    def build():
+        data = load_db()
+        (matches, reasons), _ = run_optimized_matching(data['students'], data['units'])
 
-    output.seek(0)
-    
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='placement_results.xlsx'
-    )
+        # בניית הדאטה-פריים לאקסל
+        export_data = []
+        for student_name, unit_name in matches.items():
+            export_data.append({
+                "שם הסטודנט": student_name,
+                "יחידה משובצת": unit_name if unit_name else "לא שובץ",
+                "הסבר לשיבוץ": reasons.get(student_name, ""),
+                "כוח היחידה": data['units'].get(unit_name, {}).get('power', 0) if unit_name else 0
+            })
+
+        import pandas as pd
+        return dataframe_to_xlsx(pd.DataFrame(export_data), 'תוצאות שיבוץ')
+
+    return db_artifact('placement_results', build, 'placement_results.xlsx')
+
+def render_results(matches, reasons, units, calculated_powers=None, message='',
+                   optimization_type='', gamma=None, students=None, source=None):
+    """
+    בונה את מודל התצוגה פעם אחת, שומר אותו במטמון ומציג את עמוד התוצאות.
+    source - מקור הנתונים ({'db': True} או {'class': שם}), לבדיקת איכות ב-Worker אחר.
+    """
+    view = build_results_view(matches, reasons, units, calculated_powers=calculated_powers,
+                              message=message, optimization_type=optimization_type, gamma=gamma,
+                              students=students, source=source)
+    result_cache.put(view)
+    return results_response(view)
+
+def results_response(view):
+    """תוצאה שמורה לא משתנה - ה-result_id משמש כ-ETag"""
+    response = make_response(render_template('results.html', view=view))
+    response.set_etag(view['result_id'])
+    return response
+
+@app.route('/results/<result_id>')
+def view_results(result_id):
+    """הצגה מחדש של תוצאה שמורה במטמון - בלי להריץ שוב את השיבוץ"""
+    view = result_cache.get(result_id)
+    if view is None:
+        flash("❌ התוצאה כבר לא זמינה, יש להריץ שוב", 'danger')
+        return redirect(url_for('index'))
+    if request.if_none_match.contains_weak(result_id):
+        return '', 304, {'ETag': f'"{result_id}"'}
+    return results_response(view)
+
+@app.route('/results/<result_id>/students')
+def results_students(result_id):
+    """
+    רשימת הסטודנטים וההסברים של יחידה אחת בעמודים (JSON).
+    פרמטרים: unit (ריק = לא משובצים), offset, limit
+    """
+    view = result_cache.get(result_id)
+    if view is None:
+        return jsonify({'success': False, 'error': 'התוצאה לא נמצאה'}), 404
+
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(500, max(1, request.args.get('limit', PAGE_SIZE, type=int)))
+    page = page_students(view, request.args.get('unit', ''), offset, limit)
+    if page is None:
+        return jsonify({'success': False, 'error': 'היחידה לא נמצאה'}), 404
+    return jsonify({'success': True, **page})
+
+def audit_inputs(view):
+    """
+    (students, units, matches) שהשיבוץ רץ עליהם: מהזיכרון, או - לתוצאה שנטענה מהקובץ המשותף -
+    טעינה מחדש מהמקור, רק אם התקציר שלהם עדיין זהה לזה שנשמר עם התוצאה. אחרת None.
+    """
+    if view.get('_students') is not None:
+        return view['_students'], view['_units'], view['_matches']
+    source = view.get('_source') or {}
+    if source.get('class'):
+        data = get_class(source['class'])
+    elif source.get('db'):
+        data, _ = db_snapshot()
+    else:
+        return None
+    if data is None:
+        return None
+    students, units = data.get('students', []), data.get('units', {})
+    if data_fingerprint(students, units) != view.get('_fingerprint'):
+        return None
+    return students, units, view_matches(view)
+
+@app.route('/results/<result_id>/audit')
+def results_audit(result_id):
+    """
+    בדיקת איכות של תוצאה שמורה (JSON): זוגות חוסמים, התפלגות דירוגים, ניצולת וקנאה.
+    מחושבת בבקשה הראשונה (לא בזמן הריצה עצמה) ונשמרת יחד עם התוצאה.
+    """
+    view = result_cache.get(result_id)
+    if view is None:
+        return jsonify({'success': False, 'error': 'התוצאה לא נמצאה'}), 404
+    if '_audit' not in view:
+        inputs = audit_inputs(view)
+        if inputs is None:
+            return jsonify({'success': False,
+                            'error': 'הנתונים שהשיבוץ רץ עליהם השתנו או נמחקו מאז - יש להריץ שוב'}), 409
+        view['_audit'] = audit_placement(*inputs, view['gamma'], powers=view['_powers'])
+        result_cache.save(view)
+    return jsonify({'success': True, **view['_audit']})
+
+@app.after_request
+def compress_large_html(response):
+    """עמודי HTML גדולים (בעיקר עמוד התוצאות) נשלחים דחוסים"""
+    return gzip_response(response, request.headers.get('Accept-Encoding', ''))
+
+def bound_note(stats):
+    """תוספת להודעת התוצאה: המינימום האפשרי של לא משובצים (כשהוא לא 0)"""
+    bound = stats.get('unmatched_bound')
+    if not bound:
+        return ""
+    return f" · גם בשיבוץ הטוב ביותר האפשרי {bound} סטודנטים נשארים בלי יחידה (אין יחידה עם מקום שמדרגת אותם)"
 
 @app.route('/run')
 def run_matching():
     """ריצה רגילה - עם ה-Power הנוכחי, מוצא רק Gamma אופטימלי"""
     data = load_db()
-    (matches, reasons), best_gamma = run_optimized_matching(data['students'], data['units'])
-    
-    # --- הכנת נתונים לתצוגה לפי יחידות (Grouping) ---
-    units_grouped = {u: [] for u in data['units'].keys()}
-    unmatched = []
-    
-    for student, unit in matches.items():
-        if unit:
-            if unit in units_grouped:
-                units_grouped[unit].append(student)
-        else:
-            unmatched.append(student)
-            
-    # חישוב תפוסה לגרפים
-    stats = {
-        "labels": list(data['units'].keys()),
-        "assigned": [len(units_grouped[u]) for u in data['units']],
-        "capacity": [data['units'][u]['capacity'] for u in data['units']]
-    }
-    
-    # העברת Power ערכים הנוכחיים כמו calculated powers (לא שונו בריצה רגילה)
-    calculated_powers = {u: data['units'][u]['power'] for u in data['units']}
+    stats = {}
+    (matches, reasons), best_gamma = run_optimized_matching(data['students'], data['units'], stats=stats)
+    
+    # ריצה רגילה לא משנה Power - מוצגים הערכים הנוכחיים של היחידות
+    return render_results(matches, reasons, data['units'],
+                          message=f"שיבוץ הושלם (Gamma: {best_gamma}){bound_note(stats)}",
+                          optimization_type="רגיל",
+                          gamma=best_gamma,
+                          students=data['students'],
+                          source={'db': True})
 
-    return render_template('results.html', 
-                           matches=matches, 
-                           reasons=reasons, 
-                           units_data=data['units'],
-                           calculated_powers=calculated_powers,
-                           units_grouped=units_grouped,
-                           unmatched=unmatched,
-                           stats=stats,
-                           message=f"שיבוץ הושלם (Gamma: {best_gamma})",
-                           optimization_type="רגיל")
+def apply_optimized_powers(units, best_powers):
+    """עדכון ה-Power שנמצא באופטימיזציה - רק ליחידות שאינן Sticky ושעדיין קיימות"""
+    for unit_name, new_power in best_powers.items():
+        if unit_name in units and not units[unit_name].get('sticky_power', False):
+            units[unit_name]['power'] = new_power
 
 @app.route('/run_unified')
 def run_unified():
@@ -390,47 +620,29 @@ def run_unified():
         data['units'][unit_name]['prefs'] = [student_names] if student_names else []
     
     # הרץ אופטימיזציה מלאה
+    stats = {}
     (matches, reasons), best_gamma, best_powers = run_full_optimization(
         data['students'], 
         data['units'], 
-        iterations=200
+        iterations=200,
+        stats=stats
     )
     
     # --- עדכון ה-Power המצוי ב-DB (רק ליחידות שאינן Sticky) ---
-    for unit_name, new_power in best_powers.items():
-        if not data['units'][unit_name].get('sticky_power', False):
-            data['units'][unit_name]['power'] = new_power
-    
-    save_db(data)
-    
-    # --- הכנת נתונים לתצוגה לפי יחידות (Grouping) ---
-    units_grouped = {u: [] for u in data['units'].keys()}
-    unmatched = []
-    
-    for student, unit in matches.items():
-        if unit:
-            if unit in units_grouped:
-                units_grouped[unit].append(student)
-        else:
-            unmatched.append(student)
-            
-    # חישוב תפוסה לגרפים
-    stats = {
-        "labels": list(data['units'].keys()),
-        "assigned": [len(units_grouped[u]) for u in data['units']],
-        "capacity": [data['units'][u]['capacity'] for u in data['units']]
-    }
-
-    return render_template('results.html', 
-                           matches=matches, 
-                           reasons=reasons, 
-                           units_data=data['units'],
-                           calculated_powers=best_powers,
-                           units_grouped=units_grouped,
-                           unmatched=unmatched,
-                           stats=stats,
-                           message=f"🚀 ריצה מהירה עם אופטימיזציה מלאה הושלמה! (Gamma: {best_gamma})",
-                           optimization_type="ריצה מהירה - אופטימיזציה")
+    # האופטימיזציה רצה בלי נעילה; רק העדכון עצמו נעשה בטרנזקציה על הגרסה העדכנית
+    with db_transaction() as fresh:
+        for unit_name in fresh['units']:
+            fresh['units'][unit_name]['prefs'] = [student_names] if student_names else []
+        apply_optimized_powers(fresh['units'], best_powers)
+    apply_optimized_powers(data['units'], best_powers)
+    
+    return render_results(matches, reasons, data['units'],
+                          calculated_powers=best_powers,
+                          message=f"🚀 ריצה מהירה עם אופטימיזציה מלאה הושלמה! (Gamma: {best_gamma}){bound_note(stats)}",
+                          optimization_type="ריצה מהירה - אופטימיזציה",
+                          gamma=best_gamma,
+                          students=data['students'],
+                          source={'db': True})
 
 @app.route('/run_full_optimization')
 def run_full_opt():
@@ -439,99 +651,179 @@ def run_full_opt():
     יחידות עם sticky_power=True ישמרו את ה-Power שלהן.
     """
     data = load_db()
+    stats = {}
+    # היסטוריית הכיוונון של ה-DB הנוכחי יושבת ליד db.json
+    history = TuningHistory(os.path.join(os.path.dirname(os.path.abspath(DB_FILE)), HISTORY_FILE))
     (matches, reasons), best_gamma, best_powers = run_full_optimization(
         data['students'], 
         data['units'], 
-        iterations=200
+        iterations=200,
+        stats=stats,
+        history=history
     )
     
     # --- עדכון ה-Power המצוי ב-DB (רק ליחידות שאינן Sticky) ---
-    for unit_name, new_power in best_powers.items():
-        if not data['units'][unit_name].get('sticky_power', False):
-            data['units'][unit_name]['power'] = new_power
-    
-    save_db(data)
-    
-    # --- הכנת נתונים לתצוגה ---
-    units_grouped = {u: [] for u in data['units'].keys()}
-    unmatched = []
-    
-    for student, unit in matches.items():
-        if unit:
-            if unit in units_grouped:
-                units_grouped[unit].append(student)
-        else:
-            unmatched.append(student)
-            
-    stats = {
-        "labels": list(data['units'].keys()),
-        "assigned": [len(units_grouped[u]) for u in data['units']],
-        "capacity": [data['units'][u]['capacity'] for u in data['units']]
-    }
-
-    return render_template('results.html', 
-                           matches=matches, 
-                           reasons=reasons, 
-                           units_data=data['units'],
-                           calculated_powers=best_powers,
-                           units_grouped=units_grouped,
-                           unmatched=unmatched,
-                           stats=stats,
-                           message=f"שיבוץ אופטימלי הושלם! (Gamma: {best_gamma})",
-                           optimization_type="מלא")
+    with db_transaction() as fresh:
+        apply_optimized_powers(fresh['units'], best_powers)
+    apply_optimized_powers(data['units'], best_powers)
+    
+    return render_results(matches, reasons, data['units'],
+                          calculated_powers=best_powers,
+                          message=f"שיבוץ אופטימלי הושלם! (Gamma: {best_gamma}){bound_note(stats)}",
+                          optimization_type="מלא",
+                          gamma=best_gamma,
+                          students=data['students'],
+                          source={'db': True})
 
 @app.route('/run_class_optimized/<class_name>')
 def run_class_optimized(class_name):
     """הרצה אופטימלית של כיתה שמורה"""
-    data = load_db()
-    saved_classes = data.get('saved_classes', {})
+    class_data = get_class(class_name)
     
-    if class_name not in saved_classes:
+    if class_data is None:
         flash(f"❌ הכיתה '{class_name}' לא נמצאה", 'danger')
         return redirect(url_for('classes_management'))
     
-    class_data = saved_classes[class_name]
     students = class_data.get('students', [])
     units = class_data.get('units', {})
     
     try:
+        stats = {}
+        # היסטוריית הכיוונון נשמרת בתיקיית הכיתה (ונמחקת יחד איתה)
+        migrate_legacy_classes()
+        history = TuningHistory(os.path.join(class_dir(classes_root(), class_name), HISTORY_FILE))
         (matches, reasons), best_gamma, best_powers = run_full_optimization(
             students, 
             units, 
-            iterations=200
+            iterations=200,
+            stats=stats,
+            history=history
         )
         
-        units_grouped = {u: [] for u in units.keys()}
-        unmatched = []
-        
-        for student, unit in matches.items():
-            if unit:
-                if unit in units_grouped:
-                    units_grouped[unit].append(student)
-            else:
-                unmatched.append(student)
-        
-        stats = {
-            "labels": list(units.keys()),
-            "assigned": [len(units_grouped[u]) for u in units],
-            "capacity": [units[u]['capacity'] for u in units]
-        }
-        
-        return render_template('results.html', 
-                               matches=matches, 
-                               reasons=reasons, 
-                               units_data=units,
-                               calculated_powers=best_powers,
-                               units_grouped=units_grouped,
-                               unmatched=unmatched,
-                               stats=stats,
-                               message=f"🎯 שיבוץ אופטימלי לכיתה '{class_name}' הושלם! (Gamma: {best_gamma})",
-                               optimization_type="כיתה שמורה - אופטימיזציה")
+        return render_results(matches, reasons, units,
+                              calculated_powers=best_powers,
+                              message=f"🎯 שיבוץ אופטימלי לכיתה '{class_name}' הושלם! (Gamma: {best_gamma}){bound_note(stats)}",
+                              optimization_type="כיתה שמורה - אופטימיזציה",
+                              gamma=best_gamma,
+                              students=students,
+                              source={'class': class_name})
     except Exception as e:
         print(f"שגיאה בהרצה: {e}")
         flash(f"❌ שגיאה בחישוב: {str(e)}", 'danger')
         return redirect(url_for('classes_management'))
 
+@app.route('/what_if', methods=['POST'])
+def what_if():
+    """
+    השוואת תרחישים של שינויי Power / Capacity מול השיבוץ הנוכחי, בבקשה אחת.
+    פורמט: {"class_name": אופציונלי, "gamma": אופציונלי,
+            "scenarios": [{"name": "8200 חזקה", "changes": [{"unit": "8200", "power": 20}, {"unit": "Y", "capacity_delta": 3}]}]}
+    לכל תרחיש מוחזרים: לא משובצים, דירוג ממוצע, כמה סטודנטים זזו (וההפרשים מול הבסיס).
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'success': False, 'errors': ['גוף הבקשה חייב להיות JSON']}), 400
+
+    class_name = payload.get('class_name')
+    if class_name:
+        data = get_class(class_name)
+        if data is None:
+            return jsonify({'success': False, 'errors': [f"הכיתה '{class_name}' לא נמצאה"]}), 404
+    else:
+        data, _ = db_snapshot()
+
+    result, errors = run_scenarios(data.get('students', []), data.get('units', {}), payload)
+    if errors:
+        return jsonify({'success': False, 'errors': errors}), 400
+    return jsonify(dict(result, success=True))
+
+@app.route('/pareto', methods=['POST'])
+def pareto():
+    """
+    חזית פרטו של תצורות Gamma/Power: לא משובצים, דירוג ממוצע ואחוזון 90 של הסטודנטים, ורמת הסטודנטים ביחידות.
+    פורמט (הכל אופציונלי): {"class_name": "...", "iterations": 200, "seed": 1}
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        iterations = max(0, min(int(payload.get('iterations', 200)), 2000))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'errors': ['iterations חייב להיות מספר שלם']}), 400
+    seed = payload.get('seed')
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+        return jsonify({'success': False, 'errors': ['seed חייב להיות מספר שלם או null']}), 400
+
+    class_name = payload.get('class_name')
+    if class_name:
+        data = get_class(class_name)
+        if data is None:
+            return jsonify({'success': False, 'errors': [f"הכיתה '{class_name}' לא נמצאה"]}), 404
+    else:
+        data, _ = db_snapshot()
+
+    result = pareto_frontier(data.get('students', []), data.get('units', {}),
+                             iterations=iterations, seed=seed)
+    return jsonify(dict(result, success=True))
+
+@app.route('/unit_profile/<unit_name>', methods=['POST'])
+def update_unit_profile(unit_name):
+    """
+    הוספה/עדכון של פרופיל יחידה (JSON: profile, capacity).
+    מחשב רק את עמודת המרחקים של היחידה ומעדכן את העדפות הסטודנטים - בלי העלאה מחדש של קובץ הסטודנטים.
+    """
+    request_data = request.get_json(silent=True) or {}
+    profile = request_data.get('profile')
+    if profile is None:
+        return jsonify({'success': False, 'error': 'חסר פרופיל יחידה'}), 400
+    if not isinstance(profile, list) or not all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in profile):
+        return jsonify({'success': False, 'error': 'פרופיל היחידה חייב להיות רשימת מספרים'}), 400
+    capacity = None
+    if 'capacity' in request_data:
+        raw = request_data['capacity']
+        try:
+            capacity = None if isinstance(raw, bool) else int(raw)
+        except (TypeError, ValueError, OverflowError):
+            capacity = None
+        if capacity is None or capacity < 0:
+            return jsonify({'success': False, 'error': 'Capacity חייב להיות מספר שלם אי-שלילי'}), 400
+
+    try:
+        with db_transaction() as data:
+            if not has_vectors(data, DB_FILE):
+                raise ValueError('אין וקטורי סטודנטים שמורים - העלה קודם קובץ סטודנטים')
+
+            unit = data['units'].setdefault(unit_name, {
+                "capacity": 5,  # ברירת מחדל
+                "prefs": [],
+                "power": 1.0,
+                "sticky_power": False
+            })
+            if capacity is not None:
+                unit['capacity'] = capacity
+
+            upsert_unit_profile(data, DB_FILE, unit_name, profile)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    return jsonify({'success': True, 'message': f'היחידה {unit_name} עודכנה'})
+
+@app.route('/delete_unit/<unit_name>', methods=['POST'])
+def delete_unit(unit_name):
+    """מחיקת יחידה - הסרת עמודת המרחקים שלה והוצאתה מרשימות ההעדפות"""
+    with db_transaction() as data:
+        if unit_name in data['units']:
+            del data['units'][unit_name]
+            if has_vectors(data, DB_FILE):
+                remove_unit_profile(data, DB_FILE, unit_name)
+            else:
+                for s in data['students']:
+                    if unit_name in s.get('prefs', []):
+                        s['prefs'].remove(unit_name)
+
+    if request.is_json:
+        return jsonify({'success': True})
+    return redirect(url_for('units_management'))
+
 @app.route('/units_management')
 def units_management():
     """דף ניהול דירוג היחידות"""
@@ -563,87 +855,60 @@ def upload_units_excel():
     if f:
         try:
             df = read_uploaded_file(f)
-            data = load_db()
+            prefs_by_unit, errors = parse_unit_rankings(df)
             
-            # קורא את העמודה הראשונה (שמות יחידות)
-            first_col_name = df.columns[0]
+            with db_transaction() as data:
+                for unit_name, final_prefs in prefs_by_unit.items():
+                    # אם היחידה לא קיימת, תוסיף אותה
+                    if unit_name not in data['units']:
+                        data['units'][unit_name] = {
+                            "capacity": 5,  # ברירת מחדל
+                            "prefs": [],
+                            "power": 1.0,
+                            "sticky_power": False
+                        }
+                    data['units'][unit_name]['prefs'] = final_prefs
             
-            for _, row in df.iterrows():
-                unit_name = str(row[first_col_name]).strip()
-                
-                if not unit_name or unit_name.lower() == 'nan':
-                    continue
-                
-                # אם היחידה לא קיימת, תוסיף אותה
-                if unit_name not in data['units']:
-                    data['units'][unit_name] = {
-                        "capacity": 5,  # ברירת מחדל
-                        "prefs": [],
-                        "power": 1.0,
-                        "sticky_power": False
-                    }
-                
-                # אוסף את הדירוגים מכל העמודות האחרות
-                tier_map = {}
-                for col_idx in range(1, len(df.columns)):
-                    student_name = df.columns[col_idx]
-                    rating_val = row.iloc[col_idx]
-                    
-                    if pd.notna(rating_val) and str(rating_val).strip() != '':
-                        try:
-                            rank = int(rating_val)
-                            if rank not in tier_map:
-                                tier_map[rank] = []
-                            tier_map[rank].append(student_name)
-                        except:
-                            pass
-                
-                # מיון הקבוצות לפי דירוג
-                sorted_keys = sorted(tier_map.keys())
-                final_prefs = [tier_map[k] for k in sorted_keys]
-                
-                data['units'][unit_name]['prefs'] = final_prefs
-            
-            save_db(data)
+            flash(f"✅ עודכנו דירוגים ל-{len(prefs_by_unit)} יחידות", 'success')
+            if errors:
+                # מציגים את כל השגיאות יחד (עד 10 לדוגמה) במקום לבלוע אותן בשקט
+                shown = '; '.join(errors[:10])
+                more = f" (ועוד {len(errors) - 10})" if len(errors) > 10 else ""
+                flash(f"⚠️ {len(errors)} ערכים לא נקלטו: {shown}{more}", 'warning')
         except Exception as e:
             print(f"שגיאה בעיבוד Units Excel: {e}")
+            flash(f"❌ שגיאה בעיבוד הקובץ: {str(e)}", 'danger')
     
     return redirect(url_for('units_management'))
 
 @app.route('/download_units_template')
 def download_units_template():
-    """הורדה של תבנית Excel לדירוג יחידות"""
-    data = load_db()
-    
-    # יצירת דאטא לדוגמה
-    template_data = {
-        "שם יחידה": list(data['units'].keys()) if data['units'] else ["יחידה 1", "יחידה 2"]
-    }
-    
-    # הוספת שמות סטודנטים כעמודות
-    student_names = [s.get('name', f'סטודנט {i}') for i, s in enumerate(data['students'])]
-    for name in student_names[:10]:  # עד 10 סטודנטים בתבנית
-        template_data[name] = [1, 2] * 5  # דוגמה לדירוגים
-    
-    df = pd.DataFrame(template_data)
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='דירוג יחידות')
-        
-        worksheet = writer.sheets['דירוג יחידות']
-        for column_cells in worksheet.columns:
-            length = max(len(str(cell.value)) for cell in column_cells)
-            worksheet.column_dimensions[column_cells[0].column_letter].width = length + 2
-    
-    output.seek(0)
-    
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='units_ranking_template.xlsx'
-    )
+    """הורדה של תבנית Excel לדירוג יחידות (נבנית מחדש רק כשהיחידות או הסטודנטים משתנים)"""
+    def build():
+        data = load_db()
+
+        # יצירת דאטא לדוגמה
+        template_data = {
+            "שם יחידה": list(data['units'].keys()) if data['units'] else ["יחידה 1", "יחידה 2"]
+        }
+
+        # הוספת שמות סטודנטים כעמודות
+        student_names = [s.get('name', f'סטודנט {i}') for i, s in enumerate(data['students'])]
+        rows = len(template_data["שם יחידה"])
+        for name in student_names[:10]:  # עד 10 סטודנטים בתבנית
+            template_data[name] = [1 + i % 2 for i in range(rows)]  # דוגמה לדירוגים (1, 2, 1, ...)
+
+        import pandas as pd
+        return dataframe_to_xlsx(pd.DataFrame(template_data), 'דירוג יחידות')
+
+    return db_artifact('units_template', build, 'units_ranking_template.xlsx')
+
+def sample_artifact(name, sample_data, sheet_name, download_name):
+    """קבצי הדוגמה קבועים - נבנים פעם אחת לתהליך (גרסה SAMPLES_VERSION)"""
+    def build():
+        import pandas as pd
+        return dataframe_to_xlsx(pd.DataFrame(sample_data), sheet_name)
+    return send_artifact(name, SAMPLES_VERSION, build, download_name)
 
 @app.route('/download_students_sample')
 def download_students_sample():
@@ -654,26 +919,7 @@ def download_students_sample():
         'שאלה 2': [1, 3, 2, 2, 1],
         'שאלה 3': [2, 1, 3, 1, 3],
     }
-    
-    df = pd.DataFrame(sample_data)
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='דירוגים')
-        
-        worksheet = writer.sheets['דירוגים']
-        for column_cells in worksheet.columns:
-            length = max(len(str(cell.value)) for cell in column_cells)
-            worksheet.column_dimensions[column_cells[0].column_letter].width = length + 2
-    
-    output.seek(0)
-    
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='sample_students.xlsx'
-    )
+    return sample_artifact('students_sample', sample_data, 'דירוגים', 'sample_students.xlsx')
 
 @app.route('/download_units_sample')
 def download_units_sample():
@@ -691,33 +937,13 @@ def download_units_sample():
         'Q8': [3, 1, 5, 2],
         'Q9': [4, 1, 5, 2],
     }
-    
-    df = pd.DataFrame(sample_data)
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='יחידות')
-        
-        worksheet = writer.sheets['יחידות']
-        for column_cells in worksheet.columns:
-            length = max(len(str(cell.value)) for cell in column_cells)
-            worksheet.column_dimensions[column_cells[0].column_letter].width = length + 2
-    
-    output.seek(0)
-    
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name='sample_units.xlsx'
-    )
+    return sample_artifact('units_sample', sample_data, 'יחידות', 'sample_units.xlsx')
 
 
 @app.route('/classes')
 def classes_management():
     """דף ניהול כיתות שמורות"""
-    data = load_db()
-    saved_classes = data.get('saved_classes', {})
+    saved_classes = saved_class_manifests()
     
     return render_template('classes.html', 
                            classes=saved_classes,
@@ -734,69 +960,41 @@ def save_class():
     
     data = load_db()
     
-    # וידוא שקיים מפתח saved_classes
-    if 'saved_classes' not in data:
-        data['saved_classes'] = {}
-    
-    # שמירת הכיתה עם המצב הנוכחי
-    # חשוב: אנחנו משמרים עותק מהנתונים, לא הפניה
-    current_students = json.loads(json.dumps(data.get('students', [])))
-    current_units = json.loads(json.dumps(data.get('units', {})))
-    
-    data['saved_classes'][class_name] = {
-        'students': current_students,
-        'units': current_units,
+    # שמירת הכיתה עם המצב הנוכחי כ-Snapshot נפרד (לא בתוך db.json)
+    migrate_legacy_classes()
+    edit_buffer.discard(class_name)
+    write_class_snapshot(classes_root(), class_name, {
+        'students': data.get('students', []),
+        'units': data.get('units', {}),
         'description': class_description,
-        'created_date': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')
-    }
+        'created_date': datetime.now().strftime('%Y-%m-%d %H:%M')
+    })
     
-    save_db(data)
     return redirect(url_for('classes_management'))
 
 @app.route('/load_class/<class_name>')
 def load_class(class_name):
     """טעינת כיתה שמורה וביצוע חישוב"""
-    data = load_db()
-    saved_classes = data.get('saved_classes', {})
+    class_data = get_class(class_name)
     
-    if class_name not in saved_classes:
+    if class_data is None:
         return redirect(url_for('classes_management'))
     
-    class_data = saved_classes[class_name]
-    
     # עתיד לטמפורריות - לא שומרים בחזרה ל-db
     students = class_data.get('students', [])
     units = class_data.get('units', {})
     
     # ריצת חישוב אופטימלי
     try:
-        (matches, reasons), best_gamma = run_optimized_matching(students, units)
-        
-        units_grouped = {u: [] for u in units.keys()}
-        unmatched = []
-        
-        for student, unit in matches.items():
-            if unit:
-                if unit in units_grouped:
-                    units_grouped[unit].append(student)
-            else:
-                unmatched.append(student)
-        
-        stats = {
-            "labels": list(units.keys()),
-            "assigned": [len(units_grouped[u]) for u in units],
-            "capacity": [units[u]['capacity'] for u in units]
-        }
+        stats = {}
+        (matches, reasons), best_gamma = run_optimized_matching(students, units, stats=stats)
         
-        return render_template('results.html', 
-                               matches=matches, 
-                               reasons=reasons, 
-                               units_data=units,
-                               units_grouped=units_grouped,
-                               unmatched=unmatched,
-                               stats=stats,
-                               message=f"שיבוץ לכיתה '{class_name}' הושלם! (Gamma: {best_gamma})",
-                               optimization_type="כיתה שמורה")
+        return render_results(matches, reasons, units,
+                              message=f"שיבוץ לכיתה '{class_name}' הושלם! (Gamma: {best_gamma}){bound_note(stats)}",
+                              optimization_type="כיתה שמורה",
+                              gamma=best_gamma,
+                              students=students,
+                              source={'class': class_name})
     except Exception as e:
         print(f"שגיאה בטעינת כיתה: {e}")
         return redirect(url_for('classes_management'))
@@ -804,14 +1002,11 @@ def load_class(class_name):
 @app.route('/edit_class/<class_name>')
 def edit_class(class_name):
     """עדכון כיתה שמורה"""
-    data = load_db()
-    saved_classes = data.get('saved_classes', {})
+    class_data = get_class(class_name)
     
-    if class_name not in saved_classes:
+    if class_data is None:
         return redirect(url_for('classes_management'))
     
-    class_data = saved_classes[class_name]
-    
     return render_template('edit_class.html',
                            class_name=class_name,
                            class_data=class_data,
@@ -829,23 +1024,16 @@ def update_class():
         if not class_name:
             return jsonify({'success': False, 'error': 'שם הכיתה חסר'}), 400
         
-        data = load_db()
-        saved_classes = data.get('saved_classes', {})
-        
-        if class_name not in saved_classes:
-            print(f"ERROR: Class {class_name} not found in saved_classes")
-            print(f"Available classes: {list(saved_classes.keys())}")
-            return jsonify({'success': False, 'error': 'כיתה לא נמצאה'}), 404
-        
         print(f"Updating class: {class_name}")
         print(f"Units count: {len(updated_units)}")
         
-        # עדכון היחידות בכיתה השמורה
-        saved_classes[class_name]['units'] = updated_units
-        data['saved_classes'] = saved_classes
-        
-        # שמירה לDB
-        save_db(data)
+        # עדכון היחידות בכיתה השמורה - הכתיבה ל-Snapshot נדחית ומתאחדת עם עריכות נוספות
+        try:
+            migrate_legacy_classes()
+            edit_buffer.replace_units(class_name, updated_units)
+        except KeyError:
+            print(f"ERROR: Class {class_name} not found in saved_classes")
+            return jsonify({'success': False, 'error': 'כיתה לא נמצאה'}), 404
         print(f"Class {class_name} updated successfully")
         
         return jsonify({'success': True, 'message': f'כיתה {class_name} עודכנה בהצלחה'})
@@ -855,17 +1043,69 @@ def update_class():
         print(f"Error updating class: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/patch_class', methods=['POST'])
+def patch_class():
+    """
+    עדכון חלקי של כיתה שמורה: רשימת Patches לכל יחידה (העברות בין רמות, כוח, ברזל, קיבולת).
+    התשובה חוזרת מיד אחרי ההחלה בזיכרון; הכתיבה לדיסק מתבצעת באיחור ומאחדת רצף עריכות.
+    """
+    request_data = request.get_json(silent=True) or {}
+    class_name = request_data.get('class_name')
+    patches = request_data.get('patches', [])
+    
+    if not class_name:
+        return jsonify({'success': False, 'error': 'שם הכיתה חסר'}), 400
+    if not isinstance(patches, list) or not all(isinstance(p, dict) for p in patches):
+        return jsonify({'success': False, 'error': 'patches חייב להיות רשימה של אובייקטים'}), 400
+    
+    try:
+        migrate_legacy_classes()
+        applied = edit_buffer.apply(class_name, patches)
+    except KeyError:
+        return jsonify({'success': False, 'error': 'כיתה לא נמצאה'}), 404
+    except PatchError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({'success': True, 'applied': applied})
+
 @app.route('/delete_class/<class_name>', methods=['POST'])
 def delete_class(class_name):
     """מחיקת כיתה שמורה"""
-    data = load_db()
-    saved_classes = data.get('saved_classes', {})
-    
-    if class_name in saved_classes:
-        del data['saved_classes'][class_name]
-        save_db(data)
+    migrate_legacy_classes()
+    edit_buffer.discard(class_name)
+    delete_class_snapshot(classes_root(), class_name)
     
     return redirect(url_for('classes_management'))
 
+# --- ניהול פרופילים (Admin) ---
+
+def _admin_token():
+    """הטוקן מה-Header או מ-?token= (דף הניהול עצמו לא נמדד)"""
+    return request.headers.get(PROFILE_HEADER) or request.args.get('token', '')
+
+@app.route('/admin/profiles')
+def admin_profiles():
+    """רשימת הפרופילים האחרונים שנשמרו"""
+    token = _admin_token()
+    if not token_matches(token):
+        return "Not Found", 404
+    return render_template('admin_profiles.html', profiles=list_profiles(), token=token,
+                           header=PROFILE_HEADER, param=PROFILE_PARAM)
+
+@app.route('/admin/profiles/<name>')
+def admin_profile(name):
+    """סיכום pstats של פרופיל אחד, או הורדה של הקובץ (?file=prof / ?file=folded)"""
+    if not token_matches(_admin_token()):
+        return "Not Found", 404
+    kind = request.args.get('file')
+    path = profile_path(name, '.' + (kind or 'prof'))
+    if path is None:
+        return "Not Found", 404
+    if kind:
+        return send_file(os.path.abspath(path), as_attachment=True, download_name=os.path.basename(path))
+    return profile_summary(path), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    migrate_legacy_classes()
+    # threaded=True: כל בקשה ב-Thread משלה; הנעילות ב-db_lock ובכל כיתה שומרות על עקביות הנתונים
+    app.run(debug=True, port=5001, threaded=True)
\ No newline at end of file
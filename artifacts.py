@@ -0,0 +1,81 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+# --- קבצים מחושבים מראש ותשובות מותנות (Conditional responses) ---
+# קבצי ההורדה (Excel) נבנים פעם אחת לכל גרסת נתונים ונשמרים בזיכרון עם ETag / Last-Modified.
+# דפדפן שכבר מחזיק את הגרסה מקבל 304 בלי בנייה מחדש, ועמודי HTML גדולים נשלחים דחוסים (gzip).
+
+GZIP_MIN_SIZE = 16 * 1024     # מתחת לזה הדחיסה לא שווה את הזמן
+GZIP_LEVEL = 6
+
+Artifact = namedtuple('Artifact', ['data', 'etag', 'last_modified'])
+
+def version_etag(name, version):
+    """ETag יציב לשם + גרסה (זהה בכל תהליכי השרת, לא תלוי בתוכן הבינארי של הקובץ)"""
+    return hashlib.sha1(repr((name, version)).encode()).hexdigest()[:20]
+
+class ArtifactCache:
+    """
+    מטמון LRU של קבצים מחושבים לפי (שם, גרסה). בנייה של אותו שם מתבצעת פעם אחת
+    גם כשכמה בקשות מגיעות יחד - השאר ממתינות לתוצאה.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._items = OrderedDict()
+
+    def _lookup(self, key):
+        with self._lock:
+            artifact = self._items.get(key)
+            if artifact is not None:
+                self._items.move_to_end(key)
+            return artifact
+
+    def get(self, name, version, build, last_modified=None, still_valid=None):
+        """
+        build() מחזיר bytes. still_valid() (אופציונלי) נבדק אחרי הבנייה -
+        אם הנתונים השתנו בזמן הבנייה, הקובץ מוחזר אבל לא נשמר.
+        """
+        key = (name, version)
+        artifact = self._lookup(key)
+        if artifact is not None:
+            return artifact
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            artifact = self._lookup(key)
+            if artifact is not None:
+                return artifact
+            artifact = Artifact(build(), version_etag(name, version), last_modified)
+            if still_valid is None or still_valid():
+                with self._lock:
+                    # גרסאות ישנות של אותו קובץ כבר לא יוגשו
+                    for old in [k for k in self._items if k[0] == name]:
+                        del self._items[old]
+                    self._items[key] = artifact
+                    while len(self._items) > self.max_entries:
+                        self._items.popitem(last=False)
+            return artifact
+
+def gzip_response(response, accept_encoding):
+    """דחיסת תשובת HTML גדולה כשהלקוח תומך ב-gzip (מחזיר את אותו אובייקט)"""
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype != 'text/html'
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in accept_encoding.lower()):
+        return response
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    if response.get_etag()[0]:
+        # ETag חלש: אותו תוכן בקידוד אחר
+        response.set_etag(response.get_etag()[0], weak=True)
+    return response
@@ -0,0 +1,175 @@
+import time
+from itertools import repeat
+
+# --- בדיקת איכות ויציבות של שיבוץ (Audit) ---
+# מקבל את התוצאה של weighted_gale_shapley (matches) ואת הנתונים שהיא רצה עליהם, ומחשב:
+#   זוגות חוסמים (Blocking pairs) - סטודנט s ויחידה u שמדרגת אותו, כאשר לפי כלל הניקוד של האלגוריתם
+#       voice*(n-rank) + gamma*power ל-s עדיף u על השיבוץ הנוכחי, ול-u יש מקום פנוי או שיבוץ
+#       מ-Tier גרוע יותר מזה של s.
+#   התפלגות הדירוגים בכל יחידה (איזו עדיפות של הסטודנט קיבל), ניצולת מכסה, וקנאה (Envy):
+#       כמה סטודנטים רואים אחרים משובצים ליחידה שדירגו גבוה יותר משלהם, ומתוכם "מוצדקת" -
+#       כשהיחידה מדרגת אותם גבוה יותר ממי שקיבל את המקום.
+# הכל על מטריצות מספרים (סטודנטים x יחידות) ב-NumPy, בלי לולאות מקוננות ב-Python.
+# ה-voice מחושב כמו ב-explain_matching: הקול השמור + מספר ההופעות ברשימות היחידות.
+
+RANK_BINS = 5            # עדיפויות 1..5 מוצגות בנפרד, השאר תחת "6+"
+BLOCKING_PREVIEW = 50    # כמה זוגות חוסמים מוחזרים בשמות
+
+def _first_occurrence(shape, rows, cols, values, missing):
+    """
+    מטריצה בגודל shape עם הערך של ההופעה הראשונה (הקטן ביותר - הרשימות עולות) של כל (שורה, עמודה),
+    ו-missing (מספר או מטריצה) בתאים שלא הופיעו. קוד -1 (שם לא מוכר) מדולג.
+    """
+    import numpy as np
+    empty = np.iinfo(np.int64).max
+    matrix = np.full(shape, empty, dtype=np.int64)
+    valid = cols >= 0
+    np.minimum.at(matrix.ravel(), rows[valid] * shape[1] + cols[valid], values[valid])
+    return np.where(matrix == empty, missing, matrix)
+
+def _flatten(lists, index):
+    """
+    רשימות עם Tiers (מחרוזת או רשימת מחרוזות) -> (שורה, קוד, Tier) לכל רשומה, קוד -1 לשם לא מוכר.
+    רשימה שכולה מחרוזות (המקרה הנפוץ) מקודדת ב-map אחד וה-Tier הוא המיקום ברשימה;
+    רק רשימה עם Tiers מקבוצות נפרשת אחד-אחד.
+    """
+    import numpy as np
+    get = index.get
+    codes, counts, grouped = [], [], {}
+    for i, prefs in enumerate(lists):
+        before = len(codes)
+        try:
+            codes.extend(map(get, prefs, repeat(-1)))
+        except TypeError:   # יש Tier שהוא רשימה (לא hashable)
+            del codes[before:]
+            sizes = grouped[i] = []
+            for tier in prefs:
+                members = tier if isinstance(tier, list) else [tier]
+                codes.extend(map(get, members, repeat(-1)))
+                sizes.append(len(members))
+        counts.append(len(codes) - before)
+
+    counts = np.array(counts, dtype=np.int64)
+    rows = np.repeat(np.arange(len(lists)), counts)
+    starts = np.cumsum(counts) - counts
+    tiers = np.arange(len(codes)) - starts[rows]
+    for i, sizes in grouped.items():
+        tiers[starts[i]:starts[i] + counts[i]] = np.repeat(np.arange(len(sizes)), sizes)
+    return rows, np.array(codes, dtype=np.int64), tiers
+
+def audit_placement(students_data, units_data, matches, gamma, powers=None):
+    """
+    בדיקת שיבוץ: matches - {שם סטודנט: שם יחידה / None} כפי שהחזיר weighted_gale_shapley,
+    powers - ה-Power שבו השיבוץ רץ (ברירת מחדל: ה-Power השמור של כל יחידה).
+    מחזיר מילון שאפשר לשלוח כ-JSON.
+    """
+    import numpy as np
+    start = time.perf_counter()
+    powers = powers or {}
+    gamma = 1.0 if gamma is None else gamma
+    students = {sd['name']: sd for sd in students_data}   # שם כפול - האחרון קובע, כמו ב-explain_matching
+    student_names = list(students)
+    unit_names = list(units_data)
+    n_students, n_units = len(student_names), len(unit_names)
+    student_index = {name: i for i, name in enumerate(student_names)}
+    unit_index = {name: j for j, name in enumerate(unit_names)}
+
+    # דירוג הסטודנטים: rank[s, u] = מיקום ה-Tier הראשון שמכיל את u, או אורך הרשימה
+    pref_lists = [students[name]['prefs'] for name in student_names]
+    lengths = np.array([len(p) for p in pref_lists], dtype=np.int64)
+    rows, codes, tiers = _flatten(pref_lists, unit_index)
+    rank = _first_occurrence((n_students, n_units), rows, codes, tiers, lengths[:, None])
+
+    # דירוג היחידות: tier[s, u] = ה-Tier הראשון של s ברשימה של u, או -1 כשלא מופיע
+    unit_rows, unit_codes, unit_tiers = _flatten([units_data[u]['prefs'] for u in unit_names], student_index)
+    listed_codes = unit_codes[unit_codes >= 0]
+    tier = _first_occurrence((n_units, n_students), unit_rows, unit_codes, unit_tiers, -1).T
+    listed = tier >= 0
+
+    voice = np.array([float(students[name].get('voice', 1.0)) for name in student_names])
+    voice += np.bincount(listed_codes, minlength=n_students)   # boost_voice_by_demand (כולל כפילויות)
+    power = np.array([float(powers.get(u, units_data[u].get('power', 1.0))) for u in unit_names])
+    capacity = np.array([int(units_data[u]['capacity']) for u in unit_names], dtype=np.int64)
+
+    match = np.array([unit_index.get(matches.get(name), -1) if matches.get(name) else -1
+                      for name in student_names], dtype=np.int64)
+    assigned = match >= 0
+    who = np.flatnonzero(assigned)
+    at = match[assigned]
+    count = np.bincount(at, minlength=n_units)
+
+    # --- זוגות חוסמים ---
+    score = voice[:, None] * (n_units - rank) + gamma * power[None, :]
+    current = np.full(n_students, -np.inf)
+    current[who] = score[who, at]
+    # סטודנט משובץ שהיחידה לא מדרגת בכלל נחשב הגרוע ביותר שלה
+    worst_tier = np.full(n_units, -1, dtype=np.int64)
+    assigned_tier = np.where(listed[who, at], tier[who, at], np.iinfo(np.int64).max)
+    np.maximum.at(worst_tier, at, assigned_tier)
+    open_seat = count < capacity
+    blocking = (listed
+                & (score > current[:, None])
+                & (np.arange(n_units)[None, :] != match[:, None])
+                & (open_seat[None, :] | (tier < worst_tier[None, :])))
+    block_s, block_u = np.nonzero(blocking)
+
+    # --- התפלגות דירוגים וניצולת ---
+    own_rank = lengths.copy()
+    own_rank[who] = rank[who, at]
+    bins = np.bincount(at * (RANK_BINS + 1) + np.minimum(own_rank[who], RANK_BINS),
+                       minlength=n_units * (RANK_BINS + 1)).reshape(n_units, RANK_BINS + 1)
+    rank_sum = np.bincount(at, weights=own_rank[who] + 1, minlength=n_units)
+
+    # --- קנאה ---
+    better = rank < own_rank[:, None]              # יחידות שהסטודנט מעדיף על מה שקיבל
+    envy = (better @ count.astype(float)).astype(np.int64)   # כמה סטודנטים יושבים ביחידות האלה
+    # מוצדקת: היחידה מדרגת את s לפני מי שמשובץ בה. below[u, t] = משובצים ב-u עם Tier גרוע מ-t
+    width = int(tier.max()) + 2 if tier.size else 1
+    held = np.bincount(at * width + np.minimum(assigned_tier, width - 1),
+                       minlength=n_units * width).reshape(n_units, width)
+    below = held[:, ::-1].cumsum(axis=1)[:, ::-1] - held
+    justified = np.where(better & listed, below[np.arange(n_units)[None, :], np.maximum(tier, 0)], 0).sum(axis=1)
+
+    per_unit = []
+    block_count = np.bincount(block_u, minlength=n_units)
+    for j, name in enumerate(unit_names):
+        per_unit.append({
+            'name': name,
+            'capacity': int(capacity[j]),
+            'assigned': int(count[j]),
+            'utilisation': round(float(count[j] / capacity[j]), 4) if capacity[j] else None,
+            'mean_rank': round(float(rank_sum[j] / count[j]), 3) if count[j] else None,
+            'ranks': bins[j].tolist(),
+            'blocking_pairs': int(block_count[j]),
+        })
+
+    total_capacity = int(capacity.sum())
+    return {
+        'students': n_students,
+        'units': n_units,
+        'gamma': gamma,
+        'matched': int(assigned.sum()),
+        'unmatched': int(n_students - assigned.sum()),
+        'stable': len(block_s) == 0,
+        'blocking_pairs': int(len(block_s)),
+        'blocking_students': int(len(np.unique(block_s))),
+        'blocking_preview': [
+            {'student': student_names[s], 'unit': unit_names[u],
+             'current': unit_names[match[s]] if match[s] >= 0 else None,
+             'rank': int(rank[s, u]) + 1,
+             'current_rank': int(own_rank[s]) + 1 if match[s] >= 0 else None}
+            for s, u in zip(block_s[:BLOCKING_PREVIEW].tolist(), block_u[:BLOCKING_PREVIEW].tolist())
+        ],
+        'rank_labels': [str(i + 1) for i in range(RANK_BINS)] + [f"{RANK_BINS + 1}+"],
+        'rank_totals': bins.sum(axis=0).tolist(),
+        'mean_rank': round(float(own_rank[who].mean() + 1), 3) if len(who) else None,
+        'utilisation': round(int(assigned.sum()) / total_capacity, 4) if total_capacity else None,
+        'envy': {
+            'students': int((envy > 0).sum()),
+            'pairs': int(envy.sum()),
+            'justified_students': int((justified > 0).sum()),
+            'justified_pairs': int(justified.sum()),
+        },
+        'per_unit': per_unit,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+    }
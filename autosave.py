@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import atexit
+import threading
+from collections import ChainMap
+from class_store import read_class_snapshot, write_class_snapshot, class_dir, class_lock
+
+# --- שמירה אוטומטית (Autosave) של עריכות כיתה ---
+# עריכות מגיעות כ-Patch לכל יחידה. אחרי בדיקה הן נרשמות כשורה ביומן (pending.jsonl בתיקיית הכיתה),
+# והתשובה חוזרת מיד. כתיבת ה-Snapshot נדחית (Debounce): רצף עריכות מהיר מתאחד לכתיבה אחת,
+# שמחילה את כל היומן על ה-Snapshot ומוחקת אותו.
+# היומן נמצא על הדיסק ותחת נעילת הכיתה (class_lock), ולכן כל Worker (תהליך) רואה את העריכות
+# הממתינות של כל האחרים, ועריכה שלא נכתבה עדיין ל-Snapshot לא הולכת לאיבוד בקריסה.
+# כל תהליך שומר בזיכרון את המצב המפוענח של כל כיתה, לפי גרסת ה-Snapshot והמיקום שעד אליו היומן
+# כבר הוחל: בקשה קוראת מהיומן רק שורות חדשות (של תהליכים אחרים), ועריכה רק מוסיפה שורה.
+
+JOURNAL_FILE = 'pending.jsonl'
+
+UNIT_FIELDS = {'capacity': int, 'power': float, 'sticky_power': bool}
+PREF_OPS = ('prefs', 'add_tier', 'remove_tier', 'add_to_tier', 'remove_from_tier', 'move')
+
+class PatchError(ValueError):
+    pass
+
+def _tier_list(tier):
+    if isinstance(tier, str):
+        return [tier]
+    if not isinstance(tier, list) or not all(isinstance(s, str) for s in tier):
+        raise PatchError(f"רמת דירוג לא תקינה: {tier!r}")
+    return list(tier)
+
+def _student_op(patch, key):
+    """פעולה מהצורה {student, tier} - נבדק שהיא אובייקט ושהסטודנט הוא מחרוזת"""
+    op = patch[key]
+    if not isinstance(op, dict) or not isinstance(op.get('student'), str):
+        raise PatchError(f"{key} חייב להיות אובייקט עם student (מחרוזת) ו-tier")
+    return op
+
+def _check_tier(prefs, idx):
+    if not isinstance(idx, int) or not 0 <= idx < len(prefs):
+        raise PatchError(f"רמת דירוג {idx} לא קיימת")
+
+def apply_unit_patch(units, patch):
+    """
+    החלת Patch אחד על יחידה. פעולות נתמכות (אפשר כמה באותו Patch):
+      capacity / power / sticky_power      - עדכון ערך
+      prefs                                - החלפת כל רמות הדירוג של היחידה
+      add_tier: true                       - הוספת רמה ריקה בסוף
+      remove_tier: i                       - מחיקת רמה
+      add_to_tier: {student, tier}         - הוספת סטודנט לרמה (אם לא קיים בה)
+      remove_from_tier: {student, tier}    - הסרת סטודנט מרמה
+      move: {student, tier}                - הוצאה מכל הרמות והכנסה לרמה (tier=None מבטל דירוג)
+    """
+    unit_name = patch.get('unit')
+    if not isinstance(unit_name, str) or unit_name not in units:
+        raise PatchError(f"היחידה '{unit_name}' לא קיימת בכיתה")
+    unit = units[unit_name]
+
+    for field, cast in UNIT_FIELDS.items():
+        if field in patch:
+            try:
+                unit[field] = cast(patch[field])
+            except (TypeError, ValueError):
+                raise PatchError(f"ערך לא תקין לשדה {field}: {patch[field]!r}")
+
+    if not any(op in patch for op in PREF_OPS):
+        return
+
+    prefs = [_tier_list(t) for t in unit.get('prefs', []) if t != '']
+    if 'prefs' in patch:
+        if not isinstance(patch['prefs'], list):
+            raise PatchError("prefs חייב להיות רשימה של רמות")
+        prefs = [_tier_list(t) for t in patch['prefs'] if t != '']
+    if patch.get('add_tier'):
+        prefs.append([])
+    if 'remove_tier' in patch:
+        _check_tier(prefs, patch['remove_tier'])
+        prefs.pop(patch['remove_tier'])
+    if 'add_to_tier' in patch:
+        op = _student_op(patch, 'add_to_tier')
+        _check_tier(prefs, op.get('tier'))
+        if op.get('student') not in prefs[op['tier']]:
+            prefs[op['tier']].append(op.get('student'))
+    if 'remove_from_tier' in patch:
+        op = _student_op(patch, 'remove_from_tier')
+        _check_tier(prefs, op.get('tier'))
+        prefs[op['tier']] = [s for s in prefs[op['tier']] if s != op.get('student')]
+    if 'move' in patch:
+        op = _student_op(patch, 'move')
+        target = op.get('tier')
+        prefs = [[s for s in tier if s != op.get('student')] for tier in prefs]
+        if target is not None:
+            if target == len(prefs):
+                prefs.append([])
+            _check_tier(prefs, target)
+            prefs[target].append(op.get('student'))
+
+    unit['prefs'] = prefs
+
+def normalize_unit_prefs(units, unit_names):
+    """הסרת רמות ריקות בסוף אצווה (כמו ששמירת המודאל בעמוד העריכה עושה)"""
+    for unit_name in unit_names:
+        units[unit_name]['prefs'] = [t for t in units[unit_name].get('prefs', []) if t]
+
+def apply_entry(units, entry):
+    """
+    יחידות חדשות אחרי שורת יומן אחת ({'patches': [...]} או {'units': {...}}).
+    רק היחידות שה-Patches נוגעים בהן מועתקות, והמילון שהתקבל לא משתנה - מי שקרא אותו קודם
+    (בקשה אחרת באמצע ריצה) ממשיך לראות מצב שלם. Patch לא תקין זורק PatchError.
+    """
+    if 'units' in entry:
+        return entry['units']
+    units = dict(units)
+    copied = set()
+    for patch in entry['patches']:
+        unit_name = patch.get('unit')
+        if isinstance(unit_name, str) and unit_name in units and unit_name not in copied:
+            units[unit_name] = dict(units[unit_name])
+            copied.add(unit_name)
+        apply_unit_patch(units, patch)
+    normalize_unit_prefs(units, copied)
+    return units
+
+class ClassEditBuffer:
+    """
+    עריכות כיתה עם יומן על הדיסק + כתיבה נדחית של ה-Snapshot.
+    delay - כמה שניות של שקט לפני כתיבה; max_delay - זמן מקסימלי שעריכה יכולה לחכות לכתיבה;
+    retry_delay - המתנה לפני ניסיון חוזר כשכתיבה נכשלה (העריכות נשארות ביומן).
+    """
+
+    def __init__(self, root_getter, delay=1.0, max_delay=5.0, retry_delay=5.0):
+        self._root_getter = root_getter
+        self.delay = delay
+        self.max_delay = max_delay
+        self.retry_delay = retry_delay
+        self._lock = threading.RLock()
+        self._dirty_since = {}   # כיתות שהתהליך הזה תזמן להן כתיבה
+        self._timers = {}
+        # מצב מפוענח לכל כיתה. נעילה נפרדת שלא מוחזקת אף פעם בזמן המתנה לנעילת כיתה
+        self._state_lock = threading.Lock()
+        self._states = {}
+
+    def _journal(self, root, class_name):
+        return os.path.join(class_dir(root, class_name), JOURNAL_FILE)
+
+    def _version(self, root, class_name):
+        """(גרסת ה-manifest, ה-inode של היומן או None) - או None כשהכיתה לא קיימת"""
+        try:
+            st = os.stat(os.path.join(class_dir(root, class_name), 'manifest.json'))
+        except FileNotFoundError:
+            return None
+        try:
+            journal = os.stat(self._journal(root, class_name))
+        except FileNotFoundError:
+            journal = None
+        return ((st.st_ino, st.st_mtime_ns, st.st_size), journal and journal.st_ino), journal
+
+    def _state(self, root, class_name):
+        """
+        המצב השמור של הכיתה, מעודכן עד סוף היומן. הקורא מחזיק את נעילת הכיתה.
+        Snapshot חדש (flush של תהליך כלשהו) או יומן אחר (discard) - טעינה מחדש של ה-Snapshot;
+        אחרת מוחלות רק השורות שנוספו מאז. None אם הכיתה לא קיימת.
+        """
+        found = self._version(root, class_name)
+        with self._state_lock:
+            if found is None:
+                self._states.pop(class_name, None)
+                return None
+            version, journal = found
+            state = self._states.get(class_name)
+            size = journal.st_size if journal else 0
+            if state is None or state['version'] != version or state['offset'] > size:
+                snapshot = read_class_snapshot(root, class_name, lock=False)
+                if snapshot is None:
+                    return None
+                state = {'version': version, 'snapshot': snapshot, 'units': None, 'offset': 0, 'size': 0}
+            if state['size'] < size:
+                state = self._replay(root, class_name, state, size)
+            self._states[class_name] = state
+            return state
+
+    def _replay(self, root, class_name, state, size):
+        """החלת שורות היומן מ-offset. שורה חלקית בסוף (כתיבה שנקטעה) לא מקדמת את offset"""
+        units, offset = state['units'], state['offset']
+        with open(self._journal(root, class_name), 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue   # שורה פגומה - העריכה הזו לא אושרה ללקוח
+                units = apply_entry(state['snapshot']['units'] if units is None else units, entry)
+        return dict(state, units=units, offset=offset, size=size)
+
+    @staticmethod
+    def _current(state):
+        """בלי עריכות - ה-Snapshot עצמו (מפוענח רק לפי דרישה); אחרת היחידות הערוכות מעליו"""
+        if state['units'] is None:
+            return state['snapshot']
+        return ChainMap({'units': state['units']}, state['snapshot'])
+
+    def _load(self, root, class_name):
+        """(המצב העדכני, האם יש עריכות ממתינות) - Snapshot + היומן. הקורא מחזיק את נעילת הכיתה"""
+        state = self._state(root, class_name)
+        if state is None:
+            return None, False
+        return self._current(state), state['version'][1] is not None
+
+    def get(self, class_name):
+        """המצב העדכני של כיתה (כולל עריכות שטרם נכתבו ל-Snapshot, גם של תהליכים אחרים)"""
+        root = self._root_getter()
+        if not os.path.isdir(class_dir(root, class_name)):
+            return None   # בלי ליצור קובץ נעילה (ותיקיית כיתות) לכיתה שלא קיימת
+        with class_lock(root, class_name).read():
+            return self._load(root, class_name)[0]
+
+    def _append(self, class_name, entry):
+        """
+        רישום שורה ביומן תחת נעילת הכתיבה של הכיתה ותזמון כתיבה. השורה מוחלת קודם על המצב
+        שבזיכרון - Patch לא תקין נזרק כאן (PatchError) ושום דבר לא נרשם.
+        """
+        root = self._root_getter()
+        with class_lock(root, class_name).write():
+            state = self._state(root, class_name)
+            if state is None:
+                raise KeyError(class_name)
+            units = apply_entry(self._current(state)['units'], entry)
+            line = json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n'
+            if state['offset'] < state['size']:
+                line = b'\n' + line   # סוגרים שורה חלקית מכתיבה שנקטעה, כדי שלא תידבק לשורה הזו
+            path = self._journal(root, class_name)
+            with open(path, 'ab') as f:
+                f.write(line)
+            size = state['size'] + len(line)
+            with self._state_lock:
+                self._states[class_name] = dict(state, units=units, offset=size, size=size,
+                                                version=(state['version'][0], os.stat(path).st_ino))
+        with self._lock:
+            self._schedule(class_name)
+
+    def apply(self, class_name, patches):
+        """מחיל רשימת Patches באופן אטומי (או כולם או אף אחד) ומתזמן כתיבה"""
+        self._append(class_name, {'patches': patches})
+        return len(patches)
+
+    def replace_units(self, class_name, units):
+        """החלפת כל היחידות (ה-API הישן של update_class) - גם היא עוברת דרך הכתיבה הנדחית"""
+        self._append(class_name, {'units': units})
+
+    def _schedule(self, class_name):
+        now = time.monotonic()
+        first = self._dirty_since.setdefault(class_name, now)
+        self._start_timer(class_name, max(0.0, min(self.delay, first + self.max_delay - now)))
+
+    def _start_timer(self, class_name, wait):
+        timer = self._timers.pop(class_name, None)
+        if timer:
+            timer.cancel()
+        timer = threading.Timer(wait, self.flush, args=(class_name,))
+        timer.daemon = True
+        self._timers[class_name] = timer
+        timer.start()
+
+    def flush(self, class_name=None):
+        """
+        כתיבת עריכות ממתינות ל-Snapshot (כיתה אחת, או כל מה שהתהליך תזמן כש-class_name=None).
+        היומן נמחק רק אחרי שהכתיבה הצליחה; כתיבה שנכשלה מתוזמנת שוב אחרי retry_delay.
+        מחזיר את שמות הכיתות שהכתיבה שלהן נכשלה.
+        """
+        failed = []
+        with self._lock:
+            names = [class_name] if class_name is not None else list(self._dirty_since)
+            if not names:
+                return failed   # אין מה לכתוב - לא נוגעים בדיסק (גם ביציאה מתהליך שלא ערך כלום)
+            root = self._root_getter()
+            for name in names:
+                timer = self._timers.pop(name, None)
+                if timer:
+                    timer.cancel()
+                try:
+                    with class_lock(root, name).write():
+                        current, pending = self._load(root, name)
+                        if pending:   # אחרת תהליך אחר כבר כתב (או שהכיתה נמחקה)
+                            write_class_snapshot(root, name, current, lock=False)
+                            os.remove(self._journal(root, name))
+                            with self._state_lock:
+                                self._states.pop(name, None)   # נטען מחדש מה-Snapshot החדש
+                except Exception as e:
+                    print(f"⚠️ שמירת הכיתה '{name}' נכשלה ({e}) - העריכות נשמרות ביומן וננסה שוב")
+                    failed.append(name)
+                    self._start_timer(name, self.retry_delay)
+                    continue
+                self._dirty_since.pop(name, None)
+        return failed
+
+    def discard(self, class_name):
+        """ביטול עריכות ממתינות (למשל כשהכיתה נמחקת או נשמרת מחדש)"""
+        root = self._root_getter()
+        with self._lock:
+            timer = self._timers.pop(class_name, None)
+            if timer:
+                timer.cancel()
+            self._dirty_since.pop(class_name, None)
+        with class_lock(root, class_name).write():
+            try:
+                os.remove(self._journal(root, class_name))
+            except FileNotFoundError:
+                pass
+            with self._state_lock:
+                self._states.pop(class_name, None)
+
+    def pending(self):
+        with self._lock:
+            return list(self._dirty_since)
+
+def create_edit_buffer(root_getter, **kwargs):
+    buffer = ClassEditBuffer(root_getter, **kwargs)
+    atexit.register(buffer.flush)  # לא מאבדים עריכות כשהשרת נסגר
+    return buffer
@@ -0,0 +1,125 @@
+"""
+בדיקת audit.audit_placement: השוואה לחישוב ישיר בלולאות Python (get_rank, רשימות היחידות)
+על הרבה מקרים אקראיים, ומדידת זמן על כיתה גדולה.
+
+הרצה:  python bench/audit_check.py [--cases 500] [--students 10000] [--units 200] [--seed 0]
+
+המקרים האקראיים הם אותם מקרים של kernel_equivalence (שמות לא מוכרים, Tiers, כפילויות, Capacity 0),
+והשיבוץ שנבדק הוא הפלט האמיתי של weighted_gale_shapley - ובחלק מהמקרים שיבוץ שקולקל בכוונה,
+כדי שיהיו גם זוגות חוסמים וגם יחידות מלאות מעל ה-Tier של המבקשים.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import Student, University, boost_voice_by_demand, get_rank
+from audit import audit_placement, RANK_BINS
+from kernel_equivalence import random_class, reference as run_matching
+
+def brute_force(students_data, units_data, matches, gamma):
+    """אותם מדדים ישירות מההגדרה, זוג אחר זוג"""
+    s = {sd['name']: Student(sd['name'], sd['prefs'], sd['voice']) for sd in students_data}
+    u = {name: University(name, ud['capacity'], ud['prefs'], ud['power']) for name, ud in units_data.items()}
+    boost_voice_by_demand(s, u)
+    n = len(u)
+    score = lambda st, un: st.voice * (n - get_rank(st, un.name)) + gamma * un.power
+
+    def unit_tier(un, name):
+        for t, tier in enumerate(un.preferences):
+            if name == tier or (isinstance(tier, list) and name in tier):
+                return t
+        return None
+
+    holders = {name: [st for st in s if matches.get(st) == name] for name in u}
+    blocking = set()
+    for st in s.values():
+        current = matches.get(st.name)
+        for un in u.values():
+            t = unit_tier(un, st.name)
+            if t is None or un.name == current:
+                continue
+            if current is not None and score(st, un) <= score(st, u[current]):
+                continue
+            held = [unit_tier(un, other) for other in holders[un.name]]
+            held = [float('inf') if h is None else h for h in held]
+            if len(held) < un.capacity or (held and t < max(held)):
+                blocking.add((st.name, un.name))
+
+    envy = justified = 0
+    ranks = {name: [0] * (RANK_BINS + 1) for name in u}
+    for st in s.values():
+        current = matches.get(st.name)
+        own = get_rank(st, current) if current else len(st.preferences)
+        if current:
+            ranks[current][min(own, RANK_BINS)] += 1
+        for other, where in matches.items():
+            if where and where != current and get_rank(st, where) < own:
+                envy += 1
+                t, t_other = unit_tier(u[where], st.name), unit_tier(u[where], other)
+                if t is not None and (t_other is None or t < t_other):
+                    justified += 1
+    return blocking, envy, justified, ranks
+
+def spoil(rng, matches, units_data):
+    """שיבוץ לא יציב: העברה אקראית של חלק מהסטודנטים (גם מעבר ל-Capacity) או ביטול שיבוץ"""
+    matches = dict(matches)
+    units = list(units_data)
+    for name in rng.sample(list(matches), len(matches) // 4):
+        matches[name] = rng.choice(units + [None])
+    return matches
+
+def check(cases, seed):
+    rng = random.Random(seed)
+    blocking_seen = 0
+    for case in range(cases):
+        students, units_data = random_class(rng)
+        gamma = rng.choice([0.5, 1.0, 2.5])
+        matches = run_matching(students, units_data, gamma)
+        if case % 2:
+            matches = spoil(rng, matches, units_data)
+
+        result = audit_placement(students, units_data, matches, gamma)
+        blocking, envy, justified, ranks = brute_force(students, units_data, matches, gamma)
+        assert result['blocking_pairs'] == len(blocking), (case, result['blocking_pairs'], len(blocking))
+        assert {(p['student'], p['unit']) for p in result['blocking_preview']} <= blocking, case
+        assert result['envy']['pairs'] == envy, (case, result['envy'], envy)
+        assert result['envy']['justified_pairs'] == justified, (case, result['envy'], justified)
+        assert [u['ranks'] for u in result['per_unit']] == [ranks[name] for name in units_data], case
+        blocking_seen += len(blocking)
+    print(f"✅ {cases} מקרים זהים לחישוב הישיר ({blocking_seen} זוגות חוסמים בסך הכל)")
+
+def large_class(rng, n_students, n_units):
+    units = [f'יחידה {j}' for j in range(n_units)]
+    names = [f'סטודנט {i}' for i in range(n_students)]
+    students = [{'name': n, 'prefs': rng.sample(units, n_units), 'voice': 1.0} for n in names]
+    per_unit = n_students // n_units + 1
+    units_data = {u: {'capacity': per_unit, 'prefs': [names], 'power': round(rng.uniform(0.5, 50.0), 1)}
+                  for u in units}
+    matches = {n: (units[i % n_units] if i % 50 else None) for i, n in enumerate(names)}
+    return students, units_data, matches
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cases', type=int, default=500)
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--units', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    check(args.cases, args.seed)
+
+    students, units_data, matches = large_class(random.Random(args.seed), args.students, args.units)
+    times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        result = audit_placement(students, units_data, matches, 1.0)
+        times.append(time.perf_counter() - start)
+    print(f"{args.students} סטודנטים x {args.units} יחידות: {min(times) * 1000:.0f}ms "
+          f"(זוגות חוסמים: {result['blocking_pairs']}, קנאה: {result['envy']['pairs']})")
+
+if __name__ == '__main__':
+    main()
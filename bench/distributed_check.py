@@ -0,0 +1,104 @@
+"""
+בדיקת המצב המבוזר על localhost: מרים כמה Workers (תהליכים נפרדים), מריץ את run_full_optimization
+רציף ומבוזר עם אותו Seed ומשווה את התוצאה (Gamma, Power, שיבוץ). בריצה נוספת Worker אחד
+נהרג באמצע וכתובת אחת לא קיימת - התוצאה חייבת להישאר זהה.
+
+הרצה:  python bench/distributed_check.py [--workers 3] [--students 3000] [--units 25] [--iterations 200]
+
+הזמן המבוזר משקף את מספר הליבות במכונה: על ליבה אחת ה-Workers מתחלקים בה ולכן איטיים מהרציף.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import logic
+import distributed
+
+KILL_AFTER = 20   # תוצאות שנרשמו לפני שה-Worker הראשון נהרג
+
+def synthetic_class(n_students, n_units, seed=0):
+    """
+    כיתה שבה החסם לא מושג, כדי שהחיפוש ירוץ על כל המועמדים (ו-Worker ייהרג באמצע).
+    היחידות בזוגות (A, B) עם אותה קיבולת: קבוצה X מדרגת A ואז B, קבוצה Y רק את A, ושתי היחידות
+    מעדיפות את X. שיבוץ מלא קיים (X ל-B, Y ל-A), אבל X עוברים ל-B רק כש-Gamma * (Power של B פחות
+    Power של A) גדול מה-Voice שלהם - וזה צריך לקרות בכל הזוגות באותה תצורה.
+    """
+    rng = random.Random(seed)
+    pairs = max(1, n_units // 2)
+    size = max(1, n_students // (2 * pairs))
+    students, units_data = [], {}
+    for k in range(pairs):
+        a, b = f'יחידה {2 * k}', f'יחידה {2 * k + 1}'
+        x = [f'סטודנט {k}-x{i}' for i in range(size)]
+        y = [f'סטודנט {k}-y{i}' for i in range(size)]
+        students += [{'name': n, 'prefs': [a, b], 'voice': 40.0} for n in x]
+        students += [{'name': n, 'prefs': [a], 'voice': 1.0} for n in y]
+        units_data[a] = {'capacity': size, 'prefs': [x, y], 'power': round(rng.uniform(0.5, 50.0), 1)}
+        units_data[b] = {'capacity': size, 'prefs': [x], 'power': round(rng.uniform(0.5, 50.0), 1)}
+    return students, units_data
+
+def start_worker(port):
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, 'distributed.py'), 'worker', '--port', str(port)],
+                            cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()   # "Worker מאזין ..."
+    return proc
+
+def run(students, units, iterations, spec):
+    os.environ['SMARTPLACE_WORKERS'] = spec
+    random.seed(1234)
+    stats = {}
+    start = time.perf_counter()
+    (matches, _), gamma, powers = logic.run_full_optimization(students, units, iterations, stats=stats)
+    return (matches, gamma, powers), time.perf_counter() - start, stats
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--students', type=int, default=3000)
+    parser.add_argument('--units', type=int, default=25)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--base-port', type=int, default=7170)
+    args = parser.parse_args()
+
+    students, units = synthetic_class(args.students, args.units)
+    ports = [args.base_port + i for i in range(args.workers)]
+    workers = [start_worker(p) for p in ports]
+    spec = ','.join(f'127.0.0.1:{p}' for p in ports)
+    try:
+        sequential, t_seq, _ = run(students, units, args.iterations, '')
+        print(f"רציף:   {t_seq:.2f}s")
+
+        distributed_result, t_dist, stats = run(students, units, args.iterations, spec)
+        print(f"מבוזר:  {t_dist:.2f}s  {stats.get('distributed')}")
+        assert distributed_result == sequential, 'התוצאה המבוזרת שונה מהרציפה'
+
+        # Worker נהרג באמצע החיפוש (אחרי שכבר נרשמו תוצאות), ועוד כתובת שאף אחד לא מאזין בה
+        record = distributed._Search.record
+        def record_and_kill(search, *result):
+            record(search, *result)
+            if len(search.results) >= KILL_AFTER and workers[0].poll() is None:
+                workers[0].kill()
+        distributed._Search.record = record_and_kill
+        dead_port = args.base_port + args.workers
+        try:
+            faulty, t_fault, stats = run(students, units, args.iterations, spec + f',127.0.0.1:{dead_port}')
+        finally:
+            distributed._Search.record = record
+        print(f"עם נפילות: {t_fault:.2f}s  {stats.get('distributed')}")
+        assert faulty == sequential, 'התוצאה עם Worker שנפל שונה מהרציפה'
+        assert stats['distributed']['failed'] >= 2, 'ה-Worker שנהרג והכתובת המתה לא נספרו ככשלונות'
+        assert stats['distributed']['requeued'] > 0, 'אף מנה לא הוחזרה לתור - ה-Worker נהרג אחרי סוף החיפוש'
+        print("OK: אותה תוצאה בכל המצבים")
+    finally:
+        for w in workers:
+            w.kill()
+        os.environ.pop('SMARTPLACE_WORKERS', None)
+
+if __name__ == '__main__':
+    main()
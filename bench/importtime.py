@@ -0,0 +1,75 @@
+"""
+מדידת זמן עליית השרת בעזרת python -X importtime.
+
+הרצה:  python bench/importtime.py [--runs 5] [--top 15]
+
+הסקריפט מייבא את app בתהליך נקי כמה פעמים ומדפיס את הזמן המצטבר (החציון) של app,
+את המודולים הכבדים ביותר, ובודק ש-pandas / openpyxl / NumPy לא נטענים בעלייה
+ולא בעמודים שלא צריכים אותם. להשוואה מול הגרסה הקודמת: --baseline
+מודד גם את ייבוא pandas עצמו (מה שכל Worker שילם קודם בעלייה).
+"""
+import os
+import sys
+import argparse
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('pandas', 'numpy', 'openpyxl')
+
+def importtime(statement):
+    """מריץ את הייבוא בתהליך חדש ומחזיר {מודול: זמן מצטבר במיקרו-שניות}"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        times.setdefault(name, int(cumulative))  # מודול נספר רק בטעינה הראשונה שלו
+    return times
+
+def loaded_after(paths):
+    """אילו מהמודולים הכבדים נטענו אחרי import app ואחרי כל עמוד ברשימה"""
+    code = (
+        "import sys, shutil, tempfile, os, app\n"
+        "tmp = tempfile.mkdtemp()\n"
+        "if os.path.exists('db.json'): shutil.copy('db.json', tmp)\n"
+        "app.DB_FILE = os.path.join(tmp, 'db.json')\n"
+        "client = app.app.test_client()\n"
+        f"heavy = {HEAVY!r}\n"
+        "print('import app', [m for m in heavy if m in sys.modules])\n"
+        f"for path in {paths!r}:\n"
+        "    status = client.get(path).status_code\n"
+        "    print(path, status, [m for m in heavy if m in sys.modules])\n"
+    )
+    proc = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return proc.stdout
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--baseline', action='store_true', help='מדידה גם של import pandas, numpy (העלות שנחסכה)')
+    args = parser.parse_args()
+
+    runs = [importtime('import app') for _ in range(args.runs)]
+    total = statistics.median(r['app'] for r in runs)
+    print(f"import app: {total / 1000:.1f}ms (חציון של {args.runs} ריצות)")
+
+    last = runs[-1]
+    print(f"\nהמודולים הכבדים ביותר (זמן מצטבר):")
+    for name, micros in sorted(last.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {micros / 1000:8.1f}ms  {name}")
+
+    if args.baseline:
+        heavy = statistics.median(importtime('import pandas, numpy')['pandas'] for _ in range(args.runs))
+        print(f"\nimport pandas (נטען קודם בעליית כל Worker): {heavy / 1000:.1f}ms")
+
+    print("\nמודולים כבדים שנטענו:")
+    print(loaded_after(['/', '/classes', '/units_management', '/search_students?q=a',
+                        '/download_students_sample']))
+
+if __name__ == '__main__':
+    main()
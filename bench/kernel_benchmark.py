@@ -0,0 +1,74 @@
+"""
+מדידת ריצות שיבוץ בשנייה על כיתות סינתטיות גדולות:
+weighted_gale_shapley (כולל הסברים), match_problem בגרסת Python, והליבה המקומפלת (אם Numba מותקן).
+
+הרצה:  python bench/kernel_benchmark.py [--students 2000 10000] [--units 20] [--seconds 3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import (Student, University, MatchingProblem, boost_voice_by_demand, weighted_gale_shapley,
+                   match_problem_python)
+import match_kernel
+
+def synthetic_class(n_students, n_units, seed=0):
+    rng = random.Random(seed)
+    units = [f'יחידה {j}' for j in range(n_units)]
+    names = [f'סטודנט {i}' for i in range(n_students)]
+    students = [{'name': n, 'prefs': rng.sample(units, n_units), 'voice': 1.0} for n in names]
+    per_unit = max(1, n_students * 3 // n_units)   # כל סטודנט מדורג בממוצע ע"י 3 יחידות
+    units_data = {u: {'capacity': max(1, n_students // n_units),
+                      'prefs': [rng.sample(names, min(per_unit, n_students))],
+                      'power': round(rng.uniform(0.5, 50.0), 1)} for u in units}
+    return students, units_data
+
+def rate(fn, seconds):
+    """ריצות בשנייה (לפחות ריצה אחת)"""
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return runs / elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, nargs='+', default=[2000, 10000])
+    parser.add_argument('--units', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    for n_students in args.students:
+        students_data, units_data = synthetic_class(n_students, args.units)
+        problem = MatchingProblem(students_data, units_data)
+        gamma = 1.5
+
+        def reference():
+            s = {sd['name']: Student(sd['name'], sd['prefs'], sd['voice']) for sd in students_data}
+            u = {name: University(name, ud['capacity'], ud['prefs'], ud['power']) for name, ud in units_data.items()}
+            boost_voice_by_demand(s, u)
+            weighted_gale_shapley(s, u, gamma=gamma)
+
+        rows = [('weighted_gale_shapley', reference),
+                ('match_problem (Python)', lambda: match_problem_python(problem, gamma, problem.power, problem.capacity))]
+        if match_kernel.ENABLED:
+            match_kernel.match(problem, gamma, problem.power, problem.capacity)   # קומפילציה לפני המדידה
+            rows.append(('match_problem (Numba)', lambda: match_kernel.match(problem, gamma, problem.power, problem.capacity)))
+
+        print(f"{n_students} סטודנטים, {args.units} יחידות:")
+        base = None
+        for label, fn in rows:
+            per_sec = rate(fn, args.seconds)
+            base = base or per_sec
+            print(f"  {label:<24} {per_sec:10.1f} runs/s  (x{per_sec / base:.1f})")
+    if not match_kernel.ENABLED:
+        print("Numba לא מותקן - הליבה המקומפלת לא נמדדה (pip install numba)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+בדיקת שקילות: הליבה המקומפלת (match_kernel) וגרסת ה-Python של match_problem
+מול weighted_gale_shapley המקורי, על הרבה מקרים אקראיים.
+
+הרצה:  python bench/kernel_equivalence.py [--cases 3000] [--seed 0]
+
+המקרים כוללים את כל הפינות של האלגוריתם: שמות לא מוכרים ותאים ריקים ברשימות היחידות,
+סטודנט שמופיע פעמיים באותה יחידה, Capacity 0, Power שווה (מיון יציב), רמות (Tiers) כמחרוזת בודדת,
+ושמות סטודנטים כפולים. נבדק גם הטווח של Gamma (interval) שכל גרסה מחזירה.
+"""
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import (Student, University, MatchingProblem, boost_voice_by_demand, weighted_gale_shapley,
+                   match_problem_python, gamma_grid)
+import match_kernel
+
+def random_class(rng):
+    n_students, n_units = rng.randint(1, 60), rng.randint(1, 10)
+    units = [f'יחידה {j}' for j in range(n_units)]
+    names = [f'סטודנט {i}' for i in range(n_students)]
+    students = [{'name': n, 'prefs': rng.sample(units, rng.randint(0, n_units)), 'voice': rng.choice([1.0, 0.5, 2.0])}
+                for n in names]
+    if rng.random() < 0.3:
+        students.append({'name': names[0], 'prefs': units[:], 'voice': 1.0})
+
+    units_data = {}
+    for u in units:
+        flat = [rng.choice(names + ['לא קיים', '']) for _ in range(rng.randint(0, n_students + 3))]
+        tiers, i = [], 0
+        while i < len(flat):
+            k = rng.randint(1, 3)
+            tier = flat[i:i + k]
+            tiers.append(tier[0] if k == 1 and rng.random() < 0.5 else tier)
+            i += k
+        units_data[u] = {'capacity': rng.randint(0, 6), 'prefs': tiers,
+                         'power': rng.choice([1.0, 2.0, 5.0, round(rng.uniform(0.5, 50.0), 1)])}
+    return students, units_data
+
+def reference(students_data, units_data, gamma):
+    s = {sd['name']: Student(sd['name'], sd['prefs'], sd['voice']) for sd in students_data}
+    u = {name: University(name, ud['capacity'], ud['prefs'], ud['power']) for name, ud in units_data.items()}
+    boost_voice_by_demand(s, u)
+    matches, _ = weighted_gale_shapley(s, u, gamma=gamma)
+    return matches
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cases', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if not match_kernel.ENABLED:
+        print("Numba לא מותקן (או SMARTPLACE_JIT=0) - נבדקת רק גרסת ה-Python")
+
+    rng = random.Random(args.seed)
+    gammas = gamma_grid(0.5, 5.0, 0.5)
+    failures = 0
+    for case in range(args.cases):
+        students_data, units_data = random_class(rng)
+        problem = MatchingProblem(students_data, units_data)
+        gamma = rng.choice(gammas + [round(rng.uniform(0.1, 6.0), 3)])
+
+        expected = reference(students_data, units_data, gamma)
+        py_interval = [float('-inf'), float('inf'), False]
+        py_match = match_problem_python(problem, gamma, problem.power, problem.capacity, py_interval)
+        got = {problem.student_names[i]: (problem.unit_names[u] if u >= 0 else None) for i, u in enumerate(py_match)}
+        ok = got == expected
+
+        if match_kernel.ENABLED:
+            jit_interval = [float('-inf'), float('inf'), False]
+            jit_match = match_kernel.match(problem, gamma, problem.power, problem.capacity, jit_interval)
+            ok = ok and jit_match == py_match and jit_interval == py_interval
+
+        if not ok:
+            failures += 1
+            if failures <= 5:
+                print(f"מקרה {case}: אי התאמה (gamma={gamma})")
+
+    if failures:
+        print(f"FAILED: {failures} מתוך {args.cases} מקרים")
+        sys.exit(1)
+    print(f"OK: {args.cases} מקרים זהים ל-weighted_gale_shapley" + (" (Python + JIT)" if match_kernel.ENABLED else " (Python)"))
+
+if __name__ == '__main__':
+    main()
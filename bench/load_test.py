@@ -0,0 +1,152 @@
+"""
+בדיקת עומס דרך Flask test client: קוראים, כותבים ואופטימיזציות של כיתות שונות במקביל.
+
+הרצה:  python bench/load_test.py [--threads 8] [--seconds 10]
+
+הסקריפט עובד על DB זמני (לא נוגע ב-db.json של הפרויקט), ובסוף בודק שלא אבדו עדכונים:
+כל Thread כותב מעדכן יחידה משלו, והערך האחרון שכתב חייב להופיע ב-DB.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as smartplace
+from results_view import ResultCache
+
+def seed(n_students, n_units, n_classes):
+    rng = random.Random(0)
+    unit_names = [f'יחידה {i}' for i in range(n_units)]
+    students = []
+    for i in range(n_students):
+        prefs = unit_names[:]
+        rng.shuffle(prefs)
+        students.append({"name": f'סטודנט {i}', "prefs": prefs, "voice": 1.0})
+    names = [s['name'] for s in students]
+    units = {}
+    for u in unit_names:
+        ranked = rng.sample(names, k=min(len(names), 30))
+        units[u] = {"capacity": rng.randint(3, 10), "prefs": [ranked[:10], ranked[10:]],
+                    "power": 1.0, "sticky_power": False}
+
+    with smartplace.db_transaction() as data:
+        data.update(students=students, units=units, saved_classes={})
+    client = smartplace.app.test_client()
+    for c in range(n_classes):
+        client.post('/save_class', data={'class_name': f'כיתה {c}', 'class_description': 'load test'})
+    return unit_names, names
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--units', type=int, default=12)
+    parser.add_argument('--classes', type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='smartplace-load-')
+    smartplace.DB_FILE = os.path.join(workdir, 'db.json')
+    unit_names, student_names = seed(args.students, args.units, args.classes)
+    class_names = [f'כיתה {c}' for c in range(args.classes)]
+
+    deadline = time.monotonic() + args.seconds
+    latencies = defaultdict(list)
+    errors = []
+    last_written = {}
+    result_ids = []
+    stats_lock = threading.Lock()
+
+    def record(kind, start, response):
+        elapsed = time.monotonic() - start
+        with stats_lock:
+            latencies[kind].append(elapsed)
+            if response.status_code >= 500:
+                errors.append((kind, response.status_code))
+
+    def writer(idx):
+        # כל כותב אחראי על יחידה אחת, כדי שאפשר יהיה לבדוק שהערך האחרון שלו נשמר
+        client = smartplace.app.test_client()
+        unit = unit_names[idx % len(unit_names)]
+        value = 0
+        while time.monotonic() < deadline:
+            value += 1
+            power = float(idx * 1000 + value)
+            start = time.monotonic()
+            r = client.post(f'/rank/{unit}', data={'unit_power': power})
+            record('write /rank', start, r)
+            with stats_lock:
+                last_written[unit] = power
+
+    def reader(idx):
+        client = smartplace.app.test_client()
+        rng = random.Random(idx)
+        while time.monotonic() < deadline:
+            path = rng.choice(['/', '/classes', f'/edit_class/{rng.choice(class_names)}',
+                               f'/student/{rng.choice(student_names)}', '/search_students?q=סטודנט 1'])
+            start = time.monotonic()
+            r = client.get(path)
+            record('read', start, r)
+
+    def optimizer(idx):
+        client = smartplace.app.test_client()
+        class_name = class_names[idx % len(class_names)]
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            r = client.get(f'/load_class/{class_name}')
+            record('optimize /load_class', start, r)
+            found = re.search(r'const resultId = "(\w+)"', r.get_data(as_text=True))
+            if found:
+                result_ids.append(found.group(1))
+
+    n_writers = min(len(unit_names), max(1, args.threads // 4))
+    n_optimizers = max(1, args.threads // 4)
+    n_readers = max(1, args.threads - n_writers - n_optimizers)
+    threads = ([threading.Thread(target=writer, args=(i,)) for i in range(n_writers)] +
+               [threading.Thread(target=reader, args=(i,)) for i in range(n_readers)] +
+               [threading.Thread(target=optimizer, args=(i,)) for i in range(n_optimizers)])
+    t0 = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - t0
+
+    print(f"Threads: {n_writers} writers, {n_readers} readers, {n_optimizers} optimizers, {wall:.1f}s")
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        p50 = values[len(values) // 2] * 1000
+        p95 = values[int(len(values) * 0.95)] * 1000
+        print(f"  {kind:<22} {len(values):6d} req  {len(values) / wall:8.1f} req/s  p50 {p50:7.1f}ms  p95 {p95:7.1f}ms")
+
+    # --- בדיקת עקביות ---
+    with open(smartplace.DB_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    lost = {u: (data['units'][u]['power'], v) for u, v in last_written.items() if data['units'][u]['power'] != v}
+    for class_name in class_names:
+        if smartplace.edit_buffer.get(class_name) is None:
+            errors.append(('class missing', class_name))
+    # הנעילה יושבת ליד ה-DB הזמני (ולא ליד db.json של הפרויקט)
+    if not os.path.exists(smartplace.DB_FILE + '.lock'):
+        errors.append(('db lock not next to DB_FILE', smartplace.DB_FILE))
+    # Worker אחר (מטמון חדש מעל אותה תיקייה) מגיש את התוצאות שחושבו כאן
+    smartplace.result_cache.flush()   # הכתיבה לתיקייה המשותפת נעשית ברקע
+    other_worker = ResultCache(directory_getter=lambda: os.path.join(workdir, 'results'))
+    if result_ids and other_worker.get(result_ids[-1]) is None:
+        errors.append(('result not shared between workers', result_ids[-1]))
+
+    if errors or lost:
+        print(f"FAILED: {len(errors)} errors, lost updates: {lost}")
+        sys.exit(1)
+    print("OK: no lost updates, DB and class snapshots are consistent")
+
+if __name__ == '__main__':
+    main()
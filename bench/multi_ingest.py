@@ -0,0 +1,66 @@
+"""
+מדידת קליטה של כמה קבצי סקר יחד: קריאה במקביל (parse_files) מול קריאה רציפה,
+ואיחוד הסטודנטים (merge_survey_frames). בודק גם שהאיחוד לא תלוי בחלוקה לתהליכים.
+
+הרצה:  python bench/multi_ingest.py [--files 4] [--rows 3000] [--questions 20]
+(מספר התהליכים: SMARTPLACE_PROCESSES)
+"""
+import os
+import io
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest
+import parallel
+
+def survey_file(rng, rows, questions, pool):
+    """ייצוא Forms סינתטי: שמות מתוך מאגר משותף (כדי שיהיו כפילויות בין הקבצים) ות"ז לחלק מהם"""
+    import pandas as pd
+    names = [f'סטודנט {rng.randrange(pool)}' for _ in range(rows)]
+    data = {'שם מלא': names,
+            'תעודת זהות': [str(abs(hash(n)) % 10**9) if rng.random() < 0.7 else '' for n in names]}
+    for q in range(questions):
+        data[f'שאלה {q + 1}?'] = [rng.randint(1, 5) for _ in names]
+    out = io.BytesIO()
+    pd.DataFrame(data).to_excel(out, index=False)
+    return out.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=3000)
+    parser.add_argument('--questions', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    files = [(f'wave_{i + 1}.xlsx', survey_file(rng, args.rows, args.questions, args.rows * 2))
+             for i in range(args.files)]
+
+    ingest.parse_files(files[:1] * parallel.MAX_PROCESSES)   # עליית התהליכים וייבוא pandas לא נכנסים למדידה
+    start = time.perf_counter()
+    frames, errors = ingest.parse_files(files)
+    t_parallel = time.perf_counter() - start
+    assert not errors, errors
+
+    start = time.perf_counter()
+    serial = [ingest._parse(None, ('table', name, data))[0] for name, data in files]
+    t_serial = time.perf_counter() - start
+    assert all(a.equals(b) for a, b in zip(frames, serial))
+
+    start = time.perf_counter()
+    merged, duplicates = ingest.merge_survey_frames(frames)
+    t_merge = time.perf_counter() - start
+    again, _ = ingest.merge_survey_frames(serial)
+    assert merged.equals(again)
+
+    print(f"{args.files} קבצים x {args.rows} שורות, {parallel.MAX_PROCESSES} תהליכים")
+    print(f"  קריאה רציפה:   {t_serial:.2f}s")
+    print(f"  קריאה במקביל:  {t_parallel:.2f}s")
+    print(f"  איחוד:         {t_merge:.2f}s  ({len(merged)} סטודנטים, {duplicates} כפילויות אוחדו)")
+
+if __name__ == '__main__':
+    main()
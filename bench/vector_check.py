@@ -0,0 +1,117 @@
+"""
+בדיקת העדכון ההדרגתי של פרופילי יחידות (upsert_unit_profile / remove_unit_profile) מול חישוב מלא
+מחדש ב-build_vector_state: אחרי כל פעולה אקראית (יחידה חדשה, עדכון פרופיל, מחיקה) רשימות ההעדפות
+של כל הסטודנטים ומטריצת המרחקים השמורה חייבות להיות זהות לחישוב המלא על אותם נתונים.
+הדירוגים שלמים (1-5) וכמה יחידות חולקות פרופיל, כדי שיהיו הרבה שוויונות במרחק.
+בסוף - מדידת זמן של עדכון יחידה אחת מול חישוב מלא על כיתה גדולה.
+
+הרצה:  python bench/vector_check.py [--students 400] [--questions 6] [--units 12] [--steps 200] [--seed 0]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import build_vector_state
+from vector_store import save_vector_state, load_distance_matrix, upsert_unit_profile, remove_unit_profile
+
+def survey(rng, n_students, n_questions):
+    import pandas as pd
+    data = {'שם מלא': [f'סטודנט {i}' for i in range(n_students)]}
+    for q in range(n_questions):
+        data[f'שאלה {q + 1}?'] = [rng.randint(1, 5) for _ in range(n_students)]
+    return pd.DataFrame(data)
+
+def units_frame(profiles, n_questions):
+    """טבלת יחידות בפורמט ההעלאה (UnitName, Capacity, Q1..Qn) לפי סדר העמודות הנוכחי"""
+    import pandas as pd
+    rows = [[name, 5] + profile for name, profile in profiles.items()]
+    return pd.DataFrame(rows, columns=['UnitName', 'Capacity'] + [f'Q{q + 1}' for q in range(n_questions)])
+
+def random_profile(rng, profiles, n_questions):
+    # לפעמים עותק של יחידה קיימת - מרחקים שווים בדיוק, הסדר נקבע לפי מיקום העמודה
+    if profiles and rng.random() < 0.3:
+        return list(rng.choice(list(profiles.values())))
+    return [rng.randint(1, 5) for _ in range(n_questions)]
+
+def upload(db_file, df_students, profiles, n_questions):
+    """מצב ה-DB כמו אחרי העלאה (upload_files)"""
+    students, q_cols, student_matrix, _, dists = build_vector_state(df_students, units_frame(profiles, n_questions))
+    save_vector_state(db_file, student_matrix, dists)
+    return {'students': students,
+            'units': {name: {'capacity': 5, 'prefs': [], 'power': 1.0, 'profile': [float(v) for v in p]}
+                      for name, p in profiles.items()},
+            'vectors': {'questions': q_cols, 'units': list(profiles)}}
+
+def compare(data, db_file, df_students, profiles, n_questions, step):
+    import numpy as np
+    students, _, _, _, dists = build_vector_state(df_students, units_frame(profiles, n_questions))
+    assert data['vectors']['units'] == list(profiles), step
+    for incremental, full in zip(data['students'], students):
+        assert incremental['prefs'] == full['prefs'], (step, incremental['name'])
+    saved = load_distance_matrix(db_file)
+    assert saved.shape == dists.shape and np.array_equal(saved, dists), step
+
+def check(args, workdir):
+    rng = random.Random(args.seed)
+    df_students = survey(rng, args.students, args.questions)
+    profiles = {}
+    for j in range(args.units):
+        profiles[f'יחידה {j}'] = random_profile(rng, profiles, args.questions)
+    db_file = os.path.join(workdir, 'db.json')
+    data = upload(db_file, df_students, profiles, args.questions)
+
+    counts = {'add': 0, 'update': 0, 'remove': 0}
+    next_unit = args.units
+    for step in range(args.steps):
+        op = rng.choice(['add', 'update', 'remove'] if len(profiles) > 1 else ['add', 'update'])
+        if op == 'remove':
+            name = rng.choice(list(profiles))
+            del profiles[name], data['units'][name]
+            remove_unit_profile(data, db_file, name)
+        else:
+            if op == 'add':
+                name, next_unit = f'יחידה {next_unit}', next_unit + 1
+                data['units'][name] = {'capacity': 5, 'prefs': [], 'power': 1.0}
+            else:
+                name = rng.choice(list(profiles))
+            profiles[name] = random_profile(rng, profiles, args.questions)
+            upsert_unit_profile(data, db_file, name, profiles[name])
+        counts[op] += 1
+        compare(data, db_file, df_students, profiles, args.questions, step)
+    print(f"✅ {args.steps} פעולות ({counts}) זהות לחישוב המלא")
+
+def timing(workdir, seed, n_students=20000, n_questions=20, n_units=200):
+    rng = random.Random(seed)
+    df_students = survey(rng, n_students, n_questions)
+    profiles = {f'יחידה {j}': random_profile(rng, {}, n_questions) for j in range(n_units)}
+    db_file = os.path.join(workdir, 'large.json')
+
+    start = time.perf_counter()
+    data = upload(db_file, df_students, profiles, n_questions)
+    t_full = time.perf_counter() - start
+
+    start = time.perf_counter()
+    upsert_unit_profile(data, db_file, 'יחידה 0', random_profile(rng, {}, n_questions))
+    t_update = time.perf_counter() - start
+    print(f"{n_students} סטודנטים x {n_units} יחידות: חישוב מלא {t_full:.2f}s, עדכון יחידה אחת {t_update:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--students', type=int, default=400)
+    parser.add_argument('--questions', type=int, default=6)
+    parser.add_argument('--units', type=int, default=12)
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        check(args, workdir)
+        timing(workdir, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from contextlib import nullcontext
+from collections.abc import Mapping
+from locks import LockRegistry
+
+# --- אחסון כיתות שמורות כ-Snapshot עמודתי (Columnar) ---
+# כל כיתה נשמרת בתיקייה משלה: manifest.json קטן + מערכי NumPy (.npy) שנטענים כ-memory map.
+# רשימת הכיתות קוראת רק את ה-manifest, ופתיחת כיתה לא נוגעת בנתונים של כיתות אחרות.
+#
+# כל כתיבה יוצרת תת-תיקייה חדשה (גרסה) עם כל המערכים, וה-manifest - שמצביע עליה ב-data_dir -
+# מוחלף אטומית רק בסוף. קריסה באמצע משאירה את ה-manifest הקודם שמצביע על הגרסה הקודמת והשלמה.
+# שדות של יחידות/סטודנטים שאין להם מערך (למשל profile של יחידה, vec_row של סטודנט) נשמרים
+# כמו שהם ב-extra.json של הגרסה, יחד עם סדר המפתחות של כל יחידה.
+#
+# מבנה המערכים:
+#   names              - טבלת שמות (כל הסטודנטים + שמות שמופיעים רק בדירוגי היחידות)
+#   student_voice      - voice לכל סטודנט
+#   student_pref_ptr   - היסטים (N+1) לתוך student_pref_idx
+#   student_pref_idx   - אינדקס יחידה בטבלת pref_labels
+#   pref_labels        - שמות היחידות שמופיעים בהעדפות הסטודנטים
+#   unit_names / unit_capacity / unit_power / unit_sticky
+#   unit_tier_ptr      - היסטים (K+1) לתוך רשימת הרמות (Tiers)
+#   tier_member_ptr    - היסטים (T+1) לתוך tier_members
+#   tier_members       - אינדקס שם בטבלת names
+#   tier_is_str        - האם הרמה נשמרה כמחרוזת בודדת ולא כרשימה
+#   student_ids, student_ratings_ptr, student_ratings - אופציונלי (תשובות Forms)
+
+# NumPy נטען בתוך הפונקציות שקוראות/כותבות מערכים - רשימת הכיתות (manifest בלבד) לא צריכה אותו.
+
+SNAPSHOT_FORMAT = 2         # 1 - מערכים ישירות בתיקיית הכיתה, בלי extra.json (עדיין נקרא)
+VERSION_PREFIX = 'v-'
+UNIT_ARRAY_FIELDS = ('capacity', 'prefs', 'power', 'sticky_power')
+STUDENT_ARRAY_FIELDS = ('name', 'prefs', 'voice', 'id', 'ratings')
+
+# נעילת קריאה/כתיבה לכל כיתה: קריאות של אותה כיתה רצות במקביל, וכתיבה לא מתערבבת עם קריאה.
+# קובץ הנעילה יושב ליד תיקיית הכיתה כדי שיחול גם בין תהליכים.
+_class_locks = LockRegistry(lambda path: path + '.lock')
+
+def class_dir(root, class_name):
+    """שם תיקייה יציב לכל כיתה - שמות בעברית/עם גרשיים לא נכנסים לנתיב"""
+    digest = hashlib.sha1(class_name.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(root, digest)
+
+def class_lock(root, class_name):
+    return _class_locks.get(class_dir(root, class_name))
+
+def _str_array(values):
+    import numpy as np
+    # dtype של מחרוזות קבועות (ולא object) כדי שאפשר יהיה לטעון כ-memory map
+    return np.array([str(v) for v in values], dtype=str) if values else np.zeros(0, dtype='<U1')
+
+def _ptr(lengths):
+    import numpy as np
+    return np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).astype(np.int64)
+
+def encode_class(class_data):
+    """המרת כיתה (students/units כמו ב-db.json) למילון של מערכים עמודתיים"""
+    import numpy as np
+    students = class_data.get('students', [])
+    units = class_data.get('units', {})
+
+    names = [s['name'] for s in students]
+    name_idx = {n: i for i, n in enumerate(names)}
+
+    pref_labels = []
+    label_idx = {}
+    pref_idx = []
+    for s in students:
+        for u in s.get('prefs', []):
+            if u not in label_idx:
+                label_idx[u] = len(pref_labels)
+                pref_labels.append(u)
+            pref_idx.append(label_idx[u])
+
+    tier_counts, member_counts, members, is_str = [], [], [], []
+    for u in units.values():
+        tiers = [t for t in u.get('prefs', []) if t != '']
+        tier_counts.append(len(tiers))
+        for tier in tiers:
+            tier_names = [tier] if isinstance(tier, str) else list(tier)
+            is_str.append(isinstance(tier, str))
+            member_counts.append(len(tier_names))
+            for n in tier_names:
+                if n not in name_idx:
+                    name_idx[n] = len(names)
+                    names.append(n)
+                members.append(name_idx[n])
+
+    arrays = {
+        'names': _str_array(names),
+        'student_voice': np.array([float(s.get('voice', 1.0)) for s in students], dtype=float),
+        'student_pref_ptr': _ptr([len(s.get('prefs', [])) for s in students]),
+        'student_pref_idx': np.array(pref_idx, dtype=np.int32),
+        'pref_labels': _str_array(pref_labels),
+        'unit_names': _str_array(list(units.keys())),
+        'unit_capacity': np.array([int(u.get('capacity', 0)) for u in units.values()], dtype=np.int64),
+        'unit_power': np.array([float(u.get('power', 1.0)) for u in units.values()], dtype=float),
+        'unit_sticky': np.array([bool(u.get('sticky_power', False)) for u in units.values()], dtype=bool),
+        'unit_tier_ptr': _ptr(tier_counts),
+        'tier_member_ptr': _ptr(member_counts),
+        'tier_members': np.array(members, dtype=np.int32),
+        'tier_is_str': np.array(is_str, dtype=bool),
+    }
+
+    student_fields = []
+    if any('id' in s for s in students):
+        student_fields.append('id')
+        arrays['student_ids'] = _str_array([s.get('id', '') for s in students])
+    if any('ratings' in s for s in students):
+        student_fields.append('ratings')
+        arrays['student_ratings_ptr'] = _ptr([len(s.get('ratings', [])) for s in students])
+        arrays['student_ratings'] = np.array([r for s in students for r in s.get('ratings', [])], dtype=float)
+
+    # שדות בלי מערך נשמרים כמו שהם; לכל יחידה נשמר גם סדר המפתחות, כדי ששדה שלא היה לא יתווסף
+    extra = {
+        'unit_keys': {name: list(u.keys()) for name, u in units.items()},
+        'units': {name: {k: v for k, v in u.items() if k not in UNIT_ARRAY_FIELDS} for name, u in units.items()},
+        'students': {},
+        # id / ratings נשמרים כעמודה לכל הסטודנטים - כאן מי שלא היה לו השדה
+        'students_without': {k: [i for i, s in enumerate(students) if k not in s] for k in student_fields},
+    }
+    extra['units'] = {name: fields for name, fields in extra['units'].items() if fields}
+    for i, s in enumerate(students):
+        for k, v in s.items():
+            if k not in STUDENT_ARRAY_FIELDS:
+                extra['students'].setdefault(k, {})[str(i)] = v
+
+    return arrays, student_fields, extra
+
+def decode_students(arrays, manifest, extra=None):
+    """בנייה חזרה של רשימת הסטודנטים מהמערכים"""
+    n_students = manifest['student_count']
+    names = arrays['names'][:n_students].tolist()
+    voice = arrays['student_voice'].tolist()
+    pref_ptr = arrays['student_pref_ptr'].tolist()
+    pref_idx = arrays['student_pref_idx'].tolist()
+    pref_labels = arrays['pref_labels'].tolist()
+    fields = manifest.get('student_fields', [])
+
+    students = []
+    for i in range(n_students):
+        s = {
+            'name': names[i],
+            'prefs': [pref_labels[j] for j in pref_idx[pref_ptr[i]:pref_ptr[i + 1]]],
+            'voice': voice[i]
+        }
+        if 'id' in fields:
+            s['id'] = str(arrays['student_ids'][i])
+        if 'ratings' in fields:
+            ptr = arrays['student_ratings_ptr']
+            s['ratings'] = [int(r) if float(r).is_integer() else float(r)
+                            for r in arrays['student_ratings'][ptr[i]:ptr[i + 1]].tolist()]
+        students.append(s)
+
+    for k, values in (extra or {}).get('students', {}).items():
+        for i, v in values.items():
+            students[int(i)][k] = v
+    for k, indices in (extra or {}).get('students_without', {}).items():
+        for i in indices:
+            del students[i][k]
+    return students
+
+def decode_units(arrays, manifest, extra=None):
+    """בנייה חזרה של מילון היחידות מהמערכים (כולל שדות נוספים וסדר המפתחות המקורי)"""
+    extra = extra or {}
+    names = arrays['names'].tolist()
+    tier_ptr = arrays['unit_tier_ptr'].tolist()
+    member_ptr = arrays['tier_member_ptr'].tolist()
+    members = arrays['tier_members'].tolist()
+    is_str = arrays['tier_is_str'].tolist()
+    capacity = arrays['unit_capacity'].tolist()
+    power = arrays['unit_power'].tolist()
+    sticky = arrays['unit_sticky'].tolist()
+
+    units = {}
+    for k, unit_name in enumerate(arrays['unit_names'].tolist()):
+        prefs = []
+        for t in range(tier_ptr[k], tier_ptr[k + 1]):
+            tier = [names[m] for m in members[member_ptr[t]:member_ptr[t + 1]]]
+            prefs.append(tier[0] if is_str[t] else tier)
+        values = dict(extra.get('units', {}).get(unit_name, {}),
+                      capacity=capacity[k], prefs=prefs, power=power[k], sticky_power=sticky[k])
+        keys = extra.get('unit_keys', {}).get(unit_name, list(UNIT_ARRAY_FIELDS))
+        units[unit_name] = {key: values[key] for key in keys if key in values}
+
+    return units
+
+def decode_class(arrays, manifest, extra=None):
+    """בנייה חזרה של students/units מהמערכים (לא מחזיר את שדות המטא של ה-manifest)"""
+    return decode_students(arrays, manifest, extra), decode_units(arrays, manifest, extra)
+
+class ClassSnapshot(Mapping):
+    """
+    כיתה שנטענה מ-Snapshot. description / created_date מגיעים מה-manifest, והמערכים נשארים
+    memory map - students ו-units מפוענחים רק בגישה הראשונה אליהם (כל אחד בנפרד).
+    dict(snapshot) מפענח הכל (לעריכה).
+    """
+    KEYS = ('students', 'units', 'description', 'created_date')
+
+    def __init__(self, arrays, manifest, extra):
+        self.arrays = arrays
+        self.manifest = manifest
+        self._extra = extra
+        self._values = {'description': manifest.get('description', ''),
+                        'created_date': manifest.get('created_date', '')}
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            if key == 'students':
+                self._values[key] = decode_students(self.arrays, self.manifest, self._extra)
+            elif key == 'units':
+                self._values[key] = decode_units(self.arrays, self.manifest, self._extra)
+            else:
+                raise KeyError(key)
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    @property
+    def student_count(self):
+        return self.manifest['student_count']
+
+    @property
+    def unit_count(self):
+        return self.manifest['unit_count']
+
+def _write_json(path, obj):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, indent=4, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def read_manifest(root, class_name):
+    path = os.path.join(class_dir(root, class_name), 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def write_class_snapshot(root, class_name, class_data, lock=True):
+    """
+    כתיבת כיתה כ-Snapshot: כל המערכים לתיקיית גרסה חדשה, ורק בסוף החלפה אטומית של ה-manifest
+    כך שהוא תמיד מצביע על גרסה שלמה. הגרסאות הקודמות נמחקות אחרי ההחלפה.
+    lock=False - הקורא כבר מחזיק את נעילת הכתיבה של הכיתה (class_lock).
+    """
+    with class_lock(root, class_name).write() if lock else nullcontext():
+        return _write_class_snapshot(root, class_name, class_data)
+
+def _write_class_snapshot(root, class_name, class_data):
+    import numpy as np
+    path = class_dir(root, class_name)
+    os.makedirs(path, exist_ok=True)
+    previous = read_manifest(root, class_name) or {}
+
+    arrays, student_fields, extra = encode_class(class_data)
+    version = VERSION_PREFIX + uuid.uuid4().hex[:12]
+    data_dir = os.path.join(path, version)
+    os.makedirs(data_dir)
+    for key, arr in arrays.items():
+        with open(os.path.join(data_dir, key + '.npy'), 'wb') as f:
+            np.save(f, arr)
+    with open(os.path.join(data_dir, 'extra.json'), 'w', encoding='utf-8') as f:
+        json.dump(extra, f, ensure_ascii=False)
+
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'name': class_name,
+        'description': class_data.get('description', ''),
+        'created_date': class_data.get('created_date', ''),
+        # שמירה מחדש של כיתה קיימת לא מזיזה אותה ברשימה (כמו השמה למפתח קיים ב-dict)
+        'saved_at': previous.get('saved_at', class_data.get('saved_at', time.time())),
+        'student_count': len(class_data.get('students', [])),
+        'unit_count': len(class_data.get('units', {})),
+        'student_fields': student_fields,
+        'arrays': sorted(arrays.keys()),
+        'data_dir': version,
+    }
+    _write_json(os.path.join(path, 'manifest.json'), manifest)
+
+    # מכאן ה-manifest מצביע על הגרסה החדשה: גרסאות ישנות (וקבצי פורמט 1) כבר לא נקראות
+    for entry in os.listdir(path):
+        full = os.path.join(path, entry)
+        if entry.startswith(VERSION_PREFIX) and entry != version:
+            shutil.rmtree(full, ignore_errors=True)
+        elif entry.endswith('.npy') or entry.endswith('.npy.tmp'):
+            os.remove(full)
+    return manifest
+
+def read_class_snapshot(root, class_name, lock=True):
+    """
+    טעינת כיתה - המערכים נפתחים כ-memory map והפענוח נדחה עד הגישה (ClassSnapshot).
+    מחזיר None אם הכיתה לא קיימת. lock=False - הקורא כבר מחזיק את נעילת הכיתה.
+    """
+    import numpy as np
+    with class_lock(root, class_name).read() if lock else nullcontext():
+        manifest = read_manifest(root, class_name)
+        if manifest is None:
+            return None
+        data_dir = os.path.join(class_dir(root, class_name), manifest.get('data_dir', ''))
+        arrays = {key: np.load(os.path.join(data_dir, key + '.npy'), mmap_mode='r') for key in manifest['arrays']}
+        extra = None
+        if os.path.exists(os.path.join(data_dir, 'extra.json')):
+            with open(os.path.join(data_dir, 'extra.json'), 'r', encoding='utf-8') as f:
+                extra = json.load(f)
+    return ClassSnapshot(arrays, manifest, extra)
+
+def class_exists(root, class_name):
+    return read_manifest(root, class_name) is not None
+
+def list_class_manifests(root):
+    """כל הכיתות השמורות (שם -> manifest) לפי סדר השמירה. קורא רק קבצי manifest"""
+    if not os.path.isdir(root):
+        return {}
+    manifests = []
+    for entry in os.listdir(root):
+        path = os.path.join(root, entry, 'manifest.json')
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                manifests.append(json.load(f))
+    manifests.sort(key=lambda m: m.get('saved_at', 0))
+    return {m['name']: m for m in manifests}
+
+def delete_class_snapshot(root, class_name):
+    path = class_dir(root, class_name)
+    with class_lock(root, class_name).write():
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+
+def migrate_saved_classes(root, data):
+    """
+    העברת כיתות ישנות מתוך db.json ל-Snapshots.
+    מחזיר True אם היו כיתות להעביר (ואז צריך לשמור את ה-DB בלי המפתח saved_classes).
+    """
+    saved_classes = data.get('saved_classes') or {}
+    if not saved_classes:
+        return False
+    base_time = time.time()
+    for i, (class_name, class_data) in enumerate(saved_classes.items()):
+        if not class_exists(root, class_name):
+            write_class_snapshot(root, class_name, dict(class_data, saved_at=base_time + i * 1e-3))
+    data['saved_classes'] = {}
+    return True
@@ -0,0 +1,255 @@
+import os
+import sys
+import json
+import socket
+import hashlib
+import argparse
+import threading
+import socketserver
+from collections import OrderedDict, deque
+from logic import MatchingProblem, scan_gammas
+
+# --- חיפוש מבוזר בין מכונות (Coordinator / Workers) ---
+# החיפוש האקראי של run_full_optimization (הרבה תצורות Power, כל אחת מול רשת ה-Gamma)
+# מתחלק למנות (Chunks) של מועמדים רצופים. כל Worker הוא תהליך Python רגיל שמאזין ב-TCP:
+#     python distributed.py worker --port 7070
+# והשרת מקבל את הכתובות ב-SMARTPLACE_WORKERS (למשל "10.0.0.5:7070,10.0.0.6:7070").
+#
+# הפרוטוקול: שורות JSON (לא pickle - ה-Worker לא מריץ שום קוד שנשלח אליו).
+#   hello  -> {"have": bool}     האם הבעיה (לפי טביעת אצבע) כבר אצל ה-Worker
+#   load   -> {"ok": true}       הבעיה המקודדת - נשלחת פעם אחת לכל Worker
+#   scan   -> שורה לכל מועמד {"index", "unmatched", "gamma", "runs"} ולבסוף {"done": true}
+# Worker שנופל או לא עונה בזמן יוצא מהחיפוש, והמועמדים שלא הספיק חוזרים לתור.
+# אם לא נשאר אף Worker, השאר מחושב מקומית - החיפוש לא הולך לאיבוד.
+
+DEFAULT_PORT = 7070
+CHUNK_SIZE = 8                      # מועמדים (תצורות Power) בכל מנה
+CONNECT_TIMEOUT = 5.0
+IDLE_TIMEOUT = float(os.environ.get('SMARTPLACE_WORKER_TIMEOUT', 60))   # שניות בלי תשובה עד ויתור על Worker
+WORKER_TOKEN = os.environ.get('SMARTPLACE_WORKER_TOKEN', '')
+MAX_CACHED_PROBLEMS = 4             # בעיות שנשמרות אצל ה-Worker בין חיפושים
+
+def worker_addresses(spec=None):
+    """[(host, port)] מתוך SMARTPLACE_WORKERS, או [] כשהמצב המבוזר כבוי"""
+    spec = os.environ.get('SMARTPLACE_WORKERS', '') if spec is None else spec
+    addresses = []
+    for part in spec.split(','):
+        part = part.strip()
+        if part:
+            host, _, port = part.rpartition(':') if ':' in part else (part, '', DEFAULT_PORT)
+            addresses.append((host, int(port)))
+    return addresses
+
+# --- קידוד הבעיה ---
+
+def encode_problem(problem):
+    return {
+        'student_names': problem.student_names,
+        'unit_names': problem.unit_names,
+        'capacity': problem.capacity,
+        'power': problem.power,
+        'sticky': problem.sticky,
+        'unit_prefs': problem.unit_prefs,
+        'unit_tiers': [sorted(tiers.items()) for tiers in problem.unit_tiers],
+        'ranks': problem.ranks,
+        'voice': problem.voice,
+    }
+
+def decode_problem(payload):
+    problem = MatchingProblem.__new__(MatchingProblem)
+    problem.__dict__.update(payload)
+    problem.n_units = len(problem.unit_names)
+    problem.unit_tiers = [dict(tiers) for tiers in payload['unit_tiers']]
+    return problem
+
+def evaluate_candidate(problem, powers, gammas, bound):
+    """
+    (לא משובצים, Gamma, ריצות) של תצורת Power אחת: ה-Gamma הראשון ברשת עם הכי מעט לא משובצים,
+    בדיוק כמו הלולאה הרציפה (שיפור רק כשממש טוב יותר, ועצירה בחסם).
+    """
+    best, runs = None, 0
+    for g, match in scan_gammas(problem, gammas, powers):
+        runs += 1
+        unmatched = match.count(-1)
+        if best is None or unmatched < best[0]:
+            best = (unmatched, g)
+        if best[0] <= bound:
+            break
+    return best[0], best[1], runs
+
+# --- Worker ---
+
+class _WorkerHandler(socketserver.StreamRequestHandler):
+    def send(self, message):
+        self.wfile.write(json.dumps(message).encode() + b'\n')
+        self.wfile.flush()
+
+    def handle(self):
+        problem = None
+        for line in self.rfile:
+            message = json.loads(line)
+            op = message.get('op')
+            if WORKER_TOKEN and message.get('token') != WORKER_TOKEN:
+                self.send({'error': 'bad token'})
+                return
+            if op == 'hello':
+                problem = self.server.problems_get(message['key'])
+                self.send({'have': problem is not None})
+            elif op == 'load':
+                problem = decode_problem(message['problem'])
+                self.server.problems_put(message['key'], problem)
+                self.send({'ok': True})
+            elif op == 'scan' and problem is not None:
+                for i, powers in zip(message['indices'], message['candidates']):
+                    unmatched, gamma, runs = evaluate_candidate(problem, powers, message['gammas'], message['bound'])
+                    self.send({'index': i, 'unmatched': unmatched, 'gamma': gamma, 'runs': runs})
+                self.send({'done': True})
+            else:
+                self.send({'error': f'unexpected op {op!r}'})
+                return
+
+class WorkerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _WorkerHandler)
+        self._problems = OrderedDict()
+        self._lock = threading.Lock()
+
+    def problems_get(self, key):
+        with self._lock:
+            problem = self._problems.get(key)
+            if problem is not None:
+                self._problems.move_to_end(key)
+            return problem
+
+    def problems_put(self, key, problem):
+        with self._lock:
+            self._problems[key] = problem
+            while len(self._problems) > MAX_CACHED_PROBLEMS:
+                self._problems.popitem(last=False)
+
+# --- Coordinator ---
+
+class _Search:
+    """מצב משותף לכל ה-Threads של החיפוש: תור המנות, התוצאות ונקודת העצירה"""
+
+    def __init__(self, candidates, bound, known=None):
+        self.lock = threading.Lock()
+        self.pending = deque([list(range(i, min(i + CHUNK_SIZE, len(candidates))))
+                              for i in range(0, len(candidates), CHUNK_SIZE)])
+        self.results = {}
+        self.bound = bound
+        self.cutoff = len(candidates)   # המועמד הראשון שהגיע לחסם - מה שאחריו כבר לא יכול לנצח
+        self.requeued = 0
+        for index, (unmatched, gamma) in sorted((known or {}).items()):
+            self.record(index, unmatched, gamma, 0)
+
+    def take(self):
+        with self.lock:
+            while self.pending:
+                chunk = self.pending.popleft()
+                chunk = [i for i in chunk if i < self.cutoff and i not in self.results]
+                if chunk:
+                    return chunk
+            return None
+
+    def record(self, index, unmatched, gamma, runs):
+        with self.lock:
+            self.results[index] = (unmatched, gamma, runs)
+            if unmatched <= self.bound:
+                self.cutoff = min(self.cutoff, index)
+
+    def give_back(self, chunk):
+        with self.lock:
+            left = [i for i in chunk if i not in self.results]
+            if left:
+                self.pending.appendleft(left)
+                self.requeued += len(left)
+
+def _send(stream, message):
+    stream.write(json.dumps(message).encode() + b'\n')
+    stream.flush()
+
+def _receive(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError('worker closed the connection')
+    message = json.loads(line)
+    if 'error' in message:
+        raise ConnectionError(message['error'])
+    return message
+
+def _drive_worker(address, search, key, encoded, candidates, gammas, failures):
+    """Thread לכל Worker: שולח את הבעיה (אם חסרה) ומושך מנות עד שהתור מתרוקן"""
+    chunk = None
+    try:
+        with socket.create_connection(address, timeout=CONNECT_TIMEOUT) as sock:
+            sock.settimeout(IDLE_TIMEOUT)
+            stream = sock.makefile('rwb')
+            _send(stream, {'op': 'hello', 'key': key, 'token': WORKER_TOKEN})
+            if not _receive(stream)['have']:
+                _send(stream, {'op': 'load', 'key': key, 'problem': encoded, 'token': WORKER_TOKEN})
+                _receive(stream)
+            while (chunk := search.take()) is not None:
+                _send(stream, {'op': 'scan', 'indices': chunk, 'candidates': [candidates[i] for i in chunk],
+                               'gammas': gammas, 'bound': search.bound, 'token': WORKER_TOKEN})
+                while 'done' not in (message := _receive(stream)):
+                    search.record(message['index'], message['unmatched'], message['gamma'], message['runs'])
+                chunk = None
+    except (OSError, ValueError, KeyError) as e:
+        failures.append(f"{address[0]}:{address[1]}: {e}")
+        if chunk is not None:
+            search.give_back(chunk)
+
+def search_powers(problem, candidates, gammas, bound, addresses, stats=None, known=None):
+    """
+    הערכת כל תצורות ה-Power (candidates) מול רשת ה-Gamma על ה-Workers.
+    known - {אינדקס: (לא משובצים, Gamma)} של מועמדים שהתוצאה שלהם כבר ידועה (לא נשלחים).
+    מחזיר {אינדקס: (לא משובצים, Gamma, ריצות)}. כל מועמד עד הראשון שהגיע לחסם נמצא בתוצאה,
+    ולכן הבחירה (הראשון עם הכי מעט לא משובצים) זהה ללולאה הרציפה של run_full_optimization.
+    """
+    encoded = encode_problem(problem)
+    key = hashlib.sha1(json.dumps(encoded, sort_keys=True).encode()).hexdigest()
+    search = _Search(candidates, bound, known)
+    failures = []
+    threads = [threading.Thread(target=_drive_worker, daemon=True,
+                                args=(address, search, key, encoded, candidates, gammas, failures))
+               for address in addresses]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # מה שנשאר (כל ה-Workers נפלו) - מקומית
+    local = 0
+    while (chunk := search.take()) is not None:
+        for i in chunk:
+            search.record(i, *evaluate_candidate(problem, candidates[i], gammas, bound))
+            local += 1
+
+    for failure in failures:
+        print(f"⚠️ Worker נכשל: {failure}")
+    if stats is not None:
+        stats['runs'] = stats.get('runs', 0) + sum(r[2] for r in search.results.values())
+        stats['distributed'] = {'workers': len(addresses), 'failed': len(failures),
+                                'requeued': search.requeued, 'local': local}
+    return search.results
+
+def main():
+    parser = argparse.ArgumentParser(description='SmartPlace distributed optimization worker')
+    parser.add_argument('mode', choices=['worker'])
+    parser.add_argument('--host', default='127.0.0.1', help='0.0.0.0 כדי לקבל חיבורים ממכונות אחרות')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    with WorkerServer((args.host, args.port)) as server:
+        print(f"Worker מאזין ב-{args.host}:{server.server_address[1]}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+import io
+from parallel import map_shared
+from student_index import StudentIndex
+from logic import extract_rating
+
+# --- קליטת כמה קבצי סקר יחד (Multi-file ingest) ---
+# תשובות של מחזור אחד מגיעות לפעמים בכמה קבצי Forms (כיתה / גל). כל הקבצים נקראים במקביל
+# בתהליכי Worker (parallel.map_shared), הסטודנטים מאוחדים דרך StudentIndex לפי כללים קבועים,
+# ורק אז מחושבים הוקטורים ונכתב ה-DB - פעם אחת לכל ההעלאה.
+#
+# כללי האיחוד (דטרמיניסטיים - לא תלויים בסדר שבו התהליכים סיימו):
+#   1. הקבצים עוברים לפי סדר ההעלאה, והשורות לפי הסדר בקובץ.
+#   2. התאמה לפי ת"ז, ואם אין - לפי שם ללא תלות ברישיות/רווחים.
+#      שני סטודנטים עם אותו שם ות"ז שונות הם שני סטודנטים.
+#   3. סטודנט שמופיע שוב - התשובות המאוחרות (הקובץ / השורה האחרונה) מחליפות את הקודמות,
+#      והסטודנט נשאר במקום שבו הופיע לראשונה.
+
+NAME_COLUMN = 'שם מלא'
+
+class _NamedBytes(io.BytesIO):
+    """תוכן קובץ שהועלה + שם, כמו FileStorage (read_uploaded_file צריך רק את שניהם)"""
+
+    def __init__(self, filename, data):
+        super().__init__(data)
+        self.filename = filename
+
+def read_uploaded_file(file_obj):
+    """קורא קובץ Excel או CSV מהעלאה"""
+    import pandas as pd
+    filename = file_obj.filename.lower()
+
+    if filename.endswith('.xlsx') or filename.endswith('.xls'):
+        return pd.read_excel(file_obj, engine='openpyxl' if filename.endswith('.xlsx') else None)
+    elif filename.endswith('.csv'):
+        return pd.read_csv(file_obj, encoding='utf-8-sig')
+    else:
+        raise ValueError("פורמט קובץ לא תומך. בחר Excel או CSV")
+
+def is_id_column(col):
+    col_str = str(col).lower()
+    return 'תעודת זהות' in col_str or 'id' in col_str
+
+def forms_students(df):
+    """
+    שורות של ייצוא Microsoft Forms -> [{'name', 'id', 'ratings'}].
+    עמודת השם היא האחרונה שמכילה "שם"/name (או הראשונה בקובץ), וכל שאר העמודות
+    (מלבד ת"ז וזמן) הן דירוגים.
+    """
+    import pandas as pd
+    # דלג על השורות הריקות בהתחלה (Forms לעיתים מוסיף כותרות מיוחדות)
+    df = df.dropna(how='all')
+    print(f"עמודות בקובץ: {list(df.columns)}")
+
+    # מצא עמודות שמכילות "שם" (כל הגרסאות אפשריות)
+    name_col = None
+    for col in df.columns:
+        col_str = str(col).lower()
+        if 'שם' in col_str or 'name' in col_str:
+            name_col = col
+    if name_col is None:
+        # אם לא נמצא, בחר את העמודה הראשונה
+        name_col = df.columns[0]
+    print(f"עמודת שם: {name_col}")
+
+    processed_students = []
+    for _, row in df.iterrows():
+        name = str(row[name_col]).strip() if pd.notna(row[name_col]) else None
+        if not name or name.lower() == 'nan' or name.lower() == 'סטודנט':
+            continue
+
+        # אוספים את כל הדירוגים מכל העמודות (מלבד שם ותעודת זהות)
+        ratings = []
+        id_num = ""
+        for col in df.columns:
+            col_str = str(col).lower()
+
+            # דלג על עמודות שאינן דירוגים
+            if 'שם' in col_str or 'name' in col_str or 'timestamp' in col_str or 'זמן' in col_str:
+                continue
+
+            if is_id_column(col):
+                if pd.notna(row[col]):
+                    id_num = str(row[col]).strip()
+                continue
+
+            # נסה לחלץ דירוג מהערך
+            if pd.notna(row[col]):
+                val = str(row[col]).strip()
+                if val and val.lower() != 'nan':
+                    try:
+                        ratings.append(extract_rating(val))
+                    except:
+                        pass
+
+        processed_students.append({"name": name, "id": id_num, "ratings": ratings})
+    print(f"סך הכל סטודנטים בקובץ: {len(processed_students)}")
+    return processed_students
+
+def _parse(_, job):
+    """רץ בתהליך Worker: קריאת קובץ אחד. מחזיר (תוצאה, שגיאה)"""
+    kind, filename, data = job
+    try:
+        df = read_uploaded_file(_NamedBytes(filename, data))
+        return (forms_students(df) if kind == 'forms' else df), None
+    except Exception as e:
+        return None, f"{filename}: {e}"
+
+def parse_files(files, kind='table'):
+    """
+    files - [(filename, bytes)]. kind='table' מחזיר DataFrame לכל קובץ, kind='forms' רשימת סטודנטים.
+    מחזיר (תוצאות לפי הסדר, שגיאות). יותר מקובץ אחד נקרא במקביל.
+    """
+    jobs = [(kind, filename, data) for filename, data in files]
+    results = map_shared(_parse, None, jobs, parallel=len(jobs) > 1)
+    return [r for r, _ in results], [e for _, e in results if e]
+
+def _match(index, name, id_num):
+    """הרשומה הקיימת לפי כללי האיחוד (ת"ז, ואחרת שם - אלא אם יש לשניהם ת"ז שונה)"""
+    existing = index.find_id(id_num)
+    if existing is None:
+        candidate = index.find(name)
+        if candidate is not None and not (id_num and candidate.get('id') and str(candidate['id']).strip() != id_num):
+            existing = candidate
+    return existing
+
+def merge_forms_students(students, incoming):
+    """
+    איחוד סטודנטים מ-Forms לתוך רשימת הסטודנטים הקיימת (במקום). מחזיר (נוספו, עודכנו).
+    """
+    index = StudentIndex(students)
+    added = updated = 0
+    for student_data in incoming:
+        existing = _match(index, student_data['name'], student_data['id'])
+        if existing:
+            existing['ratings'] = student_data['ratings']
+            if student_data['id']:
+                index.set_id(existing, student_data['id'])
+            updated += 1
+        else:
+            students.append(student_data)
+            index.add(student_data)
+            added += 1
+    return added, updated
+
+def merge_survey_frames(frames):
+    """
+    איחוד כמה טבלאות סקר (עמודת 'שם מלא' + שאלות) לטבלה אחת, שורה אחת לכל סטודנט.
+    בכפילות התשובות נלקחות מהשורה האחרונה, והשם נשאר כפי שהופיע לראשונה.
+    מחזיר (DataFrame, כמה שורות אוחדו לסטודנט שכבר הופיע).
+    """
+    import pandas as pd
+    index = StudentIndex()
+    merged = 0
+    for f, frame in enumerate(frames):
+        if NAME_COLUMN not in frame.columns:
+            raise ValueError(f"בקובץ {f + 1} חסרה העמודה '{NAME_COLUMN}'")
+        id_cols = [c for c in frame.columns if is_id_column(c)]
+        for label, row in frame.iterrows():
+            name = row[NAME_COLUMN]
+            if pd.isna(name) or str(name).strip() == '' or str(name).strip().lower() == 'nan':
+                continue
+            name = str(name).strip()
+            id_num = next((str(row[c]).strip() for c in id_cols if pd.notna(row[c])), '')
+            existing = _match(index, name, id_num)
+            if existing is not None:
+                existing['row'] = (f, label)
+                if id_num and not existing.get('id'):
+                    index.set_id(existing, id_num)
+                merged += 1
+            else:
+                index.add({'name': name, 'id': id_num, 'row': (f, label)})
+
+    # השורה שנבחרה לכל סטודנט, בסדר ההופעה הראשונה
+    parts = []
+    for f, frame in enumerate(frames):
+        picked = [(order, s['row'][1]) for order, s in enumerate(index.students) if s['row'][0] == f]
+        if picked:
+            parts.append(frame.loc[[label for _, label in picked]].assign(_order=[o for o, _ in picked]))
+    if not parts:
+        return frames[0].iloc[0:0], merged
+    df = pd.concat(parts, ignore_index=True).sort_values('_order', kind='stable')
+    df[NAME_COLUMN] = [index.students[o]['name'] for o in df['_order']]
+    return df.drop(columns='_order').reset_index(drop=True), merged
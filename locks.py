@@ -0,0 +1,92 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl  # נעילת קבצים בין תהליכים (POSIX). ב-Windows נשארים עם נעילה בין Threads בלבד
+except ImportError:
+    fcntl = None
+
+# --- נעילות קריאה/כתיבה (Read/Write Locks) ---
+# הרבה קוראים במקביל, כותב אחד בלעדי. כשמועבר lock_path הנעילה חלה גם בין תהליכים
+# (כמה Workers של שרת WSGI) בעזרת flock על קובץ נעילה ליד הנתונים.
+
+class RWLock:
+    def __init__(self, lock_path=None):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._lock_path = lock_path
+        self._fd = None
+
+    def _flock(self, mode):
+        if fcntl is None or self._lock_path is None:
+            return
+        if self._fd is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self._lock_path)), exist_ok=True)
+            self._fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, mode)
+
+    def acquire_read(self):
+        with self._cond:
+            # כותבים ממתינים מקבלים עדיפות כדי שזרם קריאות לא ירעיב אותם
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            if self._readers == 0:
+                self._flock(fcntl.LOCK_SH if fcntl else None)
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._flock(fcntl.LOCK_UN if fcntl else None)
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+            self._flock(fcntl.LOCK_EX if fcntl else None)
+
+    def release_write(self):
+        with self._cond:
+            self._flock(fcntl.LOCK_UN if fcntl else None)
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+class LockRegistry:
+    """נעילה נפרדת לכל מפתח (למשל לכל כיתה), נוצרת בפעם הראשונה שמבקשים אותה"""
+
+    def __init__(self, lock_path_for=None):
+        self._guard = threading.Lock()
+        self._locks = {}
+        self._lock_path_for = lock_path_for
+
+    def get(self, key):
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                path = self._lock_path_for(key) if self._lock_path_for else None
+                lock = self._locks[key] = RWLock(path)
+            return lock
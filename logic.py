@@ -1,11 +1,14 @@
-import pandas as pd
-import numpy as np
 import re
 import random
-import copy
+from collections import deque
+import bisect
+import math
 from dataclasses import dataclass, field
 from typing import List, Union, Dict, Optional, Tuple
 
+# pandas ו-NumPy נטענים רק בתוך הפונקציות של ניתוח הקבצים והוקטורים,
+# כך שייבוא המודול (והרצת אלגוריתם השיבוץ) לא משלם על זמן הטעינה שלהם.
+
 # --- 1. מודלים (Models) עם כל המתודות הנדרשות ---
 
 @dataclass
@@ -47,31 +50,143 @@ class University:
 # --- 2. לוגיקה של ניתוח סקרים (Vectors) ---
 
 def extract_rating(text):
-    if pd.isna(text) or str(text).strip() == "": return 3
+    """חילוץ דירוג מטקסט (תא ריק / NaN -> 3)"""
+    if text is None or str(text).strip() == "": return 3
     match = re.search(r'\d+', str(text))
     return int(match.group()) if match else 3
 
-def calculate_student_vectors(df_students, df_units):
-    processed_students = []
+def build_student_matrix(df_students):
+    """מחזיר את שמות הסטודנטים, עמודות השאלות ומטריצת הדירוגים (סטודנטים x שאלות)"""
+    import numpy as np
     df_students = df_students.dropna(subset=['שם מלא'])
     q_cols = [c for c in df_students.columns if '?' in c and 'הבהרה' not in c]
-    
-    for _, row in df_students.iterrows():
-        name = str(row['שם מלא']).strip()
-        if not name or name.lower() == 'nan': continue
-            
-        s_vec = np.array([extract_rating(row[c]) for c in q_cols])
-        dists = []
-        for _, unit in df_units.iterrows():
-            u_vec = np.array(unit.iloc[2:2+len(q_cols)].values, dtype=float)
-            dist = np.linalg.norm(s_vec - u_vec)
-            dists.append((unit['UnitName'], dist))
-            
-        sorted_units = [d[0] for d in sorted(dists, key=lambda x: x[1])]
-        processed_students.append({"name": name, "prefs": sorted_units, "voice": 1.0})
-        
+
+    names = df_students['שם מלא'].astype(str).str.strip()
+    valid = (names != '') & (names.str.lower() != 'nan')
+    answers = df_students.loc[valid, q_cols].apply(lambda col: col.map(extract_rating))
+    matrix = answers.to_numpy(dtype=np.float32).reshape(int(valid.sum()), len(q_cols))
+    return names[valid].tolist(), q_cols, matrix
+
+def build_unit_matrix(df_units, n_questions):
+    """מטריצת פרופילי היחידות (יחידות x שאלות) - העמודות שאחרי UnitName ו-Capacity"""
+    return df_units.iloc[:, 2:2+n_questions].to_numpy(dtype=float)
+
+def unit_distance_column(student_matrix, unit_vec):
+    """מרחק אוקלידי של כל הסטודנטים מפרופיל יחידה אחת (עמודה אחת במטריצת המרחקים)"""
+    import numpy as np
+    return np.linalg.norm(np.asarray(student_matrix, dtype=float) - np.asarray(unit_vec, dtype=float), axis=1)
+
+def build_distance_matrix(student_matrix, unit_matrix):
+    """מטריצת מרחקים מלאה (סטודנטים x יחידות), עמודה אחר עמודה כדי לחסוך בזיכרון"""
+    import numpy as np
+    dists = np.empty((len(student_matrix), len(unit_matrix)), dtype=float)
+    for j, u_vec in enumerate(unit_matrix):
+        dists[:, j] = unit_distance_column(student_matrix, u_vec)
+    return dists
+
+def prefs_from_distances(dists, unit_names):
+    """רשימות העדפה ממוינות לפי מרחק (שוויון נשבר לפי סדר היחידות, כמו sorted היציב)"""
+    import numpy as np
+    order = np.argsort(dists, axis=1, kind='stable')
+    return [[unit_names[j] for j in row] for row in order]
+
+def build_vector_state(df_students, df_units):
+    """
+    מחשב את כל מצב הוקטורים מקבצי ההעלאה.
+    מחזיר: רשימת סטודנטים (עם vec_row), עמודות שאלות, מטריצת דירוגים, פרופילי יחידות ומטריצת מרחקים.
+    """
+    names, q_cols, student_matrix = build_student_matrix(df_students)
+    unit_matrix = build_unit_matrix(df_units, len(q_cols))
+    unit_names = df_units['UnitName'].tolist()
+    dists = build_distance_matrix(student_matrix, unit_matrix)
+    prefs = prefs_from_distances(dists, unit_names)
+
+    processed_students = [
+        {"name": name, "prefs": p, "voice": 1.0, "vec_row": i}
+        for i, (name, p) in enumerate(zip(names, prefs))
+    ]
+    return processed_students, q_cols, student_matrix, unit_matrix, dists
+
+def calculate_student_vectors(df_students, df_units):
+    processed_students, _, _, _, _ = build_vector_state(df_students, df_units)
+    for s in processed_students:
+        del s['vec_row']
     return processed_students
 
+def insert_unit_pref(prefs, unit_name, dist_row, unit_cols):
+    """
+    הכנסת יחידה לרשימת העדפות ממוינת בלי למיין מחדש - חיפוש בינארי, O(log יחידות) מפתחות.
+    המפתח (מרחק, מיקום עמודה) שומר על אותו סדר שהמיון המלא היה נותן.
+    יחידה ברשימה שאין לה עמודת מרחקים מקבלת את המפתח של היחידה המוכרת שלפניה (הסדר נשמר).
+    """
+    def key(i):
+        while i >= 0:
+            col = unit_cols.get(prefs[i])
+            if col is not None:
+                return (dist_row[col], col)
+            i -= 1
+        return (float('-inf'), -1)
+
+    col = unit_cols[unit_name]
+    prefs.insert(bisect.bisect_right(range(len(prefs)), (dist_row[col], col), key=key), unit_name)
+
+def ranks_to_tiers(ranks):
+    """
+    הפיכת דירוגים למבנה של Tiers (קבוצות), לפי סדר הדירוג (מהקטן לגדול).
+    דוגמה: { "דן": 1, "יוסי": 1, "ערן": 2 } -> [ ["דן", "יוסי"], ["ערן"] ]
+    """
+    tier_map = {}
+    for name, rank_val in ranks.items():
+        tier_map.setdefault(rank_val, []).append(name)
+    return [tier_map[k] for k in sorted(tier_map.keys())]
+
+def parse_unit_rankings(df):
+    """
+    פענוח קובץ דירוג היחידות (שורה = יחידה, עמודה = סטודנט, ערך = דירוג) בפעולות וקטוריות.
+    הגיליון נפרש לטבלה ארוכה פעם אחת (melt), הדירוגים מומרים ב-pd.to_numeric,
+    ורמות הדירוג של כל היחידות נבנות ב-groupby אחד.
+    מחזיר: (unit_name -> רשימת Tiers, רשימת שגיאות אימות)
+    """
+    import pandas as pd
+    first_col_name = df.columns[0]
+    errors = []
+
+    units = df[first_col_name].astype(str).str.strip()
+    valid_units = (units != '') & (units.str.lower() != 'nan')
+    df = df.loc[valid_units].copy()
+    df[first_col_name] = units[valid_units]
+
+    # יחידה שמופיעה כמה פעמים - השורה האחרונה קובעת (כמו בעיבוד שורה-אחר-שורה)
+    duplicated = df[first_col_name].duplicated(keep='last')
+    for unit_name in df.loc[duplicated, first_col_name].unique():
+        errors.append(f"היחידה '{unit_name}' מופיעה יותר מפעם אחת - נלקחה השורה האחרונה")
+    df = df.loc[~duplicated]
+
+    long_df = df.melt(id_vars=first_col_name, var_name='student', value_name='raw')
+    raw_text = long_df['raw'].astype(str).str.strip()
+    present = long_df['raw'].notna() & (raw_text != '')
+    long_df = long_df.loc[present]
+
+    ranks = pd.to_numeric(raw_text[present], errors='coerce')
+    bad = ranks.isna() | (ranks != ranks.round())
+    for unit_name, student, raw in long_df.loc[bad, [first_col_name, 'student', 'raw']].itertuples(index=False):
+        errors.append(f"דירוג לא תקין '{raw}' ליחידה '{unit_name}' עבור '{student}'")
+
+    long_df = long_df.loc[~bad].assign(rank=ranks[~bad].astype(int))
+    # groupby שומר על סדר ההופעה בתוך כל קבוצה, כלומר סדר עמודות הסטודנטים בגיליון
+    grouped = long_df.groupby([first_col_name, 'rank'], sort=True)['student'].agg(list)
+
+    prefs_by_unit = {unit_name: [] for unit_name in df[first_col_name]}
+    for (unit_name, _), students in grouped.items():
+        prefs_by_unit[unit_name].append(students)
+
+    return prefs_by_unit, errors
+
+def gamma_grid(start, stop, step):
+    """ערכי Gamma לבדיקה - אותם ערכים בדיוק כמו np.arange(start, stop, step), בלי NumPy"""
+    count = max(0, math.ceil((stop - start) / step))
+    return [start + i * step for i in range(count)]
+
 # --- 3. האלגוריתם המלא (weighted_gale_shapley) ששלחת ---
 
 def get_rank(student: Student, university_name: str) -> int:
@@ -190,80 +305,477 @@ def boost_voice_by_demand(students, universities, alpha=1.0):
     for name, s in students.items():
         s.voice += alpha * counts[name]
 
-def run_optimized_matching(students_data, units_data):
-    """מריץ אופטימיזציה למציאת Gamma אידיאלי - משתמש ב-Power הנוכחי"""
-    def reset_data():
-        s = {sd['name']: Student(sd['name'], sd['prefs'], sd['voice']) for sd in students_data}
-        u = {name: University(name, ud['capacity'], ud['prefs'], ud.get('power', 1.0)) 
-             for name, ud in units_data.items()}
-        return s, u
-
-    best_gamma = 1.0
-    fewest_unmatched = float('inf')
-    final_results = None
-
-    for g in np.arange(0.5, 3.0, 0.5):
-        s, u = reset_data()
-        boost_voice_by_demand(s, u)
-        m, r = weighted_gale_shapley(s, u, gamma=g)
-        unmatched = sum(1 for v in m.values() if v is None)
-        if unmatched < fewest_unmatched:
-            fewest_unmatched = unmatched
-            best_gamma = g
-            final_results = (m, r)
-
-    return final_results, best_gamma
-
-def run_full_optimization(students_data, units_data, iterations=200):
+def run_optimized_matching(students_data, units_data, stats=None):
+    """
+    מריץ אופטימיזציה למציאת Gamma אידיאלי - משתמש ב-Power הנוכחי.
+    כל הטווח 0.5-2.5 נבדק לפי נקודות השבירה (sweep_gamma), וההסברים מחושבים בריצה אחת על ה-Gamma שנבחר.
+    stats - מילון אופציונלי שמתמלא בחסם (unmatched_bound) ובמספר הריצות.
+    """
+    problem = MatchingProblem(students_data, units_data)
+    stats = {} if stats is None else stats
+    bound = min_unmatched_bound(problem)
+    _, best_gamma = best_gamma_match(problem, GAMMA_RANGE, bound=bound, stats=stats)
+    stats['unmatched_bound'] = bound
+    return explain_matching(students_data, units_data, best_gamma), best_gamma
+
+def explain_matching(students_data, units_data, gamma, powers=None):
+    """ריצה אחת של weighted_gale_shapley (כולל הסברים) על Gamma ו-Power נתונים"""
+    powers = powers or {}
+    s = {sd['name']: Student(sd['name'], sd['prefs'], sd['voice']) for sd in students_data}
+    u = {name: University(name, ud['capacity'], ud['prefs'], powers.get(name, ud.get('power', 1.0)))
+         for name, ud in units_data.items()}
+    boost_voice_by_demand(s, u)
+    return weighted_gale_shapley(s, u, gamma=gamma)
+
+def run_full_optimization(students_data, units_data, iterations=200, stats=None, history=None):
     """
     אופטימיזציה מלאה - מוצא את Gamma ו-Power האופטימליים.
     יחידות עם 'sticky_power': True ישמרו את ה-Power המקורי שלהן.
+    החיפוש האקראי רץ על רשת ה-Gamma (בלי ריצות כפולות - scan_gammas), וה-Power הטוב ביותר
+    נבדק בסוף על כל טווח ה-Gamma לפי נקודות השבירה.
+    החיפוש נעצר ברגע שמגיעים לחסם (min_unmatched_bound) - אי אפשר לשבץ יותר מזה.
+    stats - מילון אופציונלי שמתמלא בחסם, במספר הריצות והאם החיפוש נעצר מוקדם.
+    history - TuningHistory אופציונלי (tuning_history.py): החיפוש מתחיל מהתצורות הטובות ביותר
+    של ריצות קודמות, תצורה שכבר נמדדה על אותה בעיה לא רצה שוב (ולא נספרת מתוך iterations),
+    והתוצאות נשמרות בסוף.
     """
-    best_matches = None
-    best_reasons = None
-    best_unmatched_count = float('inf')
-    best_gamma = 1.0
-    best_powers = {}
+    problem = MatchingProblem(students_data, units_data)
+    stats = {} if stats is None else stats
+    bound = min_unmatched_bound(problem)
+    stats.update(unmatched_bound=bound, runs=0, stopped_early=False, reused=0)
+    best = None                 # (לא משובצים, Gamma, אינדקס המועמד)
     
     print(f"🔄 מתחיל אופטימיזציה מלאה עם {iterations} איטרציות...")
 
-    for iteration in range(iterations):
-        # יצירת עותק עמוק של הנתונים
-        current_units_data = copy.deepcopy(units_data)
-        
-        # שינוי Power רק ליחידות שאינן Sticky
-        for u_name, u_info in current_units_data.items():
-            if not u_info.get('sticky_power', False):
-                # הגרלת כוח חדש בטווח 0.5 עד 50.0
-                u_info['power'] = round(random.uniform(0.5, 50.0), 1)
-        
-        # הרצת אופטימיזציית Gamma עם ה-Powers החדשים
-        def reset_data(gamma_val):
-            s = {sd['name']: Student(sd['name'], sd['prefs'], sd['voice']) for sd in students_data}
-            u = {name: University(name, ui['capacity'], ui['prefs'], ui['power']) 
-                 for name, ui in current_units_data.items()}
-            return s, u
-        
-        # בדיקת מספר ערכי Gamma
-        for g in np.arange(0.5, 5.0, 0.5):
-            s, u = reset_data(g)
-            boost_voice_by_demand(s, u)
-            matches, reasons = weighted_gale_shapley(s, u, gamma=g)
-            unmatched_count = sum(1 for m in matches.values() if m is None)
-
-            # אם מצאנו שיבוץ טוב יותר - שומרים אותו
-            if unmatched_count < best_unmatched_count:
-                best_unmatched_count = unmatched_count
-                best_matches = matches
-                best_reasons = reasons
+    # שינוי Power רק ליחידות שאינן Sticky - הגרלת כוח חדש בטווח 0.5 עד 50.0
+    draw_powers = lambda: [p if sticky else round(random.uniform(0.5, 50.0), 1)
+                           for p, sticky in zip(problem.power, problem.sticky)]
+    gammas = gamma_grid(0.5, 5.0, 0.5)
+
+    # היסטוריה: קודם התצורות הטובות מריצות קודמות, אחר כך הגרלות חדשות (בלי תצורות שכבר נמדדו)
+    seeds, known, seen = history.warm_start(problem) if history else ([], {}, set())
+    # תצורות מההיסטוריה שהתוצאה שלהן ידועה לא רצות, ולכן לא נספרות מתוך התקציב:
+    # גם ריצה חוזרת על בעיה שלא השתנתה מקבלת iterations הגרלות חדשות (שלא נמדדו קודם)
+    iterations += sum(1 for powers in seeds if history.key(powers) in known) if history else 0
+    stats['iterations'] = iterations
+    def candidate(i):
+        if i < len(seeds):
+            return seeds[i]
+        powers = draw_powers()
+        for _ in range(10):
+            if history is None or history.key(powers) not in seen:
+                break
+            powers = draw_powers()
+        return powers
+    score = lambda powers: known.get(history.key(powers)) if history else None
+    candidates = []
+
+    import distributed
+    workers = distributed.worker_addresses()
+    if workers:
+        # מצב מבוזר (SMARTPLACE_WORKERS): כל ה-Power מוגרלים מראש ומחולקים למנות בין ה-Workers.
+        # הבחירה זהה ללולאה הרציפה - המועמד הראשון עם הכי מעט לא משובצים
+        candidates = [candidate(i) for i in range(iterations)]
+        prior = {i: score(c)[:2] for i, c in enumerate(candidates) if score(c)}
+        stats['reused'] = len(prior)
+        results = distributed.search_powers(problem, candidates, gammas, bound, workers, stats, known=prior)
+        if results:
+            c = min(results, key=lambda i: (results[i][0], i))
+            best = (results[c][0], results[c][1], c)
+            print(f"✅ {len(workers)} Workers: הטוב ביותר באיטרציה {c+1}, Gamma={best[1]:.1f}, לא משובצים={best[0]}")
+        evaluated = [(candidates[i], unmatched, g) for i, (unmatched, g, _) in sorted(results.items())]
+
+    else:
+        evaluated = []
+        for iteration in range(iterations):
+            powers = candidate(iteration)
+            candidates.append(powers)
+            known_score = score(powers)
+            if known_score:
+                # נמדד כבר על אותה בעיה - התוצאה מההיסטוריה, בלי ריצה
+                stats['reused'] += 1
+                results = [(known_score[1], known_score[0])]
+            else:
+                # בדיקת מספר ערכי Gamma
+                results = ((g, match.count(-1)) for g, match in scan_gammas(problem, gammas, powers))
+
+            candidate_best = None
+            for g, unmatched_count in results:
+                stats['runs'] += 0 if known_score else 1
+                if candidate_best is None or unmatched_count < candidate_best[0]:
+                    candidate_best = (unmatched_count, g)
+
+                # אם מצאנו שיבוץ טוב יותר - שומרים אותו
+                if best is None or unmatched_count < best[0]:
+                    best = (unmatched_count, g, iteration)
+                    print(f"✅ איטרציה {iteration+1}: נמצא שיפור! Gamma={g:.1f}, לא משובצים={unmatched_count}")
+                if best[0] <= bound:
+                    break
+            evaluated.append((powers, *candidate_best))
+
+            # אם הגענו לחסם (למשל 0 לא משובצים), אפשר לעצור מוקדם
+            if best[0] <= bound:
+                break
+
+    if best is None:
+        return (None, None), 1.0, {}
+    best_unmatched_count, best_gamma, c = best
+    powers = candidates[c]
+    best_powers = dict(zip(problem.unit_names, powers))
+    refined = bool(score(powers) and score(powers)[2])
+
+    if best_unmatched_count <= bound:
+        stats['stopped_early'] = True
+        if best_unmatched_count == 0:
+            print(f"🎉 הושג שיבוץ מושלם! כל הסטודנטים שובצו.")
+        else:
+            print(f"🎯 הושג המינימום האפשרי: {bound} לא משובצים (אין להם יחידה פנויה שמדרגת אותם).")
+    elif not refined:
+        # חידוד: כל הטווח של Gamma (ולא רק הרשת) עבור ה-Power הטוב ביותר
+        for _, _, g, match in sweep_gamma(problem, *FULL_GAMMA_RANGE, powers):
+            stats['runs'] += 1
+            if match.count(-1) < best_unmatched_count:
+                best_unmatched_count = match.count(-1)
                 best_gamma = g
-                best_powers = {n: u.power for n, u in u.items()}
-                print(f"✅ איטרציה {iteration+1}: נמצא שיפור! Gamma={g:.1f}, לא משובצים={unmatched_count}")
-                
-            # אם הגענו ל-0 לא משובצים, אפשר לעצור מוקדם
-            if best_unmatched_count == 0:
-                print(f"🎉 הושג שיבוץ מושלם! כל הסטודנטים שובצו.")
-                return (best_matches, best_reasons), best_gamma, best_powers
+                print(f"✅ חידוד Gamma: Gamma={g}, לא משובצים={best_unmatched_count}")
+            if best_unmatched_count <= bound:
+                stats['stopped_early'] = True
+                break
+        refined = True
+
+    if history:
+        history.record(problem, evaluated, (powers, best_unmatched_count, best_gamma, refined))
 
     print(f"✨ אופטימיזציה הושלמה. הטוב ביותר: Gamma={best_gamma:.1f}, לא משובצים={best_unmatched_count}")
-    return (best_matches, best_reasons), best_gamma, best_powers
\ No newline at end of file
+    return explain_matching(students_data, units_data, best_gamma, best_powers), best_gamma, best_powers
+
+# --- 5. בעיה מקודדת במספרים (לתרחישים ולחיפושים עם הרבה ריצות) ---
+
+class MatchingProblem:
+    """
+    הכנה חד-פעמית של הנתונים לריצות חוזרות: שמות -> אינדקסים, רשימות המועמדים של היחידות,
+    טבלת דירוגים (get_rank) לכל סטודנט x יחידה ו-voice אחרי boost_voice_by_demand.
+    Power ו-Capacity הם הפרמטרים היחידים שמשתנים בין ריצות, ולכן הם לא חלק מההכנה.
+    """
+
+    def __init__(self, students_data, units_data, alpha=1.0):
+        students = {sd['name']: sd for sd in students_data}
+        self.student_names = list(students)
+        self.unit_names = list(units_data)
+        self.n_units = len(self.unit_names)
+        student_idx = {name: i for i, name in enumerate(self.student_names)}
+
+        self.capacity = [int(units_data[u]['capacity']) for u in self.unit_names]
+        self.power = [units_data[u].get('power', 1.0) for u in self.unit_names]
+        self.sticky = [bool(units_data[u].get('sticky_power', False)) for u in self.unit_names]
+
+        # רשימת המועמדים השטוחה של כל יחידה. -1 = שם ריק או לא מוכר (היחידה מדלגת עליו)
+        # ו-unit_tiers: באיזו רמה (Tier, 0 = הראשונה) כל סטודנט מופיע אצל היחידה
+        self.unit_prefs = []
+        self.unit_tiers = []
+        demand = [0] * len(self.student_names)
+        for u in self.unit_names:
+            flat = University(u, 0, units_data[u]['prefs']).preferences_flat
+            row = [student_idx.get(c, -1) if c else -1 for c in flat]
+            for s in row:
+                if s >= 0:
+                    demand[s] += 1
+            self.unit_prefs.append(row)
+            tiers = {}
+            for t, tier in enumerate(units_data[u]['prefs']):
+                for c in (tier if isinstance(tier, list) else [tier]):
+                    if c in student_idx:
+                        tiers.setdefault(student_idx[c], t)
+            self.unit_tiers.append(tiers)
+
+        # הדירוג של כל יחידה אצל כל סטודנט - בדיוק כמו get_rank (מופע ראשון, ואחרת len(prefs))
+        self.ranks = []
+        self.voice = []
+        for i, name in enumerate(self.student_names):
+            prefs = students[name]['prefs']
+            first = {}
+            for r, tier in enumerate(prefs):
+                for u in (tier if isinstance(tier, list) else [tier]):
+                    first.setdefault(u, r)
+            self.ranks.append([first.get(u, len(prefs)) for u in self.unit_names])
+            self.voice.append(students[name].get('voice', 1.0) + alpha * demand[i])
+
+    def unit_index(self, unit_name):
+        return self.unit_names.index(unit_name)
+
+_kernel = None
+
+def _load_kernel():
+    """הליבה המקומפלת (match_kernel) אם Numba מותקן, אחרת False. נטען פעם אחת, בשיבוץ הראשון"""
+    global _kernel
+    if _kernel is None:
+        try:
+            import match_kernel
+            _kernel = match_kernel if match_kernel.ENABLED else False
+        except ImportError:
+            _kernel = False
+    return _kernel
+
+def match_problem(problem, gamma, powers=None, capacities=None, interval=None):
+    """
+    אותו שיבוץ כמו weighted_gale_shapley (אותו סדר הצעות ואותן השוואות), על מספרים בלבד וללא הסברים.
+    מחזיר לכל סטודנט את אינדקס היחידה שלו, או -1 אם לא שובץ.
+    interval - רשימה [מינימום, מקסימום, האם המקסימום פתוח] שמצטמצמת לטווח ה-Gamma שבו כל ההשוואות שבוצעו יוצאות אותו דבר
+    (ולכן כל הריצה - ואיתה השיבוץ - זהה לכל Gamma בטווח).
+    כש-Numba מותקן הריצה עוברת לליבה המקומפלת (match_kernel), אחרת - match_problem_python.
+    """
+    powers = problem.power if powers is None else powers
+    capacities = problem.capacity if capacities is None else capacities
+    kernel = _load_kernel()
+    if kernel:
+        return kernel.match(problem, gamma, powers, capacities, interval)
+    return match_problem_python(problem, gamma, powers, capacities, interval)
+
+def match_problem_python(problem, gamma, powers, capacities, interval=None):
+    """גרסת ה-Python של match_problem (גם הייחוס לבדיקת הליבה המקומפלת)"""
+    n = problem.n_units
+    voice, ranks, unit_prefs = problem.voice, problem.ranks, problem.unit_prefs
+
+    match = [-1] * len(problem.student_names)
+    accepted = [0] * n
+    pointer = [0] * n
+    queued = [0] * n   # כמה פעמים כל יחידה נמצאת בתור (במקור יחידה יכולה להופיע בתור פעמיים)
+
+    queue = deque(sorted([u for u in range(n) if capacities[u] > 0], key=lambda u: powers[u], reverse=True))
+    for u in queue:
+        queued[u] += 1
+
+    while queue:
+        u = queue.popleft()
+        queued[u] -= 1
+        prefs = unit_prefs[u]
+        if pointer[u] >= len(prefs):
+            continue
+        s = prefs[pointer[u]]
+        pointer[u] += 1
+        if s < 0:
+            continue
+
+        v = match[s]
+        if v == -1:
+            match[s] = u
+            accepted[u] += 1
+        else:
+            total_new = voice[s] * (n - ranks[s][u]) + gamma * powers[u]
+            total_old = voice[s] * (n - ranks[s][v]) + gamma * powers[v]
+            if interval is not None:
+                _narrow_interval(interval, total_new > total_old,
+                                 voice[s] * (ranks[s][u] - ranks[s][v]), powers[u] - powers[v])
+            if total_new > total_old:
+                accepted[v] -= 1
+                accepted[u] += 1
+                match[s] = u
+                if accepted[v] < capacities[v]:
+                    queue.append(v)
+                    queued[v] += 1
+
+        if accepted[u] < capacities[u] and pointer[u] < len(prefs) and not queued[u]:
+            queue.append(u)
+            queued[u] += 1
+
+    return match
+
+# --- 6. נקודות השבירה של Gamma ---
+# כל השוואה באלגוריתם היא voice*(n-r_new) + gamma*p_new > voice*(n-r_old) + gamma*p_old,
+# כלומר gamma*(p_new-p_old) > voice*(r_new-r_old) - ליניארית ב-Gamma, ומתהפכת בנקודה אחת בדיוק.
+# לכן במקום רשת קבועה של ערכים: מריצים, מוצאים את הטווח שבו כל ההשוואות שבוצעו לא מתהפכות,
+# וקופצים ישר לטווח הבא. כל טווח נבדק פעם אחת, וכל הציר מכוסה.
+
+GAMMA_RANGE = (0.5, 2.5)        # הטווח של run_optimized_matching (הרשת הקודמת: 0.5, 1.0, ..., 2.5)
+FULL_GAMMA_RANGE = (0.5, 4.5)   # הטווח של run_full_optimization (הרשת הקודמת: 0.5, 1.0, ..., 4.5)
+
+def _narrow_interval(interval, switched, dv, dp):
+    """
+    gamma*dp > dv נשאר כמו שהיה (switched) רק בצד אחד של dv/dp.
+    interval = [תחתון, עליון, האם העליון פתוח]. בנקודת השבירה עצמה יש שוויון, כלומר "לא מחליפים":
+    כשהצד שלנו הוא "לא מחליפים" הנקודה שייכת לטווח, וכשהוא "מחליפים" - לא.
+    """
+    if dp == 0:
+        return
+    flip = dv / dp
+    if (dp > 0) == switched:
+        interval[0] = max(interval[0], flip)
+    elif flip < interval[1]:
+        interval[1], interval[2] = flip, switched
+    elif flip == interval[1]:
+        interval[2] = interval[2] or switched
+
+def _simple_gamma(lower, upper):
+    """ערך "עגול" בתוך הטווח (לתצוגה), ואם אין - האמצע"""
+    if lower == upper:
+        return lower
+    mid = (lower + upper) / 2
+    for digits in range(1, 7):
+        g = round(mid, digits)
+        if lower < g < upper:
+            return g
+    return mid
+
+def sweep_gamma(problem, lo, hi, powers=None, capacities=None):
+    """
+    מעבר על כל הטווחים של Gamma בין lo ל-hi שבהם השיבוץ קבוע.
+    מחזיר לכל טווח (תחתון, עליון, Gamma מייצג, match). lo == hi = ריצה אחת על Gamma קבוע.
+    נקודת שבירה שבה השיבוץ שונה משני הצדדים (שוויון מדויק, נפוץ כשה-Power עגול) מוחזרת כטווח באורך 0.
+    """
+    g = lo
+    while True:
+        interval = [float('-inf'), float('inf'), False]
+        match = match_problem(problem, g, powers, capacities, interval)
+        upper, upper_open = interval[1], interval[2]
+        if upper <= g:
+            # הריצה מדויקת רק בנקודה g עצמה
+            yield g, g, g, match
+        else:
+            # Gamma מייצג בתוך הטווח ולא על הקצה, כדי שלא יהיה תלוי בעיגול
+            end = min(upper, hi)
+            yield g, end, _simple_gamma(g, end), match
+        if upper > hi or (upper == hi and not upper_open):
+            return
+        if upper > g and upper_open:
+            g = upper   # בנקודת השבירה עצמה השיבוץ שונה - בודקים אותה בנפרד
+        else:
+            g = max(upper, g)
+            g += max(1e-9, abs(g) * 1e-9)
+
+def scan_gammas(problem, gammas, powers=None, capacities=None):
+    """
+    ריצה על רשימה ממוינת של ערכי Gamma, בלי להריץ שוב Gamma שנמצא בטווח של ריצה קודמת
+    (השיבוץ שלו זהה, והקודם ממילא מנצח בשוויון). מחזיר (gamma, match) לכל ריצה שבוצעה.
+    """
+    covered = None
+    for g in gammas:
+        if covered and covered[0] <= g and (g < covered[1] or (g == covered[1] and not covered[2])):
+            continue
+        interval = [float('-inf'), float('inf'), False]
+        match = match_problem(problem, g, powers, capacities, interval)
+        covered = (g, interval[1], interval[2])
+        yield g, match
+
+def best_gamma_match(problem, gamma_range=GAMMA_RANGE, powers=None, capacities=None, bound=0, stats=None):
+    """
+    כמו run_optimized_matching: הטווח הראשון עם הכי מעט לא משובצים. מחזיר (match, gamma).
+    עוצר כשמגיעים ל-bound לא משובצים (טווח מאוחר יותר לא יכול להיות טוב יותר, ובשוויון הראשון מנצח).
+    """
+    best = None
+    runs = 0
+    for _, _, g, match in sweep_gamma(problem, *gamma_range, powers, capacities):
+        runs += 1
+        unmatched = match.count(-1)
+        if best is None or unmatched < best[0]:
+            best = (unmatched, match, g)
+        if best[0] <= bound:
+            break
+    if stats is not None:
+        stats.update(runs=runs, stopped_early=best[0] <= bound)
+    return best[1], best[2]
+
+# --- 7. חסם: כמה סטודנטים אפשר לשבץ בכלל ---
+# סטודנט יכול להגיע רק ליחידה שמדרגת אותו, וכל יחידה מקבלת עד Capacity סטודנטים.
+# השיבוץ המקסימלי בגרף הזה (b-matching, בשיטת Hopcroft-Karp) הוא חסם לכל Gamma ו-Power:
+# אף ריצה לא תשבץ יותר סטודנטים ממנו, ולכן כשמגיעים אליו אין טעם להמשיך לחפש.
+
+def max_placeable(problem, capacities=None):
+    """מספר הסטודנטים המקסימלי שאפשר לשבץ בבת אחת (בלי קשר לסדר ההצעות)"""
+    capacities = problem.capacity if capacities is None else capacities
+    n_students = len(problem.student_names)
+    adj = [[] for _ in range(n_students)]
+    for u, prefs in enumerate(problem.unit_prefs):
+        if capacities[u] <= 0:
+            continue
+        for s in set(prefs):
+            if s >= 0:
+                adj[s].append(u)
+
+    match = [-1] * n_students
+    assigned = [[] for _ in capacities]
+
+    # התחלה חמדנית, ואז שלבים של מסלולים משפרים קצרים ביותר
+    for s in range(n_students):
+        for u in adj[s]:
+            if len(assigned[u]) < capacities[u]:
+                match[s] = u
+                assigned[u].append(s)
+                break
+
+    inf = float('inf')
+    while True:
+        # BFS: שכבות מהסטודנטים הפנויים, דרך יחידות מלאות אל הסטודנטים שלהן
+        dist = [inf] * n_students
+        queue = deque()
+        for s in range(n_students):
+            if match[s] == -1 and adj[s]:
+                dist[s] = 0
+                queue.append(s)
+        limit = inf
+        while queue:
+            s = queue.popleft()
+            if dist[s] >= limit:
+                continue
+            for u in adj[s]:
+                if len(assigned[u]) < capacities[u]:
+                    limit = min(limit, dist[s] + 1)
+                else:
+                    for t in assigned[u]:
+                        if dist[t] == inf:
+                            dist[t] = dist[s] + 1
+                            queue.append(t)
+        if limit == inf:
+            break
+
+        # DFS לאורך השכבות: העברת סטודנטים בין יחידות כדי לפנות מקום.
+        # איטרטיבי (מחסנית מפורשת) - מסלול משפר יכול לעבור דרך אלפי יחידות, יותר מגבול הרקורסיה
+        def moves(s):
+            """הצעדים האפשריים מ-s: (יחידה פנויה, None) בשכבה האחרונה, או (יחידה, הסטודנט שיפנה לה מקום)"""
+            for u in adj[s]:
+                if len(assigned[u]) < capacities[u]:
+                    if dist[s] + 1 == limit:
+                        yield u, None
+                    continue
+                for t in list(assigned[u]):
+                    if dist[t] == dist[s] + 1 and dist[t] < limit:
+                        yield u, t
+
+        def augment(root):
+            stack = [(root, moves(root))]
+            path = []   # (סטודנט, יחידה, מי שמפנה לו מקום בה) לכל שלב במחסנית
+            while stack:
+                s, steps = stack[-1]
+                step = next(steps, None)
+                if step is None:
+                    dist[s] = inf   # אין מכאן מסלול - לא לנסות שוב בשלב הזה
+                    stack.pop()
+                    if path:
+                        path.pop()
+                    continue
+                u, t = step
+                if t is not None:
+                    path.append((s, u, t))
+                    stack.append((t, moves(t)))
+                    continue
+                # נמצא מקום פנוי: מהסוף להתחלה, כל סטודנט נכנס ליחידה שהבא אחריו פינה
+                assigned[u].append(s)
+                match[s] = u
+                for s, u, t in reversed(path):
+                    assigned[u].remove(t)
+                    assigned[u].append(s)
+                    match[s] = u
+                return True
+            return False
+
+        progressed = False
+        for s in range(n_students):
+            if match[s] == -1 and dist[s] == 0 and augment(s):
+                progressed = True
+        if not progressed:
+            break
+
+    return sum(1 for u in match if u >= 0)
+
+def min_unmatched_bound(problem, capacities=None):
+    """המינימום האפשרי של לא משובצים"""
+    return len(problem.student_names) - max_placeable(problem, capacities)
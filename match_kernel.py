@@ -0,0 +1,120 @@
+import os
+import numpy as np
+
+try:
+    import numba
+except ImportError:   # Numba לא חובה - בלעדיו match_problem רץ בגרסת ה-Python
+    numba = None
+
+# --- ליבת שיבוץ מקומפלת (JIT) ---
+# אותה לולאת הצעות כמו logic.match_problem, על מערכי NumPy של מספרים בלבד, מקומפלת ב-Numba.
+# נטענת אוטומטית כש-Numba מותקן (SMARTPLACE_JIT=0 מכבה). אין כאן הסברים (reasons) -
+# אותם מחשבים בריצה אחת של weighted_gale_shapley על התוצאה הסופית.
+
+ENABLED = numba is not None and os.environ.get('SMARTPLACE_JIT', '1') != '0'
+
+def _kernel(order, unit_ptr, unit_idx, ranks, voice, powers, capacities, gamma, interval, track):
+    n = capacities.shape[0]
+    match = np.full(voice.shape[0], -1, np.int64)
+    accepted = np.zeros(n, np.int64)
+    pointer = np.zeros(n, np.int64)
+    queued = np.zeros(n, np.int64)
+
+    # תור מעגלי שגדל לפי הצורך (יחידה יכולה להופיע בו יותר מפעם אחת, כמו ברשימה המקורית)
+    size = max(16, 2 * n)
+    buf = np.empty(size, np.int64)
+    head = 0
+    count = 0
+    for k in range(order.shape[0]):
+        buf[count] = order[k]
+        count += 1
+        queued[order[k]] += 1
+
+    while count > 0:
+        u = buf[head]
+        head = (head + 1) % size
+        count -= 1
+        queued[u] -= 1
+
+        start = unit_ptr[u]
+        length = unit_ptr[u + 1] - start
+        if pointer[u] >= length:
+            continue
+        s = unit_idx[start + pointer[u]]
+        pointer[u] += 1
+        if s < 0:
+            continue
+
+        v = match[s]
+        push = -1
+        if v == -1:
+            match[s] = u
+            accepted[u] += 1
+        else:
+            total_new = voice[s] * (n - ranks[s, u]) + gamma * powers[u]
+            total_old = voice[s] * (n - ranks[s, v]) + gamma * powers[v]
+            switched = total_new > total_old
+            if track:
+                dp = powers[u] - powers[v]
+                if dp != 0:
+                    flip = voice[s] * (ranks[s, u] - ranks[s, v]) / dp
+                    if (dp > 0) == switched:
+                        interval[0] = max(interval[0], flip)
+                    elif flip < interval[1]:
+                        interval[1] = flip
+                        interval[2] = 1.0 if switched else 0.0
+                    elif flip == interval[1] and switched:
+                        interval[2] = 1.0
+            if switched:
+                accepted[v] -= 1
+                accepted[u] += 1
+                match[s] = u
+                if accepted[v] < capacities[v]:
+                    push = v
+
+        for w in (push, u):
+            if w == -1:
+                continue
+            if w == u and not (accepted[u] < capacities[u] and pointer[u] < length and queued[u] == 0):
+                continue
+            if count == size:
+                grown = np.empty(size * 2, np.int64)
+                for i in range(count):
+                    grown[i] = buf[(head + i) % size]
+                buf = grown
+                size *= 2
+                head = 0
+            buf[(head + count) % size] = w
+            count += 1
+            queued[w] += 1
+
+    return match
+
+if ENABLED:
+    _kernel = numba.njit(cache=True, nogil=True)(_kernel)
+
+def problem_arrays(problem):
+    """המערכים הקבועים של הבעיה (נבנים פעם אחת ונשמרים על האובייקט)"""
+    arrays = getattr(problem, '_kernel_arrays', None)
+    if arrays is None:
+        lengths = [len(prefs) for prefs in problem.unit_prefs]
+        unit_ptr = np.zeros(len(lengths) + 1, np.int64)
+        unit_ptr[1:] = np.cumsum(lengths)
+        unit_idx = np.array([s for prefs in problem.unit_prefs for s in prefs], np.int64)
+        ranks = np.array(problem.ranks, np.int64).reshape(len(problem.student_names), problem.n_units)
+        voice = np.array(problem.voice, np.float64)
+        arrays = problem._kernel_arrays = (unit_ptr, unit_idx, ranks, voice)
+    return arrays
+
+def match(problem, gamma, powers, capacities, interval=None):
+    """כמו logic.match_problem (אותה חתימה ואותה תוצאה), דרך הליבה המקומפלת"""
+    unit_ptr, unit_idx, ranks, voice = problem_arrays(problem)
+    order = np.array(sorted([u for u in range(problem.n_units) if capacities[u] > 0],
+                            key=lambda u: powers[u], reverse=True), np.int64)
+    bounds = np.array(interval if interval is not None else [0.0, 0.0, 0.0], np.float64)
+    result = _kernel(order, unit_ptr, unit_idx, ranks, voice,
+                     np.asarray(powers, np.float64), np.asarray(capacities, np.int64),
+                     float(gamma), bounds, interval is not None)
+    if interval is not None:
+        interval[0], interval[1], interval[2] = float(bounds[0]), float(bounds[1]), bool(bounds[2])
+    return result.tolist()
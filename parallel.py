@@ -0,0 +1,61 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# --- הרצה מקבילית על בעיה משותפת ---
+# הרבה ריצות קצרות (תרחישים, מועמדים באופטימיזציה) מול אותה בעיה מקודדת (MatchingProblem).
+# הפריטים מחולקים למנה אחת לכל תהליך, כך שהבעיה נשלחת (pickle) פעם אחת לכל Worker ולא לכל פריט.
+# מאגר התהליכים נשמר בין בקשות, כדי לא לשלם על עליית תהליכים בכל פעם.
+
+# מספר תהליכים: SMARTPLACE_PROCESSES, ברירת מחדל - מספר המעבדים
+MAX_PROCESSES = int(os.environ.get('SMARTPLACE_PROCESSES', os.cpu_count() or 1))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn ולא fork - השרת רץ עם Threads, ו-fork באמצע נעילה עלול להיתקע
+            _pool = ProcessPoolExecutor(MAX_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _run_chunk(fn, shared, chunk):
+    return [fn(shared, item) for item in chunk]
+
+def map_shared(fn, shared, items, parallel=True):
+    """
+    מחזיר [fn(shared, item) for item in items] לפי הסדר. fn חייבת להיות פונקציה ברמת מודול.
+    כשיש פריט אחד, תהליך אחד או parallel=False - רץ בתהליך הנוכחי.
+    """
+    items = list(items)
+    workers = min(MAX_PROCESSES, len(items))
+    if not parallel or workers <= 1:
+        return _run_chunk(fn, shared, items)
+
+    chunks = [items[i::workers] for i in range(workers)]
+    try:
+        pool = _get_pool()
+        results = [f.result() for f in [pool.submit(_run_chunk, fn, shared, c) for c in chunks]]
+    except BrokenProcessPool:
+        # תהליך נפל (למשל נגמר זיכרון) - מאגר חדש בפעם הבאה, ועכשיו מחשבים כאן
+        _reset_pool()
+        return _run_chunk(fn, shared, items)
+
+    # החזרת הסדר המקורי (החלוקה הייתה לסירוגין)
+    ordered = [None] * len(items)
+    for i, chunk_results in enumerate(results):
+        ordered[i::workers] = chunk_results
+    return ordered
@@ -0,0 +1,107 @@
+import bisect
+import random
+from logic import MatchingProblem, scan_gammas, gamma_grid
+from parallel import map_shared
+
+# --- אופטימיזציה רב-מטרתית (חזית פרטו) ---
+# במקום מספר אחד (כמה לא שובצו), כל תצורה של Gamma ו-Power נמדדת בכמה מדדים,
+# ונשמרות רק התצורות שאף תצורה אחרת לא טובה מהן בכל המדדים יחד (Non-dominated).
+# כך המפעיל בוחר בעצמו את האיזון, למשל עוד סטודנט לא משובץ תמורת דירוגים טובים יותר לכולם.
+
+GAMMAS = gamma_grid(0.5, 5.0, 0.5)    # אותם ערכים כמו ב-run_full_optimization
+POWER_RANGE = (0.5, 50.0)              # טווח ההגרלה של Power ליחידות שאינן Sticky
+PARALLEL_MIN_WORK = 200_000
+
+# כל המדדים - קטן יותר = טוב יותר
+OBJECTIVES = ('unmatched', 'mean_rank', 'p90_rank', 'unit_tier')
+
+def placement_objectives(problem, match):
+    """
+    unmatched - לא משובצים. mean_rank / p90_rank - דירוג היחידה אצל הסטודנט (1 = העדפה ראשונה, get_rank+1),
+    ממוצע ואחוזון 90 של המשובצים. unit_tier - הרמה הממוצעת של הסטודנטים שכל יחידה קיבלה (1 = הרמה הראשונה).
+    """
+    ranks = sorted(problem.ranks[s][u] + 1 for s, u in enumerate(match) if u >= 0)
+    tiers = [problem.unit_tiers[u].get(s, 0) + 1 for s, u in enumerate(match) if u >= 0]
+    if not ranks:
+        # אף אחד לא שובץ: הערכים הגרועים ביותר האפשריים, כדי ששיבוץ ריק לא ייראה "מושלם" בדירוג
+        worst_rank = max([problem.n_units] + [max(r) for r in problem.ranks if r]) + 1
+        worst_tier = max((max(t.values()) for t in problem.unit_tiers if t), default=0) + 1
+        return (len(match), float(worst_rank), worst_rank, float(worst_tier))
+    p90 = ranks[max(0, -(-len(ranks) * 9 // 10) - 1)]   # אחוזון לפי Nearest-rank
+    return (len(match) - len(ranks),
+            round(sum(ranks) / len(ranks), 4),
+            p90,
+            round(sum(tiers) / len(tiers), 4))
+
+def dominates(a, b):
+    return all(x <= y for x, y in zip(a, b)) and a != b
+
+class ParetoArchive:
+    """
+    ארכיון של הנקודות שאינן נשלטות, ממוין לקסיקוגרפית לפי המדדים.
+    נקודה יכולה להישלט רק ע"י נקודה שקטנה ממנה בסדר הזה, ולשלוט רק בנקודות שגדולות ממנה -
+    כך כל הכנסה בודקת רק חצי מהארכיון בכל כיוון.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._items = []
+
+    def add(self, objectives, item):
+        """מחזיר True אם הנקודה נכנסה לחזית (נקודה זהה שכבר קיימת נשארת)"""
+        i = bisect.bisect_left(self._keys, objectives)
+        if i < len(self._keys) and self._keys[i] == objectives:
+            return False
+        if any(dominates(k, objectives) for k in self._keys[:i]):
+            return False
+        keep = [j for j in range(i, len(self._keys)) if not dominates(objectives, self._keys[j])]
+        self._keys[i:] = [objectives] + [self._keys[j] for j in keep]
+        self._items[i:] = [item] + [self._items[j] for j in keep]
+        return True
+
+    def __len__(self):
+        return len(self._keys)
+
+    def points(self):
+        return list(zip(self._keys, self._items))
+
+def _evaluate(problem, job):
+    """רץ בתהליך Worker: תצורת Power אחת מול כל ערכי ה-Gamma (Gamma שהשיבוץ שלו זהה לקודם מדולג)"""
+    powers, gammas = job
+    return [(g, placement_objectives(problem, match)) for g, match in scan_gammas(problem, gammas, powers)]
+
+def sample_powers(problem, rng):
+    """כמו run_full_optimization: Power אקראי ליחידות שאינן Sticky, ה-Power השמור ל-Sticky"""
+    return [p if sticky else round(rng.uniform(*POWER_RANGE), 1)
+            for p, sticky in zip(problem.power, problem.sticky)]
+
+def pareto_frontier(students_data, units_data, iterations=200, seed=None):
+    """
+    חיפוש אקראי על Power (ליחידות שאינן Sticky) וכל ערכי ה-Gamma, כולל התצורה הנוכחית.
+    מחזיר את החזית ממוינת לפי לא משובצים ואז דירוג ממוצע.
+    """
+    problem = MatchingProblem(students_data, units_data)
+    rng = random.Random(seed)
+    candidates = [list(problem.power)] + [sample_powers(problem, rng) for _ in range(iterations)]
+    jobs = [(powers, GAMMAS) for powers in candidates]
+
+    work = len(jobs) * len(GAMMAS) * sum(len(prefs) for prefs in problem.unit_prefs)
+    results = map_shared(_evaluate, problem, jobs, parallel=work >= PARALLEL_MIN_WORK)
+
+    archive = ParetoArchive()
+    for c, evaluations in enumerate(results):
+        for gamma, objectives in evaluations:
+            archive.add(objectives, (c, gamma))
+
+    frontier = []
+    for objectives, (c, gamma) in archive.points():
+        point = dict(zip(OBJECTIVES, objectives))
+        point['gamma'] = gamma
+        point['powers'] = dict(zip(problem.unit_names, candidates[c]))
+        point['current_powers'] = c == 0
+        frontier.append(point)
+    return {
+        'objectives': list(OBJECTIVES),
+        'evaluated': sum(len(evaluations) for evaluations in results),
+        'frontier': frontier,
+    }
@@ -0,0 +1,163 @@
+import io
+import os
+import re
+import sys
+import hmac
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+# --- פרופיילינג לפי דרישה (On-demand profiling) ---
+# כשמסלול אופטימיזציה איטי בשרת, אפשר לבקש פרופיל לבקשה אחת בלבד: Header או פרמטר עם הטוקן.
+# הבקשה רצה תחת cProfile ובמקביל Thread שדוגם את המחסנית כל כמה מילישניות (Sampling).
+# נשמרים שני קבצים: ‎.prof (ל-pstats / snakeviz) ו-‎.folded (מחסניות מקופלות ל-Flame graph).
+# בלי SMARTPLACE_PROFILE_TOKEN ה-Middleware לא מותקן בכלל - אין שום עלות.
+
+PROFILE_TOKEN = os.environ.get('SMARTPLACE_PROFILE_TOKEN', '')
+PROFILE_DIR = os.environ.get('SMARTPLACE_PROFILE_DIR', 'profiles')
+PROFILE_HEADER = 'X-SmartPlace-Profile'
+PROFILE_PARAM = '_profile'
+SAMPLE_INTERVAL = 0.005    # שניות בין דגימות מחסנית
+MAX_PROFILES = 50          # פרופילים ישנים יותר נמחקים
+
+_NAME = re.compile(r'^(\d{8}-\d{6}-\d{6})_([A-Z]+)_([\w-]+)_(\d+)ms$')   # גם מונע נתיבים כמו ../ בהורדה
+
+def token_matches(token):
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+def _requested_token(environ):
+    token = environ.get('HTTP_' + PROFILE_HEADER.upper().replace('-', '_'), '')
+    if not token:
+        for part in environ.get('QUERY_STRING', '').split('&'):
+            key, _, value = part.partition('=')
+            if key == PROFILE_PARAM:
+                token = value
+    return token
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """דוגם את המחסנית של Thread אחד ברקע וסופר מחסניות זהות (פורמט Collapsed stacks)"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class ProfilerMiddleware:
+    """
+    WSGI Middleware: בקשה עם הטוקן הנכון (Header או ?_profile=) רצה תחת cProfile ו-StackSampler,
+    כולל יצירת גוף התשובה. כל שאר הבקשות עוברות ישר לאפליקציה.
+    """
+
+    def __init__(self, wsgi_app, directory=PROFILE_DIR):
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+
+    def __call__(self, environ, start_response):
+        if not token_matches(_requested_token(environ)):
+            return self.wsgi_app(environ, start_response)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with StackSampler(threading.get_ident()) as sampler:
+            profiler.enable()
+            try:
+                response = self.wsgi_app(environ, start_response)
+                try:
+                    body = list(response)
+                finally:
+                    if hasattr(response, 'close'):
+                        response.close()
+            finally:
+                profiler.disable()
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        self.save(environ, profiler, sampler, elapsed_ms)
+        return body
+
+    def save(self, environ, profiler, sampler, elapsed_ms):
+        os.makedirs(self.directory, exist_ok=True)
+        path = re.sub(r'[^\w-]+', '-', environ.get('PATH_INFO', '/')).strip('-') or 'root'
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        base = os.path.join(self.directory, f"{stamp}_{environ.get('REQUEST_METHOD', 'GET')}_{path[:60]}_{elapsed_ms}ms")
+        profiler.dump_stats(base + '.prof')
+        with open(base + '.folded', 'w', encoding='utf-8') as f:
+            f.write(sampler.folded())
+        prune_profiles(self.directory)
+
+def list_profiles(directory=PROFILE_DIR, limit=MAX_PROFILES):
+    """הפרופילים השמורים, מהחדש לישן: [{'name', 'time', 'method', 'path', 'ms', 'samples'}]"""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(directory), reverse=True):
+        name, ext = os.path.splitext(filename)
+        match = _NAME.match(name)
+        if ext != '.prof' or not match:
+            continue
+        stamp, method, path, ms = match.groups()
+        folded = os.path.join(directory, name + '.folded')
+        samples = 0
+        if os.path.exists(folded):
+            with open(folded, encoding='utf-8') as f:
+                samples = sum(int(line.rsplit(' ', 1)[1]) for line in f if line.strip())
+        profiles.append({
+            'name': name,
+            'time': datetime.strptime(stamp, '%Y%m%d-%H%M%S-%f').strftime('%Y-%m-%d %H:%M:%S'),
+            'method': method,
+            'path': '/' + path.replace('-', '/') if path != 'root' else '/',
+            'ms': int(ms),
+            'samples': samples,
+        })
+        if len(profiles) >= limit:
+            break
+    return profiles
+
+def prune_profiles(directory=PROFILE_DIR, keep=MAX_PROFILES):
+    names = sorted({os.path.splitext(f)[0] for f in os.listdir(directory) if _NAME.match(os.path.splitext(f)[0])})
+    for name in names[:-keep] if len(names) > keep else []:
+        for ext in ('.prof', '.folded'):
+            try:
+                os.remove(os.path.join(directory, name + ext))
+            except FileNotFoundError:
+                pass
+
+def profile_path(name, ext, directory=PROFILE_DIR):
+    """נתיב לקובץ פרופיל לפי שם (None לשם לא תקין או קובץ שלא קיים)"""
+    if not _NAME.match(name) or ext not in ('.prof', '.folded'):
+        return None
+    path = os.path.join(directory, name + ext)
+    return path if os.path.exists(path) else None
+
+def profile_summary(path, top=30):
+    """הפונקציות הכבדות ביותר לפי זמן מצטבר, כטקסט של pstats"""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).strip_dirs().sort_stats('cumulative').print_stats(top)
+    return out.getvalue()
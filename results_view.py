@@ -0,0 +1,204 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- מודל תצוגה (View Model) לעמוד התוצאות ---
+# כל ריצה (run / run_unified / run_full_optimization / כיתה שמורה) מחושבת פעם אחת למבנה אחד,
+# נשמרת במטמון לפי result_id, והעמוד מציג רק את תחילת כל רשימה. השאר נטען לפי דרישה כ-JSON.
+
+PREVIEW_SIZE = 20   # כמה סטודנטים מוצגים בכל כרטיס יחידה בטעינה הראשונה
+PAGE_SIZE = 50      # גודל עמוד ברירת מחדל ב-API של הרשימות
+
+# שדות שנשארים רק בזיכרון ולא נכתבים לקובץ המשותף: הנתונים שהשיבוץ רץ עליהם (בדיקת האיכות טוענת
+# אותם מחדש מהמקור - DB או כיתה שמורה - ובודקת מול _fingerprint שלא השתנו), והשיבוץ עצמו שנגזר מ-_grouped
+MEMORY_ONLY = ('_students', '_units', '_matches')
+
+def data_fingerprint(students, units):
+    """תקציר של מה שבדיקת האיכות תלויה בו: שם, העדפות ו-Voice לכל סטודנט, Capacity והעדפות לכל יחידה"""
+    digest = hashlib.sha1()
+    for sd in students:
+        digest.update(json.dumps([sd['name'], sd.get('prefs', []), sd.get('voice', 1.0)], ensure_ascii=False).encode('utf-8'))
+    for name, ud in units.items():
+        digest.update(json.dumps([name, ud.get('capacity'), ud.get('prefs', [])], ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()[:20]
+
+def view_matches(view):
+    """{שם סטודנט: יחידה / None} מתוך הרשימות המקובצות של התוצאה"""
+    matches = dict.fromkeys(view['_unmatched'])
+    for unit_name, assigned in view['_grouped'].items():
+        matches.update(dict.fromkeys(assigned, unit_name))
+    return matches
+
+def build_results_view(matches, reasons, units, calculated_powers=None, message='',
+                       optimization_type='', gamma=None, students=None, source=None):
+    """
+    בניית מודל התצוגה: קיבוץ לפי יחידות, לא משובצים, נתוני גרף ותקציר לכל יחידה.
+    students - נתוני הסטודנטים שהשיבוץ רץ עליהם (לבדיקת האיכות - audit.py, מחושבת רק לפי בקשה).
+    source - מאיפה אפשר לטעון אותם מחדש ב-Worker אחר, למשל {'class': שם} או {'db': True}.
+    """
+    calculated_powers = calculated_powers or {u: units[u].get('power', 1.0) for u in units}
+
+    # --- הכנת נתונים לתצוגה לפי יחידות (Grouping) ---
+    units_grouped = {u: [] for u in units.keys()}
+    unmatched = []
+    for student, unit in matches.items():
+        if unit:
+            if unit in units_grouped:
+                units_grouped[unit].append(student)
+        else:
+            unmatched.append(student)
+
+    unit_cards = []
+    for unit_name, assigned in units_grouped.items():
+        unit_data = units[unit_name]
+        capacity = unit_data['capacity']
+        unit_cards.append({
+            'name': unit_name,
+            'capacity': capacity,
+            'power': calculated_powers.get(unit_name, unit_data.get('power', 1.0)),
+            'stored_power': unit_data.get('power', 1.0),
+            'sticky': unit_data.get('sticky_power', False),
+            'count': len(assigned),
+            'fill_rate': int(round(len(assigned) / capacity * 100)) if capacity else 0,
+            'preview': [(s, reasons.get(s, "")) for s in assigned[:PREVIEW_SIZE]]
+        })
+
+    # חישוב תפוסה לגרפים
+    stats = {
+        "labels": list(units.keys()),
+        "assigned": [len(units_grouped[u]) for u in units],
+        "capacity": [units[u]['capacity'] for u in units]
+    }
+
+    return {
+        'message': message,
+        'optimization_type': optimization_type,
+        'gamma': gamma,
+        'units': unit_cards,
+        'sticky_units': [(c['name'], c['power']) for c in unit_cards if c['sticky']],
+        'matched_count': len(matches) - len(unmatched),
+        'unmatched_count': len(unmatched),
+        'unmatched_preview': [(s, reasons.get(s, "")) for s in unmatched[:PREVIEW_SIZE]],
+        'stats': stats,
+        'preview_size': PREVIEW_SIZE,
+        # הרשימות המלאות - לא נשלחות לתבנית, רק ל-API של הטעינה לפי דרישה
+        '_grouped': units_grouped,
+        '_unmatched': unmatched,
+        '_reasons': reasons,
+        '_matches': matches,
+        '_units': units,
+        '_powers': calculated_powers,
+        '_students': students,
+        '_source': source,
+    }
+
+def page_students(view, unit_name=None, offset=0, limit=PAGE_SIZE):
+    """עמוד מתוך רשימת הסטודנטים של יחידה (או של הלא משובצים כש-unit_name ריק)"""
+    students = view['_grouped'].get(unit_name) if unit_name else view['_unmatched']
+    if students is None:
+        return None
+    page = students[offset:offset + limit]
+    return {
+        'unit': unit_name or None,
+        'total': len(students),
+        'offset': offset,
+        'limit': limit,
+        'students': [{'name': s, 'reason': view['_reasons'].get(s, "")} for s in page]
+    }
+
+class ResultCache:
+    """
+    מטמון LRU קטן של תוצאות אחרונות בזיכרון התהליך. כש-directory_getter מוגדר, כל תוצאה נשמרת
+    גם כקובץ JSON בתיקייה משותפת, כך שכל Worker (תהליך) של השרת יכול להגיש תוצאה שחושבה באחר.
+    הכתיבה לקובץ נעשית ב-Thread ברקע (הבקשה לא מחכה לה), ובלי השדות שב-MEMORY_ONLY.
+    """
+
+    def __init__(self, max_entries=32, directory_getter=None, max_files=200):
+        self.max_entries = max_entries
+        self.max_files = max_files
+        self._directory_getter = directory_getter
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._writer = ThreadPoolExecutor(max_workers=1) if directory_getter else None
+
+    def _remember(self, result_id, view):
+        with self._lock:
+            self._items[result_id] = view
+            self._items.move_to_end(result_id)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def _path(self, result_id):
+        return os.path.join(self._directory_getter(), result_id + '.json')
+
+    def put(self, view):
+        result_id = uuid.uuid4().hex[:12]
+        view['result_id'] = result_id
+        self._remember(result_id, view)
+        self.save(view)
+        return result_id
+
+    def save(self, view):
+        """כתיבה (מחדש) של תוצאה לתיקייה המשותפת - גם אחרי שנוסף לה מידע (למשל בדיקת איכות)"""
+        if not self._directory_getter:
+            return None
+        stored = {k: v for k, v in view.items() if k not in MEMORY_ONLY}
+        return self._writer.submit(self._write, self._path(view['result_id']), stored, view.get('_students'),
+                                   view.get('_units'))
+
+    def _write(self, path, stored, students, units):
+        try:
+            if students is not None and '_fingerprint' not in stored:
+                stored['_fingerprint'] = data_fingerprint(students, units)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(stored, f, ensure_ascii=False)
+            os.replace(tmp, path)
+            self._prune(os.path.dirname(path))
+        except Exception as e:
+            print(f"⚠️ שמירת התוצאה {os.path.basename(path)} נכשלה: {e}")
+
+    def flush(self):
+        """המתנה לכל הכתיבות שבתור (לבדיקות)"""
+        if self._writer:
+            self._writer.submit(lambda: None).result()
+
+    @staticmethod
+    def _mtime(path):
+        # Worker אחר יכול למחוק את הקובץ בין listdir למיון - קובץ שנעלם נחשב הישן ביותר
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return 0.0
+
+    def _prune(self, directory):
+        files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.json')]
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=self._mtime)
+        for path in files[:-self.max_files]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, result_id):
+        with self._lock:
+            view = self._items.get(result_id)
+            if view is not None:
+                self._items.move_to_end(result_id)
+                return view
+        if not self._directory_getter or not result_id.isalnum():
+            return None
+        try:
+            with open(self._path(result_id), 'r', encoding='utf-8') as f:
+                view = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._remember(result_id, view)
+        return view
@@ -0,0 +1,124 @@
+import math
+from logic import MatchingProblem, best_gamma_match, min_unmatched_bound, GAMMA_RANGE
+from parallel import map_shared
+
+# --- תרחישי "מה אם" (What-if) ---
+# כל תרחיש הוא רשימת שינויים ב-Power / Capacity של יחידות. הבעיה מוכנה פעם אחת,
+# כל התרחישים רצים (במקביל) מולה כמו run_optimized_matching, והתוצאה מושווית לשיבוץ הבסיס.
+
+MOVED_PREVIEW = 20                    # כמה סטודנטים שזזו מפורטים בכל תרחיש
+PARALLEL_MIN_WORK = 200_000           # מתחת לזה עליית תהליכים יקרה יותר מהחישוב עצמו
+
+def parse_scenarios(payload, problem):
+    """
+    בדיקת התרחישים מהבקשה. מחזיר (רשימת (שם, powers, capacities), שגיאות).
+    פורמט תרחיש: {"name": "...", "changes": [{"unit": "8200", "power": 20}, {"unit": "Y", "capacity_delta": 3}]}
+    """
+    scenarios = payload.get('scenarios')
+    if not isinstance(scenarios, list) or not scenarios:
+        return [], ['scenarios חייב להיות רשימה לא ריקה של תרחישים']
+
+    parsed, errors = [], []
+    for i, scenario in enumerate(scenarios):
+        if isinstance(scenario, list):
+            scenario = {'changes': scenario}
+        name = str(scenario.get('name') or f'תרחיש {i + 1}') if isinstance(scenario, dict) else f'תרחיש {i + 1}'
+        changes = scenario.get('changes') if isinstance(scenario, dict) else None
+        if not isinstance(changes, list):
+            errors.append(f"{name}: changes חייב להיות רשימת שינויים")
+            continue
+
+        powers = list(problem.power)
+        capacities = list(problem.capacity)
+        for change in changes:
+            unit_name = change.get('unit') if isinstance(change, dict) else None
+            if unit_name not in problem.unit_names:
+                errors.append(f"{name}: היחידה '{unit_name}' לא קיימת")
+                continue
+            u = problem.unit_index(unit_name)
+            unknown = set(change) - {'unit', 'power', 'capacity', 'capacity_delta'}
+            if unknown:
+                errors.append(f"{name}: שדות לא מוכרים ליחידה '{unit_name}': {', '.join(sorted(unknown))}")
+            try:
+                if 'power' in change:
+                    powers[u] = float(change['power'])
+                    if not math.isfinite(powers[u]):
+                        raise ValueError(change['power'])
+                if 'capacity' in change:
+                    capacities[u] = int(change['capacity'])
+                if 'capacity_delta' in change:
+                    capacities[u] += int(change['capacity_delta'])
+            except (TypeError, ValueError, OverflowError):   # OverflowError: int(inf)
+                errors.append(f"{name}: ערך לא תקין ליחידה '{unit_name}'")
+                continue
+            if capacities[u] < 0:
+                errors.append(f"{name}: Capacity שלילי ליחידה '{unit_name}'")
+        parsed.append((name, powers, capacities))
+
+    return parsed, errors
+
+def _evaluate(problem, job):
+    """רץ בתהליך Worker: שיבוץ אחד (עם בחירת Gamma) לתרחיש אחד, עד החסם של ה-Capacity שלו"""
+    powers, capacities, gamma_range = job
+    bound = min_unmatched_bound(problem, capacities)
+    match, gamma = best_gamma_match(problem, gamma_range, powers, capacities, bound=bound)
+    return match, gamma, bound
+
+def summarize(problem, match):
+    """לא משובצים ודירוג ממוצע (1 = העדפה ראשונה) של הסטודנטים המשובצים"""
+    ranks = [problem.ranks[s][u] + 1 for s, u in enumerate(match) if u >= 0]
+    return {
+        'unmatched': len(match) - len(ranks),
+        'avg_rank': round(sum(ranks) / len(ranks), 3) if ranks else None,
+    }
+
+def _unit_name(problem, u):
+    return problem.unit_names[u] if u >= 0 else None
+
+def compare(problem, baseline, match):
+    """ההבדלים בין שיבוץ התרחיש לשיבוץ הבסיס"""
+    base = summarize(problem, baseline)
+    result = summarize(problem, match)
+    moved = [s for s, (a, b) in enumerate(zip(baseline, match)) if a != b]
+    result['unmatched_delta'] = result['unmatched'] - base['unmatched']
+    if result['avg_rank'] is not None and base['avg_rank'] is not None:
+        result['avg_rank_delta'] = round(result['avg_rank'] - base['avg_rank'], 3)
+    else:
+        result['avg_rank_delta'] = None
+    result['students_moved'] = len(moved)
+    result['moved'] = [{'student': problem.student_names[s],
+                        'from': _unit_name(problem, baseline[s]),
+                        'to': _unit_name(problem, match[s])} for s in moved[:MOVED_PREVIEW]]
+    counts = lambda m: [sum(1 for u in m if u == k) for k in range(problem.n_units)]
+    result['unit_changes'] = {problem.unit_names[k]: after - before
+                              for k, (before, after) in enumerate(zip(counts(baseline), counts(match)))
+                              if after != before}
+    return result
+
+def run_scenarios(students_data, units_data, payload):
+    """
+    הרצת כל התרחישים מול שיבוץ הבסיס (ה-Power וה-Capacity הנוכחיים).
+    gamma בבקשה קובע Gamma קבוע; אחרת כל תרחיש סורק את טווח ה-Gamma כמו run_optimized_matching.
+    מחזיר (תוצאה, שגיאות).
+    """
+    problem = MatchingProblem(students_data, units_data)
+    scenarios, errors = parse_scenarios(payload, problem)
+    gamma_range = GAMMA_RANGE
+    if payload.get('gamma') is not None:
+        try:
+            gamma_range = (float(payload['gamma']),) * 2
+        except (TypeError, ValueError):
+            errors.append('gamma חייב להיות מספר')
+    if errors:
+        return None, errors
+
+    jobs = [(problem.power, problem.capacity, gamma_range)] + [(p, c, gamma_range) for _, p, c in scenarios]
+    work = len(jobs) * sum(len(prefs) for prefs in problem.unit_prefs)
+    results = map_shared(_evaluate, problem, jobs, parallel=work >= PARALLEL_MIN_WORK)
+
+    baseline, base_gamma, base_bound = results[0]
+    return {
+        'baseline': dict(summarize(problem, baseline), gamma=base_gamma, unmatched_bound=base_bound),
+        'scenarios': [dict(compare(problem, baseline, match), name=name, gamma=gamma, unmatched_bound=bound)
+                      for (name, _, _), (match, gamma, bound) in zip(scenarios, results[1:])],
+    }, []
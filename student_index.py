@@ -0,0 +1,83 @@
+import bisect
+
+# --- אינדקס סטודנטים ---
+# חיפוש לפי שם מדויק, שם ללא תלות ברישיות (casefold) ות"ז (השדה id מ-Forms) ב-O(1),
+# וחיפוש לפי תחילית שם ב-O(log n) על רשימה ממוינת של השמות המנורמלים.
+
+def fold_name(name):
+    return str(name).strip().casefold()
+
+class StudentIndex:
+    def __init__(self, students=()):
+        self.students = []
+        self.by_name = {}
+        self.by_folded = {}
+        self.by_id = {}
+        self._sorted_keys = []    # (שם מנורמל, מיקום ברשימה) ממוין - לחיפוש תחיליות
+        # בנייה ראשונית: מיון אחד בסוף (ולא insort לכל סטודנט, שהוא O(n²))
+        for student in students:
+            self._index(student)
+        self._sorted_keys.sort()
+
+    def _index(self, student):
+        pos = len(self.students)
+        self.students.append(student)
+        name = student.get('name', '')
+        self.by_name.setdefault(name, student)
+        folded = fold_name(name)
+        self.by_folded.setdefault(folded, student)
+        self._sorted_keys.append((folded, pos))
+        self.set_id(student, student.get('id'))
+
+    def add(self, student):
+        """הוספת סטודנט לאינדקס (נקרא גם כשמוסיפים סטודנט חדש ל-DB, כדי שהאינדקס יישאר עקבי)"""
+        self._index(student)
+        key = self._sorted_keys.pop()
+        bisect.insort(self._sorted_keys, key)
+
+    def set_id(self, student, id_num):
+        """עדכון ת"ז של סטודנט קיים (Forms יכול להוסיף ת"ז לסטודנט שכבר נטען)"""
+        old = student.get('id')
+        if old and self.by_id.get(str(old).strip()) is student:
+            del self.by_id[str(old).strip()]
+        if id_num:
+            student['id'] = id_num
+            self.by_id.setdefault(str(id_num).strip(), student)
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def find(self, name):
+        """חיפוש לפי שם ללא תלות ברישיות/רווחים"""
+        return self.by_folded.get(fold_name(name))
+
+    def find_id(self, id_num):
+        return self.by_id.get(str(id_num).strip()) if id_num else None
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def __len__(self):
+        return len(self.students)
+
+    def names(self):
+        return [s.get('name', '') for s in self.students]
+
+    def search(self, prefix, limit=20):
+        """סטודנטים ששמם מתחיל בתחילית (לפי סדר אלפביתי), ובנוסף התאמה מדויקת לת"ז"""
+        results = []
+        by_id = self.find_id(prefix)
+        if by_id is not None:
+            results.append(by_id)
+
+        key = fold_name(prefix)
+        i = bisect.bisect_left(self._sorted_keys, (key, -1))
+        while i < len(self._sorted_keys) and len(results) < limit:
+            folded, pos = self._sorted_keys[i]
+            if not folded.startswith(key):
+                break
+            student = self.students[pos]
+            if student is not by_id:
+                results.append(student)
+            i += 1
+        return results[:limit]
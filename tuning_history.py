@@ -0,0 +1,118 @@
+import os
+import json
+import time
+import hashlib
+from locks import LockRegistry
+
+# --- היסטוריית כיוונון (Tuning history) לכל כיתה ---
+# run_full_optimization מתחיל בכל פעם מ-Power אקראי, גם לכיתה שכבר כוונה אתמול על אותם נתונים.
+# כאן נשמרות, לכל "טביעת אצבע" של הבעיה, התצורות הטובות ביותר שנמדדו: (Power, Gamma) -> לא משובצים,
+# ותקציר (Hash) של כל התצורות שכבר נבדקו. ריצה חדשה מתחילה מהתצורות הטובות, לא מודדת שוב
+# תצורה שנמדדה על בעיה זהה, ועל בעיה שהשתנתה מעט בודקת קודם את הטובות מהגרסאות הקודמות.
+#
+# הקובץ קטן: עד MAX_RECORDS תצורות ו-MAX_EVALUATED תקצירים לכל טביעת אצבע, ועד MAX_FINGERPRINTS
+# גרסאות של הבעיה (החדשה ראשונה). Power נשמר לפי שם יחידה, כדי שיתאים גם אחרי הוספה/מחיקה של יחידות.
+
+HISTORY_FORMAT = 1
+HISTORY_FILE = 'tuning_history.json'
+MAX_RECORDS = 16
+MAX_EVALUATED = 4096
+MAX_FINGERPRINTS = 3
+MAX_SEEDS = 16
+
+_locks = LockRegistry(lambda path: path + '.lock')
+
+def _digest(obj, length):
+    return hashlib.sha1(json.dumps(obj, ensure_ascii=False).encode('utf-8')).hexdigest()[:length]
+
+def problem_fingerprint(problem):
+    """כל מה שמשפיע על השיבוץ חוץ מה-Power שהחיפוש משנה (Power של יחידות Sticky כן נכלל)"""
+    return _digest([problem.student_names, problem.unit_names, problem.capacity, problem.unit_prefs,
+                    problem.ranks, problem.voice, problem.sticky,
+                    [p if sticky else None for p, sticky in zip(problem.power, problem.sticky)]], 20)
+
+class TuningHistory:
+    """היסטוריה של כיתה אחת (קובץ JSON אחד). warm_start לפני החיפוש, record אחריו"""
+
+    def __init__(self, path):
+        self.path = path
+
+    @staticmethod
+    def key(powers):
+        """תקציר של תצורת Power (לפי סדר היחידות בבעיה)"""
+        return _digest([float(p) for p in powers], 16)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return []   # קובץ פגום - מתחילים היסטוריה חדשה
+        return content.get('entries', []) if content.get('format') == HISTORY_FORMAT else []
+
+    def warm_start(self, problem):
+        """
+        (seeds, known, seen):
+        seeds - תצורות Power להתחיל מהן (הטובות ביותר קודם, קודם מהבעיה הנוכחית ואז מגרסאות קודמות),
+        known - {key: (לא משובצים, Gamma, חודד)} לתצורות שנמדדו על הבעיה הנוכחית בדיוק,
+        seen - תקצירים של כל התצורות שכבר נבדקו על הבעיה הנוכחית.
+        """
+        with _locks.get(self.path).read():
+            entries = self._read()
+        fingerprint = problem_fingerprint(problem)
+        seeds, known, seen, used = [], {}, set(), set()
+        for entry in entries:
+            current = entry['fingerprint'] == fingerprint
+            if current:
+                seen.update(entry.get('evaluated', []))
+            for record in entry.get('records', []):
+                powers = [p if sticky else record['powers'].get(u, p)
+                          for u, p, sticky in zip(problem.unit_names, problem.power, problem.sticky)]
+                k = self.key(powers)
+                if current:
+                    known.setdefault(k, (record['unmatched'], record['gamma'], record.get('refined', False)))
+                if k not in used and len(seeds) < MAX_SEEDS:
+                    used.add(k)
+                    seeds.append(powers)
+        return seeds, known, seen
+
+    def record(self, problem, evaluated, best=None):
+        """
+        evaluated - [(powers, לא משובצים, Gamma)] מהחיפוש, best - (powers, לא משובצים, Gamma, חודד).
+        מתמזג עם מה שכבר בקובץ (גם ריצה מקבילה של אותה כיתה) ונכתב אטומית.
+        """
+        fingerprint = problem_fingerprint(problem)
+        named = lambda powers: dict(zip(problem.unit_names, powers))
+        new_records = [{'powers': named(p), 'unmatched': n, 'gamma': g, 'refined': False} for p, n, g in evaluated]
+        if best is not None:
+            p, n, g, refined = best
+            new_records.append({'powers': named(p), 'unmatched': n, 'gamma': g, 'refined': refined})
+
+        with _locks.get(self.path).write():
+            entries = self._read()
+            entry = next((e for e in entries if e['fingerprint'] == fingerprint), None)
+            if entry is None:
+                entry = {'fingerprint': fingerprint, 'records': [], 'evaluated': []}
+            entries = [entry] + [e for e in entries if e is not entry]
+
+            # אותה תצורה פעמיים: נשארת התוצאה הטובה (חידוד Gamma רק משפר), ובשוויון - הקיימת
+            by_key = {}
+            rank = lambda r: (r['unmatched'], not r.get('refined', False))
+            for record in entry['records'] + new_records:
+                k = self.key([record['powers'][u] for u in problem.unit_names])
+                if k not in by_key or rank(record) < rank(by_key[k]):
+                    by_key[k] = record
+            records = sorted(by_key.values(), key=lambda r: r['unmatched'])   # יציב: בשוויון - הוותיק קודם
+            entry['records'] = records[:MAX_RECORDS]
+
+            evaluated_keys = dict.fromkeys(entry['evaluated'] + [self.key(p) for p, _, _ in evaluated])
+            entry['evaluated'] = list(evaluated_keys)[-MAX_EVALUATED:]
+            entry['updated_at'] = time.time()
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'format': HISTORY_FORMAT, 'entries': entries[:MAX_FINGERPRINTS]}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
@@ -0,0 +1,95 @@
+import os
+from logic import unit_distance_column, insert_unit_pref
+
+# --- אחסון וקטורי הסטודנטים (Vectors) ליד ה-DB ---
+# מטריצת הדירוגים הגולמית (סטודנטים x שאלות) ומטריצת המרחקים (סטודנטים x יחידות)
+# נשמרות כקבצי .npy בינאריים, כך ששינוי ביחידה לא מחייב העלאה מחדש של קובץ הסטודנטים.
+# ב-db.json נשמרים רק המטא-דאטה: data['vectors'] = {'questions': [...], 'units': [סדר העמודות]},
+# 'vec_row' לכל סטודנט ו-'profile' לכל יחידה.
+# NumPy נטען רק בתוך הפונקציות, כדי לא להאט את עליית השרת.
+
+def _paths(db_file):
+    base = os.path.splitext(db_file)[0]
+    return base + '_students.npy', base + '_distances.npy'
+
+def _save_array(path, arr):
+    """כתיבה אטומית - קובץ זמני ואז החלפה, כדי שקורא במקביל לא יראה קובץ חצי כתוב"""
+    import numpy as np
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+def save_vector_state(db_file, student_matrix, dists):
+    import numpy as np
+    students_path, dists_path = _paths(db_file)
+    _save_array(students_path, np.asarray(student_matrix, dtype=np.float32))
+    _save_array(dists_path, np.asarray(dists, dtype=float))
+
+def load_student_matrix(db_file):
+    """טעינת מטריצת הדירוגים כ-memory map (קריאה בלבד), או None אם עוד לא נשמרה"""
+    import numpy as np
+    students_path, _ = _paths(db_file)
+    if not os.path.exists(students_path):
+        return None
+    return np.load(students_path, mmap_mode='r')
+
+def load_distance_matrix(db_file):
+    import numpy as np
+    _, dists_path = _paths(db_file)
+    if not os.path.exists(dists_path):
+        return None
+    return np.load(dists_path)
+
+def has_vectors(data, db_file):
+    return 'vectors' in data and load_student_matrix(db_file) is not None
+
+def upsert_unit_profile(data, db_file, unit_name, profile):
+    """
+    הוספה או עדכון של פרופיל יחידה.
+    מחושבת רק עמודת המרחקים של היחידה, ורשימות ההעדפות של הסטודנטים מתעדכנות בהכנסה ממוינת.
+    """
+    import numpy as np
+    student_matrix = load_student_matrix(db_file)
+    dists = load_distance_matrix(db_file)
+    meta = data['vectors']
+    profile = [float(v) for v in profile]
+    if len(profile) != len(meta['questions']):
+        raise ValueError(f"פרופיל היחידה צריך {len(meta['questions'])} ערכים, התקבלו {len(profile)}")
+
+    column = unit_distance_column(student_matrix, profile)
+    unit_order = meta['units']
+    if unit_name in unit_order:
+        dists[:, unit_order.index(unit_name)] = column
+    else:
+        unit_order.append(unit_name)
+        dists = np.column_stack([dists, column])
+
+    unit_cols = {u: j for j, u in enumerate(unit_order)}
+    for s in data['students']:
+        row = s.get('vec_row')
+        if row is None:
+            continue
+        prefs = s.setdefault('prefs', [])
+        if unit_name in prefs:
+            prefs.remove(unit_name)
+        insert_unit_pref(prefs, unit_name, dists[row], unit_cols)
+
+    data['units'][unit_name]['profile'] = profile
+    _, dists_path = _paths(db_file)
+    _save_array(dists_path, dists)
+
+def remove_unit_profile(data, db_file, unit_name):
+    """הסרת יחידה - מחיקת העמודה שלה והוצאתה מרשימות ההעדפות (הסדר של השאר לא משתנה)"""
+    import numpy as np
+    unit_order = data['vectors']['units']
+    if unit_name in unit_order:
+        dists = load_distance_matrix(db_file)
+        dists = np.delete(dists, unit_order.index(unit_name), axis=1)
+        unit_order.remove(unit_name)
+        _, dists_path = _paths(db_file)
+        _save_array(dists_path, dists)
+
+    for s in data['students']:
+        if unit_name in s.get('prefs', []):
+            s['prefs'].remove(unit_name)